@@ -0,0 +1,139 @@
+"""Speedup and draft acceptance rate of assisted decoding.
+
+    python benchmarks/bench_assisted.py
+    python benchmarks/bench_assisted.py --model-source shakespeare-local=path/to/checkpoint --repeat 5
+
+Every corpus sentence is decoded greedily by the target model alone, then
+again with the draft model assisting (see src/assisted.py). The two outputs
+must be token-for-token identical; the script exits with status 1 when any
+differs. Needs both real checkpoints: unlike bench_pipeline.py nothing is
+stubbed, since a stub can't draft for a real model.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import torch  # noqa: E402
+
+from assisted import ASSISTED_KWARGS, AssistedGenerator, AssistedStats  # noqa: E402
+from pipeline import DRAFT_MODELS, SHAKESPEARE_PREFIX  # noqa: E402
+from registry import MODEL_SOURCES, load_pair  # noqa: E402
+from translation import MAX_INPUT_LENGTH  # noqa: E402
+
+CORPUS = [
+    "I love you, my dear.",
+    "I came as an ambassador from Edward, but I return as his sworn and deadly enemy.",
+    "He told me to take care of his marriage, but he'll have war instead.",
+    "I'll only irritate you if I stay. Let me go.",
+    "Thank you for your help! I can't do this without you.",
+    "Where are you going so late at night, my lord?",
+    "The king has ordered that the castle gates be closed before nightfall.",
+    "Don't worry, everything will be fine tomorrow morning.",
+    "She told me she would come back before winter, with her brothers.",
+    "You are a fool if you think I will forgive you so easily.",
+]
+
+
+def median_time(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs), result
+
+
+def run_suite(args):
+    sources = dict(MODEL_SOURCES)
+    for override in args.model_source:
+        name, _, path = override.partition("=")
+        sources[name] = path
+    tokenizer, model = load_pair(sources[args.target])
+    draft_tokenizer, draft_model = load_pair(sources[args.draft])
+    generator = AssistedGenerator(tokenizer, model, draft_tokenizer, draft_model)
+
+    rows, mismatches = [], []
+    total = AssistedStats()
+    for text in CORPUS:
+        inputs = tokenizer.encode(f"{SHAKESPEARE_PREFIX}: {text}", return_tensors="pt",
+                                  max_length=MAX_INPUT_LENGTH, truncation=True)
+
+        def greedy():
+            with torch.no_grad():
+                return model.generate(inputs, **ASSISTED_KWARGS)
+
+        # One untimed run each so lazy initialization doesn't count
+        greedy()
+        generator.generate(inputs)
+        greedy_s, expected = median_time(greedy, args.repeat)
+        assisted_s, (outputs, stats) = median_time(lambda: generator.generate(inputs), args.repeat)
+
+        if outputs.tolist() != expected.tolist():
+            mismatches.append(text)
+        total = total + stats
+        rows.append({
+            "text": text,
+            "tokens": stats.tokens,
+            "greedy_s": greedy_s,
+            "assisted_s": assisted_s,
+            "speedup": greedy_s / assisted_s,
+            "acceptance_rate": stats.acceptance_rate,
+            "tokens_per_target_call": stats.tokens_per_target_call,
+        })
+
+    return {
+        "meta": {"target": sources[args.target], "draft": sources[args.draft], "repeat": args.repeat},
+        "rows": rows,
+        "summary": {
+            "speedup": sum(r["greedy_s"] for r in rows) / sum(r["assisted_s"] for r in rows),
+            "acceptance_rate": total.acceptance_rate,
+            "tokens_per_target_call": total.tokens_per_target_call,
+        },
+        "mismatches": mismatches,
+    }
+
+
+def print_report(report):
+    print(f"{'sentence':<42}{'tokens':>8}{'greedy':>12}{'assisted':>12}{'speedup':>9}{'accepted':>10}{'tok/pass':>10}")
+    for row in report["rows"]:
+        text = row["text"] if len(row["text"]) <= 40 else row["text"][:37] + "..."
+        rate = f"{row['acceptance_rate']:.0%}" if row["acceptance_rate"] is not None else "-"
+        per_call = f"{row['tokens_per_target_call']:.2f}" if row["tokens_per_target_call"] else "-"
+        print(f"{text:<42}{row['tokens']:>8}{row['greedy_s'] * 1000:>10.1f}ms{row['assisted_s'] * 1000:>10.1f}ms"
+              f"{row['speedup']:>8.2f}x{rate:>10}{per_call:>10}")
+    summary = report["summary"]
+    rate = f"{summary['acceptance_rate']:.0%}" if summary["acceptance_rate"] is not None else "-"
+    print(f"overall speedup {summary['speedup']:.2f}x, acceptance rate {rate}, "
+          f"{summary['tokens_per_target_call'] or 0:.2f} tokens per target forward pass")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="shakespeare-local", choices=sorted(DRAFT_MODELS))
+    parser.add_argument("--draft", help="registry name of the draft model (default: DRAFT_MODELS[target])")
+    parser.add_argument("--model-source", action="append", default=[], metavar="NAME=PATH",
+                        help="use a different checkpoint for a registry model")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    args = parser.parse_args()
+    args.draft = args.draft or DRAFT_MODELS[args.target]
+
+    report = run_suite(args)
+    print_report(report)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"saved results to {args.save}")
+    for text in report["mismatches"]:
+        print(f"MISMATCH: assisted output differs from greedy decoding for {text!r}", file=sys.stderr)
+    if report["mismatches"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
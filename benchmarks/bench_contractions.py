@@ -0,0 +1,55 @@
+"""Micro-benchmark: normalize_contractions vs. the old per-contraction regex loop.
+
+    python benchmarks/bench_contractions.py --sizes 1 10 100
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from postprocessing import contraction_map, normalize_contractions  # noqa: E402
+
+SAMPLE = (
+    "I can't believe it's already late, and we're still here. "
+    "She won't say what's wrong, but I’m sure they'll tell us if they've heard. "
+    "The river was calm and the evening light fell softly on the water. "
+)
+
+
+def legacy_normalize_contractions(text, mapping=contraction_map):
+    for contraction, full in mapping.items():
+        pattern = re.compile(r'\b' + re.escape(contraction) + r'\b', flags=re.IGNORECASE)
+        text = pattern.sub(full, text)
+    return text
+
+
+def paragraph(size_kb):
+    repeats = size_kb * 1024 // len(SAMPLE) + 1
+    return (SAMPLE * repeats)[:size_kb * 1024]
+
+
+def best_of(fn, text, repeat):
+    number = max(1, 200 // max(1, len(text) // 1024))
+    return min(timeit.repeat(lambda: fn(text), number=number, repeat=repeat)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100], help="paragraph sizes in KB")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{len(contraction_map)} contractions")
+    print(f"{'size':>7} {'legacy':>12} {'compiled':>12} {'speedup':>8}")
+    for size in args.sizes:
+        text = paragraph(size)
+        legacy = best_of(legacy_normalize_contractions, text, args.repeat)
+        compiled = best_of(normalize_contractions, text, args.repeat)
+        print(f"{size:>5}KB {legacy * 1000:>10.3f}ms {compiled * 1000:>10.3f}ms {legacy / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
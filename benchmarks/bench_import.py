@@ -0,0 +1,80 @@
+"""Measure cold import time and resident memory of runtime modules.
+
+Each measurement runs in a fresh interpreter so nothing is already imported::
+
+    python benchmarks/bench_import.py                       # current tree
+    python benchmarks/bench_import.py --baseline-rev HEAD~1  # before vs after
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+__import__(sys.argv[2])
+elapsed = time.perf_counter() - start
+rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"seconds": elapsed, "rss_kb": rss_after, "rss_delta_kb": rss_after - rss_before}))
+"""
+
+
+def measure(src_dir, module, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE, src_dir, module],
+            check=True, capture_output=True, text=True, cwd=REPO_ROOT,
+        ).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+    return {
+        "seconds": statistics.median(run["seconds"] for run in runs),
+        "rss_kb": statistics.median(run["rss_kb"] for run in runs),
+        "rss_delta_kb": statistics.median(run["rss_delta_kb"] for run in runs),
+    }
+
+
+def export_src(rev, dest):
+    # src/ finds data/ next to it, so export both when the revision has data/
+    paths = ["src"]
+    if subprocess.run(["git", "cat-file", "-e", f"{rev}:data"], capture_output=True, cwd=REPO_ROOT).returncode == 0:
+        paths.append("data")
+    archive = subprocess.run(["git", "archive", rev, *paths], check=True, capture_output=True, cwd=REPO_ROOT).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(dest)
+    return os.path.join(dest, "src")
+
+
+def report(label, module, result):
+    print(f"{label:<10} import {module:<16} {result['seconds'] * 1000:9.1f} ms "
+          f"{result['rss_kb'] / 1024:8.1f} MiB RSS (+{result['rss_delta_kb'] / 1024:.1f} MiB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=["postprocessing"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline-rev", help="git revision to compare the current tree against")
+    args = parser.parse_args()
+
+    current_src = os.path.join(REPO_ROOT, "src")
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline_src = export_src(args.baseline_rev, tmp) if args.baseline_rev else None
+        for module in args.modules:
+            if baseline_src:
+                report("before", module, measure(baseline_src, module, args.repeat))
+            report("after" if baseline_src else "current", module, measure(current_src, module, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Micro-benchmark: lexicon startup and phrase matching as the lexicon grows.
+
+    python benchmarks/bench_lexicon.py --sizes 100 10000 50000
+
+For synthetic lexicons of each size, compares building the old in-memory
+structures (a regex alternation of every phrase plus a dict of word case
+variants) with memory-mapping the compiled artifact, and the old regex
+phrase rewriter with the token trie.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from lexicon import Lexicon, build, case_variants, read_lexicon, to_mapping  # noqa: E402
+from postprocessing import PhraseRewriter  # noqa: E402
+
+SAMPLE = (
+    "Thank you for your help, my friend! I think so, but it is late and you are tired. "
+    "Good morning, my lord. How are you today? Of course I will come here tomorrow. "
+)
+
+
+class RegexPhraseRewriter:
+    """The previous implementation: one alternation of all phrases, longest first."""
+
+    def __init__(self, mapping):
+        self.mapping = {phrase.lower(): repl for phrase, repl in mapping.items()}
+        alternation = "|".join(re.escape(p) for p in sorted(self.mapping, key=len, reverse=True))
+        self.pattern = re.compile(r"(?<!\w)(?:" + alternation + r")(?!\w)", re.IGNORECASE)
+
+    def rewrite(self, text, rng=random):
+        return self.pattern.sub(lambda m: rng.choice(self.mapping[m.group(0).lower()]), text)
+
+
+def synthetic_lexicon(directory, size):
+    rng = random.Random(size)
+    vocabulary = [f"w{i}" for i in range(max(50, size // 4))] + SAMPLE.lower().replace(",", "").split()
+    with open(os.path.join(directory, "phrases.tsv"), "w") as f:
+        f.write("thank you\tGramercy\nhow are you\tHow fares thee?\nmy lord\tmy good lord\n")
+        for i in range(size):
+            f.write(" ".join(rng.choice(vocabulary) for _ in range(rng.randint(2, 4))) + f"\talt{i}\n")
+    with open(os.path.join(directory, "words.tsv"), "w") as f:
+        f.write("you\tthou\nyour\tthy\n")
+        for i in range(size):
+            f.write(f"w{i}x\tword{i}\n")
+    with open(os.path.join(directory, "starters.tsv"), "w") as f:
+        f.write("thank\tI thank thee\n")
+
+
+def startup_in_memory(directory):
+    lexicon = read_lexicon(directory)
+    phrases = to_mapping("phrases", lexicon["phrases"])
+    return RegexPhraseRewriter(phrases), case_variants(to_mapping("words", lexicon["words"]))
+
+
+def startup_mapped(path):
+    lexicon = Lexicon.open(path)
+    return PhraseRewriter.from_trie(lexicon.trie), lexicon.variants
+
+
+def once(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 50000], help="entries per map")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = SAMPLE * 8
+    print(f"{'entries':>8} {'dict+regex start':>17} {'mmap start':>11} {'regex rewrite':>14} {'trie rewrite':>13}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            synthetic_lexicon(directory, size)
+            path = os.path.join(directory, "lexicon.bin")
+            build(directory, path)
+            legacy_start, (legacy, _) = once(lambda: startup_in_memory(directory))
+            mapped_start, (trie, _) = once(lambda: startup_mapped(path))
+            legacy_rewrite = min(timeit.repeat(lambda: legacy.rewrite(text), number=20, repeat=args.repeat)) / 20
+            trie_rewrite = min(timeit.repeat(lambda: trie.rewrite(text), number=20, repeat=args.repeat)) / 20
+        print(f"{size:>8} {legacy_start * 1000:>15.1f}ms {mapped_start * 1000:>9.2f}ms "
+              f"{legacy_rewrite * 1000:>12.3f}ms {trie_rewrite * 1000:>11.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
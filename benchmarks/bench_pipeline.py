@@ -0,0 +1,297 @@
+"""Per-stage benchmark of the translation pipeline with regression tracking.
+
+    python benchmarks/bench_pipeline.py --save benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --compare benchmarks/baseline.json --threshold 0.25
+
+Every stage is timed separately on a fixed FR/ES/EN corpus at several input
+sizes (number of sentences). Models, the spaCy pipeline and the TTS engine
+that are not available locally are replaced by stubs (``--stub`` forces
+stubs everywhere) so the suite always runs; the report lists what was
+stubbed, and a comparison is only meaningful between runs with the same
+stubs. ``--compare`` exits with status 1 when any stage is slower than the
+baseline by more than ``--threshold``.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import postprocessing  # noqa: E402
+from postprocessing import normalize_contractions, phrase_mapping, phrase_replace, pos_aware_substitution  # noqa: E402
+from tagger_service import TaggedToken  # noqa: E402
+
+CORPUS = {
+    "fr": [
+        "Je t'aime ma chérie.",
+        "Je suis venu en ambassadeur, mais je repars en ennemi juré.",
+        "Le roi a ordonné que les portes du château soient fermées avant la nuit.",
+        "Ne t'inquiète pas, tout ira bien demain matin.",
+        "Elle m'a dit qu'elle reviendrait avant l'hiver, avec ses frères.",
+    ],
+    "es": [
+        "Te quiero mucho.",
+        "Vine como embajador, pero regreso como enemigo jurado.",
+        "El rey ordenó cerrar las puertas del castillo antes de la noche.",
+        "No te preocupes, todo estará bien mañana por la mañana.",
+        "Ella me dijo que volvería antes del invierno, con sus hermanos.",
+    ],
+    "en": [
+        "I love you, my dear.",
+        "I came as an ambassador from Edward, but I return as his sworn and deadly enemy.",
+        "He told me to take care of his marriage, but he'll have war instead.",
+        "I'll only irritate you if I stay. Let me go.",
+        "Thank you for your help! I can't do this without you.",
+    ],
+}
+SIZES = (1, 5, 25)
+TRANSLATION_HOPS = (("fr-en", "fr", None), ("es-en", "es", None),
+                    ("shakespeare-online", "en", "translate"), ("shakespeare-local", "en", "translate"))
+
+
+def passage(language, sentences):
+    texts = CORPUS[language]
+    return " ".join(texts[i % len(texts)] for i in range(sentences))
+
+
+class StubTokenizer:
+    """Whitespace tokenizer with the subset of the HF API translation.py uses."""
+
+    def __init__(self):
+        self.vocab = {"<pad>": 0}
+        self.words = ["<pad>"]
+
+    def _ids(self, text, max_length=None):
+        ids = []
+        for word in text.split():
+            if word not in self.vocab:
+                self.vocab[word] = len(self.words)
+                self.words.append(word)
+            ids.append(self.vocab[word])
+        return ids[:max_length] if max_length else ids
+
+    def encode(self, text, return_tensors=None, max_length=None, truncation=False):
+        import torch
+        return torch.tensor([self._ids(text, max_length)])
+
+    def __call__(self, texts, max_length=None, truncation=False):
+        return {"input_ids": [self._ids(text, max_length) for text in texts]}
+
+    def tokenize(self, text):
+        return text.split()
+
+    def pad(self, batch, return_tensors=None):
+        import torch
+        ids = batch["input_ids"]
+        width = max(len(row) for row in ids)
+        padded = [row + [0] * (width - len(row)) for row in ids]
+        mask = [[1] * len(row) + [0] * (width - len(row)) for row in ids]
+        return {"input_ids": torch.tensor(padded), "attention_mask": torch.tensor(mask)}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(self.words[i] for i in ids.tolist() if i)
+
+    def batch_decode(self, outputs, skip_special_tokens=True):
+        return [self.decode(row) for row in outputs]
+
+
+class StubModel:
+    """Echoes its input; stands in for a checkpoint that isn't available."""
+
+    config = None
+
+    def generate(self, input_ids=None, **kwargs):
+        return input_ids
+
+
+def load_or_stub(source, force_stub, stubbed):
+    if not force_stub:
+        from registry import load_pair
+        try:
+            return load_pair(source)
+        except OSError:
+            pass
+    stubbed.append(source)
+    return StubTokenizer(), StubModel()
+
+
+def stub_tag(texts):
+    # Regex tokens tagged NOUN so the substitution stage still has work to do
+    return [[TaggedToken(m.group(1), "NOUN", m.group(2)) for m in re.finditer(r"(\w+|[^\w\s])(\s*)", text)]
+            for text in texts]
+
+
+class SilentEngine:
+    """TTS stand-in producing silence proportional to the text length."""
+
+    name = "silent"
+    mime = "audio/wav"
+    extension = "wav"
+    max_workers = 1
+
+    def synthesize(self, text, lang):
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(16000)
+            wav.writeframes(b"\0\0" * 800 * len(text.split()))
+        return buffer.getvalue()
+
+
+def measure(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs)
+
+
+def run_suite(args):
+    from registry import MODEL_SOURCES, ModelRegistry
+    from translation import translate
+    from tts import SpeechSynthesizer
+
+    stubbed = []
+    sources = dict(MODEL_SOURCES)
+    for override in args.model_source:
+        name, _, path = override.partition("=")
+        sources[name] = path
+
+    results = {}
+
+    # Cold model loading, one registry per model so nothing is shared
+    models = {}
+    for name, source in sources.items():
+        start = time.perf_counter()
+        models[name] = ModelRegistry(
+            sources={name: source}, loader=lambda s: load_or_stub(s, args.stub, stubbed)
+        ).get(name)
+        results[f"load_models:{name}"] = {"-": time.perf_counter() - start}
+
+    tagger = None if args.stub else postprocessing
+    if tagger is not None:
+        try:
+            postprocessing.get_nlp()
+        except (OSError, ImportError):
+            tagger = None
+    if tagger is None:
+        stubbed.append(postprocessing.SPACY_MODEL)
+
+    def tag(texts):
+        return list(postprocessing.tag(texts)) if tagger else stub_tag(texts)
+
+    if args.stub or args.tts_engine == "silent":
+        engine = SilentEngine()
+        stubbed.append("tts")
+    else:
+        engine = args.tts_engine
+    synthesizer = SpeechSynthesizer(engine=engine, cache_dir=None, memory_entries=0)
+
+    for size in args.sizes:
+        for name, language, prefix in TRANSLATION_HOPS:
+            tokenizer, model = models[name]
+            text = passage(language, size)
+            results.setdefault(f"translate:{name}", {})[str(size)] = measure(
+                lambda: translate(text, tokenizer, model, prefix=prefix), args.repeat
+            )
+
+        english = passage("en", size)
+        normalized = normalize_contractions(english)
+        rewritten = phrase_replace(normalized, phrase_mapping)
+        tokens = tag([rewritten])[0]
+        stages = {
+            "normalize_contractions": lambda: normalize_contractions(english),
+            "phrase_replace": lambda: phrase_replace(normalized, phrase_mapping),
+            "spacy_tagging": lambda: tag([rewritten]),
+            "pos_aware_substitution": lambda: [pos_aware_substitution(token) for token in tokens],
+            "tts": lambda: synthesizer.speak(english),
+        }
+        for stage, fn in stages.items():
+            # Don't hammer a real (networked) TTS service
+            repeat = 1 if stage == "tts" and "tts" not in stubbed else args.repeat
+            results.setdefault(stage, {})[str(size)] = measure(fn, repeat)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+            "sizes": list(args.sizes),
+            "stubbed": sorted(set(stubbed)),
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold, min_delta=0.0):
+    """Return (stage, size, baseline, current) for every regression beyond ``threshold``.
+
+    Slowdowns smaller than ``min_delta`` seconds are treated as timer noise.
+    """
+    regressions = []
+    for stage, sizes in report["results"].items():
+        for size, current in sizes.items():
+            previous = baseline["results"].get(stage, {}).get(size)
+            if previous and current > previous * (1 + threshold) and current - previous > min_delta:
+                regressions.append((stage, size, previous, current))
+    return regressions
+
+
+def print_report(report):
+    sizes = report["meta"]["sizes"]
+    print(f"{'stage':<36}" + "".join(f"{f'{s} sent.':>14}" for s in sizes))
+    for stage, by_size in report["results"].items():
+        # Size-independent stages (model loading) are shown in the first column
+        cells = [by_size.get("-")] + [None] * (len(sizes) - 1) if "-" in by_size else [by_size.get(str(s)) for s in sizes]
+        print(f"{stage:<36}" + "".join(f"{c * 1000:>12.2f}ms" if c is not None else f"{'':>14}" for c in cells))
+    if report["meta"]["stubbed"]:
+        print(f"stubbed: {', '.join(report['meta']['stubbed'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="input sizes in sentences")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stub", action="store_true", help="use stub models, tagger and TTS everywhere")
+    parser.add_argument("--model-source", action="append", default=[], metavar="NAME=PATH",
+                        help="use a different (e.g. small local) checkpoint for a registry model")
+    parser.add_argument("--tts-engine", default="silent", help="TTS engine to time (gtts, espeak or silent)")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, e.g. 0.25 = 25%%")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    report = run_suite(args)
+    print_report(report)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("stubbed") != report["meta"]["stubbed"]:
+            print("warning: baseline was recorded with different stubs", file=sys.stderr)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms / 1000)
+        for stage, size, previous, current in regressions:
+            print(f"REGRESSION {stage} [{size}]: {previous * 1000:.2f}ms -> {current * 1000:.2f}ms "
+                  f"(+{(current / previous - 1):.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
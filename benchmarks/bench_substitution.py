@@ -0,0 +1,81 @@
+"""Micro-benchmark: per-token cost of word substitution and output rebuilding.
+
+    python benchmarks/bench_substitution.py --sizes 10 100 1000
+
+Compares the old path (``pos_aware_substitution`` per token, ``" ".join``
+and the punctuation-spacing regex) with ``SubstitutionTable.substitute``.
+Tokens come from spaCy when the model is installed, otherwise from a
+regex tokenizer that tags every word as a NOUN.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import postprocessing  # noqa: E402
+from postprocessing import clean_text_spacing, modern_to_shakespeare, substitution_table  # noqa: E402
+from tagger_service import TaggedToken  # noqa: E402
+
+SAMPLE = (
+    "I came as an ambassador from Edward, but I return as his sworn and deadly enemy. "
+    "He told me to take care of his marriage, but he'll have war instead. "
+    "Thank you for your help! You are always welcome here, my friend. "
+)
+
+
+def legacy_substitution(token, rng=random):
+    original_text = token.text
+    text = original_text.lower()
+    if token.pos_ in ("NOUN", "VERB", "PRON", "ADJ", "ADV", "DET"):
+        subs = modern_to_shakespeare.get(text)
+        if subs:
+            if isinstance(subs, list):
+                subs = rng.choice(subs)
+            if original_text.istitle():
+                subs = subs.capitalize()
+            elif original_text.isupper():
+                subs = subs.upper()
+            return subs
+    return original_text
+
+
+def legacy_rebuild(tokens):
+    return clean_text_spacing(" ".join(legacy_substitution(token) for token in tokens))
+
+
+def tokenize(text):
+    try:
+        return list(postprocessing.tag([text]))[0], "spaCy"
+    except (OSError, ImportError):
+        tokens = [TaggedToken(m.group(1), "NOUN", m.group(2)) for m in re.finditer(r"(\w+|'\w+|[^\w\s])(\s*)", text)]
+        return tokens, "regex"
+
+
+def best_of(fn, tokens, repeat):
+    number = max(1, 20000 // len(tokens))
+    return min(timeit.repeat(lambda: fn(tokens), number=number, repeat=repeat)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="input sizes in tokens")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    all_tokens, tokenizer = tokenize(SAMPLE * (max(args.sizes) // 40 + 1))
+    print(f"tokens from {tokenizer}")
+    print(f"{'tokens':>7} {'legacy':>14} {'table':>14} {'speedup':>8}")
+    for size in args.sizes:
+        tokens = all_tokens[:size]
+        legacy = best_of(legacy_rebuild, tokens, args.repeat)
+        table = best_of(substitution_table.substitute, tokens, args.repeat)
+        print(f"{len(tokens):>7} {legacy / len(tokens) * 1e9:>9.0f}ns/tok {table / len(tokens) * 1e9:>9.0f}ns/tok "
+              f"{legacy / table:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Load generator for the HTTP service (src/server.py).
+
+    python benchmarks/loadtest.py --url http://127.0.0.1:8080 --concurrency 16 --requests 500
+
+Reports throughput, latency percentiles of successful requests and how many
+were rejected with 429.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import time
+
+import aiohttp
+
+CORPUS = [
+    ("English", "I love you, my dear"),
+    ("English", "Indeed, and I am happy about that."),
+    ("English", "I'll only irritate you if I stay. Let me go."),
+    ("English", "That sounds good to me."),
+    ("French", "Je t'aime ma cherie"),
+    ("French", "Bonjour, comment allez-vous ?"),
+    ("Spanish", "Te quiero mucho"),
+    ("Spanish", "Buenos días, amigo mío."),
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run(url, concurrency, total, model, batch_size):
+    counter = itertools.count()
+    latencies, statuses = [], {}
+    endpoint = f"{url.rstrip('/')}/translate" + ("/batch" if batch_size > 1 else "")
+
+    async def worker(session):
+        while True:
+            i = next(counter)
+            if i >= total:
+                return
+            language, text = CORPUS[i % len(CORPUS)]
+            if batch_size > 1:
+                payload = {"texts": [text] * batch_size, "language": language, "model": model}
+            else:
+                payload = {"text": text, "language": language, "model": model}
+            start = time.perf_counter()
+            try:
+                async with session.post(endpoint, json=payload) as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError:
+                status = "error"
+            elapsed = time.perf_counter() - start
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=300)) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+
+    return {
+        "requests": sum(statuses.values()),
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "duration_s": duration,
+        "requests_per_s": sum(statuses.values()) / duration,
+        "ok_per_s": len(latencies) / duration,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--model", default="shakespeare-online")
+    parser.add_argument("--batch-size", type=int, default=1, help="texts per request (>1 uses /translate/batch)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.url, args.concurrency, args.requests, args.model, args.batch_size))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['requests']} requests in {report['duration_s']:.1f}s "
+          f"({report['requests_per_s']:.1f} req/s, {report['ok_per_s']:.1f} ok/s)")
+    print(f"statuses: {report['statuses']}")
+    print(f"latency p50 {report['p50_ms']:.0f} ms  p95 {report['p95_ms']:.0f} ms  "
+          f"p99 {report['p99_ms']:.0f} ms  mean {report['mean_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
+import os
+import time
+
 import streamlit as st
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-import torch
-from gtts import gTTS
-import tempfile
-from postprocessing import postprocess_shakespeare
+from metrics import METRICS, PROFILER, span, trace
+from pipeline import (DRAFT_MODELS, POSTPROCESSED_MODELS, SHAKESPEARE_PREFIX, ShakespearifyPipeline, StagedJob,
+                      stage_workers_from_env)
+from translation import segment_text, stream_translate_segments, translate  # noqa: F401 - translate is re-exported
 
 st.set_page_config(page_title="Shakespeare Style", page_icon="🎭")
 st.title("🎭 Shakespearean Translator")
@@ -11,32 +13,41 @@ st.title("🎭 Shakespearean Translator")
 image_placeholder = st.empty()
 image_placeholder.image("img/shakespear.png", use_container_width=True)
 
+LANGUAGE_NAMES = {"en": "English", "fr": "French", "es": "Spanish"}
+
+# Registry names for the models behind each UI choice
+SHAKESPEARE_MODELS = {
+    "Online pretrained model": "shakespeare-online",
+    "My trained T5 Shakespeare model": "shakespeare-local",
+}
+
 @st.cache_resource
 def load_models():
-    fr_en_tokenizer = AutoTokenizer.from_pretrained("Helsinki-NLP/opus-mt-fr-en")
-    fr_en_model = AutoModelForSeq2SeqLM.from_pretrained("Helsinki-NLP/opus-mt-fr-en")
+    # One pipeline per server: models load lazily (see registry.py) and the
+    # cache, batchers and decoding policy are shared by every session
+    return ShakespearifyPipeline.from_env()
 
-    es_en_tokenizer = AutoTokenizer.from_pretrained("Helsinki-NLP/opus-mt-es-en")
-    es_en_model = AutoModelForSeq2SeqLM.from_pretrained("Helsinki-NLP/opus-mt-es-en")
-
-    shakespeare_tokenizer_online = AutoTokenizer.from_pretrained("Gorilla115/t5-shakespearify-lite")
-    shakespeare_model_online = AutoModelForSeq2SeqLM.from_pretrained("Gorilla115/t5-shakespearify-lite")
+@st.cache_resource
+def load_staged_engine():
+    # Shared by every session: while one request is in beam search, other
+    # requests' MT hop and post-processing keep running on their own stages
+    return load_models().staged(workers=stage_workers_from_env())
 
-    shakespeare_tokenizer_local = AutoTokenizer.from_pretrained("t5-shakespeare/checkpoint-34560/")
-    shakespeare_model_local = AutoModelForSeq2SeqLM.from_pretrained("t5-shakespeare/checkpoint-34560/")
+@st.cache_resource
+def start_metrics_server():
+    # Prometheus scrape endpoint, started once per Streamlit server
+    port = os.environ.get("SHAKESPEARIFY_METRICS_PORT")
+    return METRICS.serve(int(port)) if port else None
 
-    return (fr_en_tokenizer, fr_en_model,
-            es_en_tokenizer, es_en_model,
-            shakespeare_tokenizer_online, shakespeare_model_online,
-            shakespeare_tokenizer_local, shakespeare_model_local)
+# Or dump the metrics to a file (e.g. for node_exporter's textfile collector) after each request
+METRICS_FILE = os.environ.get("SHAKESPEARIFY_METRICS_FILE")
 
-(fr_en_tokenizer, fr_en_model,
- es_en_tokenizer, es_en_model,
- shakespeare_tokenizer_online, shakespeare_model_online,
- shakespeare_tokenizer_local, shakespeare_model_local) = load_models()
+pipeline = load_models()
+staged_engine = load_staged_engine()
+start_metrics_server()
 
-# Language selector
-language = st.selectbox("Select input language:", ("English", "French", "Spanish"))
+# Language selector; auto-detection is opt-in and asks for a choice when it isn't sure
+language = st.selectbox("Select input language:", ("English", "French", "Spanish", "Auto-detect"))
 
 # Default text based on language
 if language == "French":
@@ -54,52 +65,119 @@ model_choice = st.radio(
     ("Online pretrained model", "My trained T5 Shakespeare model")
 )
 
-def translate(text, tokenizer, model, prefix=None):
-    if prefix:
-        text = f"{prefix}: {text}"
-    inputs = tokenizer.encode(text, return_tensors="pt", max_length=512, truncation=True)
-    with torch.no_grad():
-        outputs = model.generate(inputs, max_length=150, num_beams=5, early_stopping=True)
-    return tokenizer.decode(outputs[0], skip_special_tokens=True)
+# Decoding mode: beam search for quality, or greedy decoding streamed token by token
+decoding_mode = st.radio(
+    "Decoding mode:",
+    ("Quality (beam search)", "Streaming (fast first words)"),
+    horizontal=True,
+)
+
+# Long inputs are split into sentences instead of being cut off at 512 tokens
+long_text_mode = st.checkbox("Long text mode (translate sentence by sentence)")
+
+# Greedy decoding for short inputs, beams scaled to input length otherwise
+adaptive_decoding = st.checkbox("Adaptive decoding (faster on short inputs)")
+
+# The lite model drafts tokens for the local checkpoint; the output is the local model's greedy decoding
+assisted_decoding = False
+if SHAKESPEARE_MODELS[model_choice] in DRAFT_MODELS:
+    assisted_decoding = st.checkbox("Assisted decoding (online model drafts, local model verifies; greedy output)")
+
+show_timing = st.checkbox("Show timing")
 
 if st.button("Translate to Shakespearean English"):
     if user_input.strip() == "":
         st.warning("Please enter some text.")
     else:
-        # Step 1: Translate to English if needed
-        if language == "French":
-            english_text = translate(user_input, fr_en_tokenizer, fr_en_model)
-        elif language == "Spanish":
-            english_text = translate(user_input, es_en_tokenizer, es_en_model)
-        else:
-            english_text = user_input
-
-        # Step 2: Translate to Shakespearean English
-        if model_choice == "Online pretrained model":
-            shakespeare_text = translate(
-                english_text,
-                shakespeare_tokenizer_online,
-                shakespeare_model_online,
-                prefix="translate"
-            )
-        else:
-            shakespeare_text = translate(
-                english_text,
-                shakespeare_tokenizer_local,
-                shakespeare_model_local,
-                prefix="translate"
-            )
-            shakespeare_text = postprocess_shakespeare(shakespeare_text)
-        
-
-        # Step 3: Show result
-        st.markdown("### 🎭 Translated to Shakespearean English")
-        st.success(shakespeare_text)
-
-        # Step 4: Speech
-        tts = gTTS(text=shakespeare_text, lang='en')
-        with tempfile.NamedTemporaryFile(delete=True, suffix=".mp3") as fp:
-            tts.save(fp.name)
-            image_placeholder.image("img/shakespeartalking.gif", caption="Shakespeare Speaks", use_container_width=True)
-            st.audio(fp.name, format='audio/mp3')
-
+        with PROFILER.maybe_profile("app"), trace() as spans:
+            # Step 1: Detect the language unless it was chosen manually
+            code, detection = pipeline.resolve_language(user_input, language)
+            if detection is not None and detection.reliable:
+                st.caption(f"Detected language: {LANGUAGE_NAMES[code]} ({detection.confidence:.0%})")
+            elif detection is not None:
+                guess = f" (best guess: {LANGUAGE_NAMES[detection.guess]}, {detection.confidence:.0%})" if detection.guess else ""
+                st.warning(f"Couldn't detect the language reliably{guess}. Please choose the input language above.")
+                st.stop()
+
+            model_name = SHAKESPEARE_MODELS[model_choice]
+            stage_timings = {}
+            if assisted_decoding:
+                try:
+                    draft_model = pipeline.assisted_generator(model_name).draft_model
+                except (ValueError, OSError) as exc:
+                    assisted_decoding = False
+                    st.warning(f"Assisted decoding is unavailable, decoding without it: {exc}")
+
+            if decoding_mode == "Quality (beam search)":
+                # Step 2: MT hop, Shakespeare model and post-processing on the shared
+                # staged engine, so they overlap the stages of other sessions' requests
+                future = staged_engine.submit(
+                    StagedJob(user_input, code, model_name, long_text_mode, adaptive_decoding, assisted_decoding)
+                )
+                with span("staged_translation", model=model_name):
+                    job = future.result()
+                stage_timings = future.timings
+                shakespeare_text = job.shakespeare
+                if long_text_mode:
+                    st.caption(f"Translated in {job.segments} segments.")
+
+                # Step 3: Show result
+                st.markdown("### 🎭 Translated to Shakespearean English")
+                st.success(shakespeare_text)
+            else:
+                # Step 2: Translate to English if needed
+                with span("to_english", language=code):
+                    english_text, segments = pipeline.to_english(user_input, code, long_text_mode, adaptive_decoding)
+                if long_text_mode and code != "en":
+                    st.caption(f"Translated to English in {segments} segments.")
+
+                # Step 3: Show the Shakespearean result as it is decoded
+                st.markdown("### 🎭 Translated to Shakespearean English")
+                with span("shakespeare_model_streaming", model=model_name) as streaming:
+                    tokenizer, model = pipeline.registry.get(model_name)
+                    # Streaming is greedy already, so a draft model only makes it faster
+                    extra = {"assistant_model": draft_model} if assisted_decoding else {}
+                    # In long text mode each sentence is decoded on its own, paragraph by paragraph
+                    paragraphs = segment_text(english_text, tokenizer) if long_text_mode else [[english_text]]
+                    output = st.empty()
+                    shakespeare_text = ""
+                    for index, paragraph in enumerate(paragraphs):
+                        pieces = stream_translate_segments(paragraph, tokenizer, model, prefix=SHAKESPEARE_PREFIX, **extra)
+                        if model_name in POSTPROCESSED_MODELS:
+                            pieces = pipeline.postprocess_stream(pieces, add_starter=index == 0)
+                        if index:
+                            shakespeare_text = shakespeare_text.rstrip() + "\n\n"
+                        for piece in pieces:
+                            if not shakespeare_text:
+                                streaming.set(first_piece_s=round(time.perf_counter() - streaming.start, 3))
+                            shakespeare_text += piece
+                            output.success(shakespeare_text)
+                shakespeare_text = shakespeare_text.strip()
+                if long_text_mode:
+                    st.caption(f"Translated in {sum(len(paragraph) for paragraph in paragraphs)} segments.")
+
+            # Step 4: Speech, synthesized in the background while the text is on screen
+            with span("tts"):
+                speech = pipeline.speak(shakespeare_text, lang="en")
+                with st.spinner("Preparing speech..."):
+                    try:
+                        audio, mime = speech.result()
+                    except Exception as exc:
+                        audio = None
+                        st.warning(f"Speech is unavailable right now: {exc}")
+            if audio is not None:
+                image_placeholder.image("img/shakespeartalking.gif", caption="Shakespeare Speaks", use_container_width=True)
+                st.audio(audio, format=mime)
+
+        if show_timing:
+            with st.expander("Timing", expanded=True):
+                st.table([
+                    {"stage": s.name, "ms": round(s.duration * 1000, 1),
+                     **{k: v for k, v in s.attributes.items() if v is not None}}
+                    for s in spans
+                ] + [
+                    {"stage": f"staged: {name}", "ms": round(run * 1000, 1), "queue_ms": round(wait * 1000, 1)}
+                    for name, (wait, run) in stage_timings.items()
+                ])
+        if METRICS_FILE:
+            METRICS.write(METRICS_FILE)
@@ -0,0 +1,141 @@
+"""Assisted (speculative) decoding: a small draft model proposes tokens that
+the target model verifies in one forward pass.
+
+With greedy decoding, ``generate(assistant_model=draft)`` keeps a drafted
+token only where it equals the target's own argmax, so the output is the
+target's greedy decoding; how much faster it is depends on how many drafted
+tokens get accepted. Both models must share a tokenizer (same vocabulary and
+special tokens), which ``check_compatible`` verifies when a pair is set up.
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+import torch
+
+from decoding import model_id
+from metrics import METRICS, span
+from translation import MAX_INPUT_LENGTH
+
+# Assisted generation verifies drafts against the target's argmax: greedy only
+ASSISTED_KWARGS = {"max_length": 150, "num_beams": 1, "do_sample": False}
+
+
+def check_compatible(tokenizer, model, draft_tokenizer, draft_model):
+    """Raise ValueError unless ``draft_model`` can assist ``model``."""
+    if not hasattr(model, "register_forward_hook") or not hasattr(draft_model, "register_forward_hook"):
+        raise ValueError("assisted decoding needs PyTorch models (SHAKESPEARIFY_BACKEND=pytorch or int8)")
+    problems = []
+    if tokenizer.get_vocab() != draft_tokenizer.get_vocab():
+        problems.append("the tokenizers have different vocabularies")
+    for name in ("pad_token_id", "eos_token_id", "unk_token_id"):
+        if getattr(tokenizer, name, None) != getattr(draft_tokenizer, name, None):
+            problems.append(f"tokenizer {name} differs")
+    # The draft's token ids index the target's logits directly
+    for name in ("vocab_size", "decoder_start_token_id", "eos_token_id", "pad_token_id"):
+        if getattr(model.config, name, None) != getattr(draft_model.config, name, None):
+            problems.append(f"model config {name} differs")
+    if problems:
+        raise ValueError(f"{model_id(draft_model)} can't assist {model_id(model)}: {'; '.join(problems)}")
+
+
+@dataclass
+class AssistedStats:
+    """Counts from assisted ``generate`` calls; add them up with ``+``."""
+
+    tokens: int = 0  # tokens generated
+    target_calls: int = 0  # target forward passes, one per verification round
+    draft_calls: int = 0  # draft forward passes, one per drafted token
+    seconds: float = 0.0
+
+    @property
+    def accepted(self):
+        # Each round keeps the accepted drafts plus one token from the target itself
+        return max(0, self.tokens - self.target_calls)
+
+    @property
+    def acceptance_rate(self):
+        return self.accepted / self.draft_calls if self.draft_calls else None
+
+    @property
+    def tokens_per_target_call(self):
+        return self.tokens / self.target_calls if self.target_calls else None
+
+    def __add__(self, other):
+        return AssistedStats(self.tokens + other.tokens, self.target_calls + other.target_calls,
+                             self.draft_calls + other.draft_calls, self.seconds + other.seconds)
+
+
+class AssistedGenerator:
+    """Greedy generation with ``model``, drafted by ``draft_model``.
+
+    Forward hooks count the passes of both models, but only for calls made
+    through this generator in the current thread, so other requests using
+    the same models don't skew the counts. ``stats`` accumulates them.
+    """
+
+    def __init__(self, tokenizer, model, draft_tokenizer, draft_model):
+        check_compatible(tokenizer, model, draft_tokenizer, draft_model)
+        self.tokenizer = tokenizer
+        self.model = model
+        self.draft_model = draft_model
+        self.name = model_id(model)
+        self.stats = AssistedStats()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hooks = [model.register_forward_hook(self._counter("target")),
+                       draft_model.register_forward_hook(self._counter("draft"))]
+
+    def generate(self, input_ids):
+        """``(outputs, AssistedStats)`` for one input sequence (assisted decoding is unbatched)."""
+        counts = self._local.counts = {"target": 0, "draft": 0}
+        try:
+            start = time.perf_counter()
+            with torch.no_grad():
+                outputs = self.model.generate(input_ids, assistant_model=self.draft_model, **ASSISTED_KWARGS)
+            elapsed = time.perf_counter() - start
+        finally:
+            self._local.counts = None
+
+        # Minus the decoder start token
+        stats = AssistedStats(outputs.shape[-1] - 1, counts["target"], counts["draft"], elapsed)
+        with self._lock:
+            self.stats = self.stats + stats
+        METRICS.inc("shakespearify_generated_tokens_total", stats.tokens,
+                    help="Tokens produced by generate", model=self.name)
+        METRICS.inc("shakespearify_assisted_drafted_tokens_total", stats.draft_calls,
+                    help="Tokens proposed by the draft model in assisted decoding", model=self.name)
+        METRICS.inc("shakespearify_assisted_accepted_tokens_total", stats.accepted,
+                    help="Drafted tokens the target model accepted", model=self.name)
+        return outputs, stats
+
+    def translate(self, text, prefix=None):
+        return self.translate_batch([text], prefix)[0]
+
+    def translate_batch(self, texts, prefix=None):
+        """Translate ``texts`` one ``generate`` call at a time, in order."""
+        results = []
+        total = AssistedStats()
+        with span("generate", model=self.name, assisted=True) as current:
+            for text in texts:
+                if prefix:
+                    text = f"{prefix}: {text}"
+                inputs = self.tokenizer.encode(text, return_tensors="pt", max_length=MAX_INPUT_LENGTH, truncation=True)
+                outputs, stats = self.generate(inputs)
+                total = total + stats
+                results.append(self.tokenizer.decode(outputs[0], skip_special_tokens=True))
+            current.set(batch=len(texts), output_tokens=total.tokens, acceptance_rate=total.acceptance_rate,
+                        tokens_per_target_call=total.tokens_per_target_call)
+        return results
+
+    def close(self):
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+
+    def _counter(self, role):
+        def hook(module, args, output):
+            counts = getattr(self._local, "counts", None)
+            if counts is not None:
+                counts[role] += 1
+        return hook
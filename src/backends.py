@@ -0,0 +1,172 @@
+"""Alternative CPU inference backends for the seq2seq models.
+
+``pytorch`` is the fp32 eager model. ``int8`` applies PyTorch dynamic int8
+quantization to every ``nn.Linear`` at load time. ``onnx`` runs an exported
+ONNX Runtime encoder/decoder (with KV cache) through ``optimum`` (``pip
+install -r requirements-onnx.txt``); export it once with::
+
+    python src/backends.py convert shakespeare-local
+    python src/backends.py parity shakespeare-local --backend onnx
+
+All backends expose ``generate`` so they plug into ``translate()`` unchanged.
+"""
+import argparse
+import os
+import time
+
+import torch
+from transformers import AutoTokenizer
+
+from registry import MODEL_SOURCES, load_pair
+
+BACKENDS = ("pytorch", "int8", "onnx")
+ARTIFACTS_DIR = "artifacts"
+
+# Fixed inputs for the BLEU parity check, per source language
+PARITY_SAMPLES = {
+    "fr": [
+        "Je t'aime ma chérie.",
+        "Je suis venu en ambassadeur, mais je repars en ennemi.",
+        "Le roi a ordonné que les portes soient fermées avant la nuit.",
+        "Ne t'inquiète pas, tout ira bien demain matin.",
+        "Elle m'a dit qu'elle reviendrait avant l'hiver.",
+        "Où est mon épée ? Je dois partir maintenant.",
+    ],
+    "es": [
+        "Te quiero mucho.",
+        "Vine como embajador, pero regreso como enemigo.",
+        "El rey ordenó cerrar las puertas antes de la noche.",
+        "No te preocupes, todo estará bien mañana por la mañana.",
+        "Ella me dijo que volvería antes del invierno.",
+        "¿Dónde está mi espada? Debo irme ahora.",
+    ],
+    "en": [
+        "Indeed, and I am happy about that.",
+        "That sounds good to me.",
+        "I'll only irritate you if I stay. Let me go.",
+        "He told me to take care of his marriage, but he'll have war instead.",
+        "Certainly, your grandmother had a worse match.",
+        "Listen to me, my friend, before you leave this house.",
+    ],
+}
+SOURCE_LANGUAGES = {"fr-en": "fr", "es-en": "es"}
+
+
+def artifact_dir(source, backend):
+    """Where converted artifacts for ``source`` live.
+
+    Local checkpoints get a sibling directory (``checkpoint-34560-onnx``); hub
+    models go under ``artifacts/``.
+    """
+    source = source.rstrip("/")
+    if os.path.isdir(source):
+        return f"{source}-{backend}"
+    return os.path.join(ARTIFACTS_DIR, f"{source.replace('/', '--')}-{backend}")
+
+
+def quantize_int8(model):
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_backend_pair(source, backend="pytorch"):
+    """Load ``(tokenizer, model)`` for ``source`` running on ``backend``.
+
+    Non-PyTorch models are tagged with ``inference_backend`` and report
+    ``source`` as their name, so per-model decoding settings (see
+    decoding.py) follow them; latency estimates are still kept per backend.
+    """
+    if backend == "pytorch":
+        return load_pair(source)
+    if backend == "int8":
+        tokenizer, model = load_pair(source)
+        model = quantize_int8(model)
+        model.inference_backend = backend
+        return tokenizer, model
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        path = artifact_dir(source, backend)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(
+                f"No ONNX export at {path}; run `python src/backends.py convert` for {source} first"
+            )
+        model = ORTModelForSeq2SeqLM.from_pretrained(path, use_cache=True)
+        # Named after the export directory otherwise
+        model.config._name_or_path = source
+        model.inference_backend = backend
+        return AutoTokenizer.from_pretrained(path), model
+    raise ValueError(f"Unknown backend {backend!r}; expected one of {BACKENDS}")
+
+
+def export_onnx(source):
+    """Export ``source`` to ONNX (encoder + decoder with past key values) and return its directory."""
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    path = artifact_dir(source, "onnx")
+    model = ORTModelForSeq2SeqLM.from_pretrained(source, export=True, use_cache=True)
+    model.save_pretrained(path)
+    AutoTokenizer.from_pretrained(source).save_pretrained(path)
+    return path
+
+
+def parity_report(name, backend, sources=MODEL_SOURCES):
+    """Corpus BLEU and latency of ``backend`` against fp32 PyTorch on a fixed sample."""
+    from nltk.translate.bleu_score import SmoothingFunction, corpus_bleu
+    from translation import translate
+
+    source = sources[name]
+    prefix = None if name in SOURCE_LANGUAGES else "translate"
+    sample = PARITY_SAMPLES[SOURCE_LANGUAGES.get(name, "en")]
+
+    def run(tokenizer, model):
+        start = time.perf_counter()
+        outputs = [translate(text, tokenizer, model, prefix=prefix) for text in sample]
+        return outputs, (time.perf_counter() - start) / len(sample)
+
+    reference, reference_latency = run(*load_pair(source))
+    candidate, candidate_latency = run(*load_backend_pair(source, backend))
+    bleu = corpus_bleu(
+        [[ref.split()] for ref in reference],
+        [hyp.split() for hyp in candidate],
+        smoothing_function=SmoothingFunction().method1,
+    )
+    return {
+        "model": name,
+        "backend": backend,
+        "bleu_vs_fp32": bleu,
+        "exact_match": sum(ref == hyp for ref, hyp in zip(reference, candidate)) / len(sample),
+        "fp32_latency_s": reference_latency,
+        "backend_latency_s": candidate_latency,
+        "speedup": reference_latency / candidate_latency if candidate_latency else float("inf"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert models and check backend parity")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="export ONNX artifacts")
+    # No ``choices`` here: argparse would check the empty (default) list against them
+    models_help = f"any of {', '.join(sorted(MODEL_SOURCES))} (default: shakespeare-local)"
+    convert.add_argument("models", nargs="*", help=models_help)
+    parity = commands.add_parser("parity", help="BLEU of a backend against fp32 PyTorch")
+    parity.add_argument("models", nargs="*", help=models_help)
+    parity.add_argument("--backend", default="int8", choices=BACKENDS[1:])
+    args = parser.parse_args(argv)
+    args.models = args.models or ["shakespeare-local"]
+    unknown = [name for name in args.models if name not in MODEL_SOURCES]
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(unknown)} (choose from {', '.join(sorted(MODEL_SOURCES))})")
+
+    for name in args.models:
+        if args.command == "convert":
+            print(f"{name}: exported to {export_onnx(MODEL_SOURCES[name])}")
+        else:
+            report = parity_report(name, args.backend)
+            print(f"{name} [{args.backend}] BLEU vs fp32 {report['bleu_vs_fp32']:.4f}, "
+                  f"exact {report['exact_match']:.0%}, "
+                  f"{report['fp32_latency_s'] * 1000:.0f} ms -> {report['backend_latency_s'] * 1000:.0f} ms "
+                  f"({report['speedup']:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import METRICS, Span, current_trace, trace
+
+_STOP = object()
+DEFAULT_BATCH_SIZE = 8
+
+
+def batch_size_from_env():
+    """``SHAKESPEARIFY_BATCH_SIZE``, the most items ``from_env`` batchers run at once."""
+    return int(os.environ.get("SHAKESPEARIFY_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-item requests into batched calls.
+
+    Callers from any thread ``submit`` one item and get a ``Future``. A
+    background thread takes the first queued item, waits up to
+    ``max_wait_ms`` for more to arrive (or until ``max_batch_size`` items are
+    queued), then runs ``batch_fn`` once over the whole batch. ``batch_fn``
+    must return one result per item, in order.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=DEFAULT_BATCH_SIZE, max_wait_ms=10, name="micro-batcher"):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls, batch_fn, **kwargs):
+        """Build a batcher sized by ``SHAKESPEARIFY_BATCH_SIZE`` / ``SHAKESPEARIFY_BATCH_WAIT_MS``."""
+        kwargs.setdefault("max_batch_size", batch_size_from_env())
+        kwargs.setdefault("max_wait_ms", float(os.environ.get("SHAKESPEARIFY_BATCH_WAIT_MS", 10)))
+        return cls(batch_fn, **kwargs)
+
+    def submit(self, item):
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        future.enqueued_at = time.monotonic()
+        future.trace = current_trace()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def close(self, wait=True):
+        """Stop accepting items; already queued items are still processed."""
+        self._closed = True
+        self._queue.put(_STOP)
+        if wait:
+            self._thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _process(self, batch):
+        # Drop requests whose callers cancelled while they were queued
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        now = time.monotonic()
+        for _, future in batch:
+            # Visible to callers as well, e.g. for per-request timing
+            future.queue_wait = now - future.enqueued_at
+            METRICS.observe("shakespearify_queue_wait_seconds", future.queue_wait,
+                            help="Time requests wait in the micro-batcher", batcher=self._thread.name)
+        # Mean batch size = items / batches
+        METRICS.inc("shakespearify_batches_total", help="Micro-batches run", batcher=self._thread.name)
+        METRICS.inc("shakespearify_batched_items_total", len(batch), help="Items run in micro-batches",
+                    batcher=self._thread.name)
+        try:
+            with trace() as spans:
+                results = list(self.batch_fn([item for item, _ in batch]))
+            if len(results) != len(batch):
+                # zip() would leave the unmatched callers waiting forever
+                raise RuntimeError(f"batch_fn returned {len(results)} results for {len(batch)} items")
+        except Exception as exc:
+            self._report(batch, spans)
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        self._report(batch, spans)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _report(self, batch, spans):
+        # The batch ran on this thread: hand its spans (generate, ...) to every caller's trace()
+        for _, future in batch:
+            if future.trace is not None:
+                wait = Span("batch_queue_wait", {"batch": len(batch)})
+                wait.duration = future.queue_wait
+                future.trace.append(wait)
+                future.trace.extend(spans)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            entry = self._queue.get()
+            if entry is _STOP:
+                break
+            batch, stopping = self._collect(entry)
+            self._process(batch)
+
+        # Items can still be queued behind the stop marker if submit() raced close()
+        leftovers = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP:
+                leftovers.append(entry)
+        for start in range(0, len(leftovers), self.max_batch_size):
+            self._process(leftovers[start:start + self.max_batch_size])
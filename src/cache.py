@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from metrics import METRICS, span
+
+
+def make_key(stage, model_id, params, text):
+    """Content address for one pipeline stage applied to ``text``."""
+    payload = json.dumps([stage, model_id, params or {}, text], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _count_lookup(result):
+    METRICS.inc("shakespearify_cache_lookups_total", help="Translation cache lookups", result=result)
+
+
+class TranslationCache:
+    """Two-tier cache for stage outputs: an in-memory LRU plus optional SQLite.
+
+    Entries are keyed by ``make_key(stage, model_id, params, text)``. When
+    ``path`` is given, every entry is also written to a SQLite file so the
+    cache survives restarts; disk hits are promoted back into memory.
+    """
+
+    def __init__(self, max_entries=2048, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Build a cache from ``SHAKESPEARIFY_CACHE_SIZE`` / ``SHAKESPEARIFY_CACHE_PATH``."""
+        kwargs.setdefault("max_entries", int(os.environ.get("SHAKESPEARIFY_CACHE_SIZE", 2048)))
+        kwargs.setdefault("path", os.environ.get("SHAKESPEARIFY_CACHE_PATH") or None)
+        return cls(**kwargs)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                _count_lookup("hit")
+                return self._memory[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self.disk_hits += 1
+                    _count_lookup("disk_hit")
+                    self._remember(key, row[0])
+                    return row[0]
+            self.misses += 1
+            _count_lookup("miss")
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", (key, value))
+                self._db.commit()
+
+    def get_or_compute(self, stage, model_id, params, text, compute, store=None):
+        """Return the cached output for ``text`` or ``compute(key)`` and store it.
+
+        With ``store``, a computed value is only stored when ``store(value)`` is true.
+        """
+        key = make_key(stage, model_id, params, text)
+        with span("cache_lookup", stage=stage) as current:
+            value = self.get(key)
+            current.set(hit=value is not None)
+        if value is None:
+            value = compute(key)
+            if store is None or store(value):
+                self.set(key, value)
+        return value
+
+    def get_or_compute_many(self, stage, model_id, params, texts, compute_many, store=None):
+        """Batched ``get_or_compute``: ``compute_many`` only sees the missing texts."""
+        texts = list(texts)
+        keys = [make_key(stage, model_id, params, text) for text in texts]
+        with span("cache_lookup", stage=stage) as current:
+            results = [self.get(key) for key in keys]
+            missing = [i for i, value in enumerate(results) if value is None]
+            current.set(hits=len(texts) - len(missing), misses=len(missing))
+        if missing:
+            computed = compute_many([texts[i] for i in missing])
+            for i, value in zip(missing, computed):
+                results[i] = value
+                if store is None or store(value):
+                    self.set(keys[i], value)
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._memory),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache")
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
@@ -0,0 +1,237 @@
+"""Bulk translation of JSONL or CSV files from the command line.
+
+    python src/cli.py corpus.jsonl -o shakespeare.jsonl --language French --workers 4
+    python src/cli.py corpus.csv -o out.csv --text-field sentence --language-field lang --resume
+
+Rows are streamed through a process pool in chunks; each worker process
+holds its own copy of the models, so size ``--workers`` to the memory
+available. Output is written in input order as chunks
+finish, and a checkpoint beside the output records how far it got so an
+interrupted run continues with ``--resume``. Only a bounded number of
+chunks is in flight at a time, so memory stays flat for any input size.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import deque
+from multiprocessing import get_context
+
+from pipeline import InvalidRequest, ShakespearifyPipeline, language_code
+
+OUTPUT_FIELDS = ("shakespeare", "english", "warning", "error")
+DEFAULT_WORKERS = 2
+
+_pipeline = None
+
+
+def get_pipeline():
+    # One pipeline (and so one copy of the models) per process
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = ShakespearifyPipeline.from_env()
+    return _pipeline
+
+
+def _init_worker(threads):
+    import torch
+
+    # Split the cores between workers instead of every worker using all of them
+    torch.set_num_threads(threads)
+    get_pipeline()
+
+
+def _check_row(row, text_field, language_field, default_language):
+    """``(text, language code)`` for a row, or raise ``ValueError`` saying what's wrong with it."""
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+    if text_field not in row:
+        raise ValueError(f"missing field {text_field!r}")
+    text = row[text_field]
+    if text is not None and not isinstance(text, str):
+        raise ValueError(f"field {text_field!r} is not a string")
+    language = (row.get(language_field) if language_field else None) or default_language
+    if not isinstance(language, str):
+        raise ValueError(f"field {language_field!r} is not a string")
+    return text or "", language_code(language)
+
+
+def translate_rows(rows, text_field, language_field, default_language, model, adaptive=False):
+    """Translate a chunk of rows, one pipeline batch per input language.
+
+    Rows that aren't objects, lack a string ``text_field`` or name an
+    unsupported language, and rows of a language batch that fails, are
+    passed through with an ``error`` instead of stopping the run.
+    """
+    pipeline = get_pipeline()
+    output, texts, by_language = [], {}, {}
+    for i, row in enumerate(rows):
+        output.append(dict(row) if isinstance(row, dict) else {"row": row})
+        try:
+            texts[i], language = _check_row(row, text_field, language_field, default_language)
+        except ValueError as exc:
+            output[i]["error"] = str(exc)
+            continue
+        by_language.setdefault(language, []).append(i)
+
+    for language, indices in by_language.items():
+        try:
+            results = pipeline.run_batch([texts[i] for i in indices], language, model, adaptive)
+        except ValueError as exc:
+            for i in indices:
+                output[i]["error"] = str(exc)
+            continue
+        for i, result in zip(indices, results):
+            output[i]["shakespeare"] = result.text
+            output[i]["english"] = result.english
+            if result.warning:
+                output[i]["warning"] = result.warning
+    return output
+
+
+def read_rows(path, fmt):
+    with open(path, newline="", encoding="utf-8") if path != "-" else _stdin() as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _stdin():
+    # Don't let the with-block close the real stdin
+    return open(sys.stdin.fileno(), newline="", encoding="utf-8", closefd=False)
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Writer:
+    """Appends translated rows to the output and checkpoints after each chunk."""
+
+    def __init__(self, path, fmt, checkpoint_path, resume_state=None):
+        self.fmt = fmt
+        self.checkpoint_path = checkpoint_path
+        self.rows_done = resume_state["rows_done"] if resume_state else 0
+        if resume_state:
+            # Drop anything written after the last checkpoint
+            with open(path, "r+b") as f:
+                f.truncate(resume_state["output_bytes"])
+        self.file = open(path, "a" if resume_state else "w", newline="", encoding="utf-8")
+        self.csv_writer = None
+        self.header_written = bool(resume_state and resume_state["output_bytes"])
+
+    def write(self, rows):
+        for row in rows:
+            if self.fmt == "csv":
+                if self.csv_writer is None:
+                    fields = list(row) + [f for f in OUTPUT_FIELDS if f not in row]
+                    self.csv_writer = csv.DictWriter(self.file, fieldnames=fields, extrasaction="ignore")
+                    if not self.header_written:
+                        self.csv_writer.writeheader()
+                        self.header_written = True
+                self.csv_writer.writerow(row)
+            else:
+                self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.rows_done += len(rows)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self._checkpoint()
+
+    def _checkpoint(self):
+        state = {"rows_done": self.rows_done, "output_bytes": self.file.tell()}
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def close(self):
+        self.file.close()
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def run(args):
+    fmt = args.format or ("csv" if args.input.endswith(".csv") else "jsonl")
+    checkpoint_path = args.checkpoint or f"{args.output}.ckpt"
+    state = load_checkpoint(checkpoint_path) if args.resume else None
+    writer = Writer(args.output, fmt, checkpoint_path, state)
+
+    rows = read_rows(args.input, fmt)
+    for _ in range(writer.rows_done):
+        next(rows, None)
+    task_args = (args.text_field, args.language_field, args.language, args.model, args.adaptive_decoding)
+    chunks = chunked(rows, args.chunk_size)
+
+    try:
+        if args.workers <= 1:
+            for chunk in chunks:
+                writer.write(translate_rows(chunk, *task_args))
+                _progress(writer.rows_done)
+        else:
+            threads = max(1, (os.cpu_count() or 1) // args.workers)
+            with get_context("spawn").Pool(args.workers, initializer=_init_worker, initargs=(threads,)) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.apply_async(translate_rows, (chunk,) + task_args))
+                    # Keep a bounded window in flight; results are written in order
+                    while len(pending) >= args.workers * 2:
+                        writer.write(pending.popleft().get())
+                        _progress(writer.rows_done)
+                while pending:
+                    writer.write(pending.popleft().get())
+                    _progress(writer.rows_done)
+    finally:
+        writer.close()
+    print(f"\nDone: {writer.rows_done} rows written to {args.output}", file=sys.stderr)
+    # No checkpoint is written when there were no rows to translate
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+
+def _progress(rows_done):
+    print(f"\r{rows_done} rows", end="", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Translate a JSONL/CSV corpus to Shakespearean English")
+    parser.add_argument("input", help="input .jsonl or .csv file, or - for stdin")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="defaults to the input file extension")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--language", default="English",
+                        help="language of rows without a language field, or auto to detect it")
+    parser.add_argument("--language-field", help="per-row language column (English/French/Spanish, en/fr/es or auto)")
+    parser.add_argument("--model", default="shakespeare-online", choices=("shakespeare-online", "shakespeare-local"))
+    parser.add_argument("--adaptive-decoding", action="store_true",
+                        help="choose beam width and output length per input instead of fixed beam search")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"worker processes, each loading its own models (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--chunk-size", type=int, default=32, help="rows per worker task")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: OUTPUT.ckpt)")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint")
+    args = parser.parse_args(argv)
+    try:
+        language_code(args.language)
+    except InvalidRequest as exc:
+        parser.error(str(exc))
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import math
+import os
+import threading
+from dataclasses import dataclass, field
+
+# Typical output/input token ratio per model (name_or_path); others use length_ratio
+DEFAULT_LENGTH_RATIOS = {
+    "Helsinki-NLP/opus-mt-fr-en": 1.3,
+    "Helsinki-NLP/opus-mt-es-en": 1.3,
+    "Gorilla115/t5-shakespearify-lite": 1.6,
+    "t5-shakespeare/checkpoint-34560/": 1.6,
+}
+
+
+class BudgetReduced(str):
+    """An output decoded with fewer beams than usual to fit the latency budget.
+
+    It reflects the load at the time it was generated, so callers return it
+    but don't cache it.
+    """
+
+
+@dataclass
+class DecodingPolicy:
+    """Chooses beam width and output length from the input length.
+
+    Inputs of at most ``greedy_max_tokens`` tokens are decoded greedily; longer
+    ones get one extra beam per ``tokens_per_beam`` tokens, up to
+    ``max_beams``. ``max_new_tokens`` is the input length times the model's
+    length ratio plus ``length_margin``, capped at ``max_new_tokens_cap``.
+    Input lengths don't count the task prefix (``translate:``).
+
+    With ``latency_budget_ms`` set, the policy keeps a running estimate of
+    seconds per beam-token for each model and backend and drops beams until the predicted
+    generate time fits the budget.
+    """
+
+    greedy_max_tokens: int = 8
+    tokens_per_beam: int = 8
+    max_beams: int = 5
+    length_ratio: float = 1.5
+    length_ratios: dict = field(default_factory=lambda: dict(DEFAULT_LENGTH_RATIOS))
+    length_margin: int = 8
+    max_new_tokens_cap: int = 150
+    latency_budget_ms: float = None
+    smoothing: float = 0.3
+
+    def __post_init__(self):
+        self._cost = {}  # (model id, backend) -> seconds per (sequence x beam x generated token)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Build a policy with the latency budget from ``SHAKESPEARIFY_LATENCY_BUDGET_MS``."""
+        budget = os.environ.get("SHAKESPEARIFY_LATENCY_BUDGET_MS")
+        if budget:
+            kwargs.setdefault("latency_budget_ms", float(budget))
+        return cls(**kwargs)
+
+    def generation_kwargs(self, input_length, model_id=None, backend="pytorch"):
+        """``generate`` keyword arguments for an input of ``input_length`` tokens."""
+        ratio = self.length_ratios.get(model_id, self.length_ratio)
+        max_new_tokens = min(self.max_new_tokens_cap, math.ceil(input_length * ratio) + self.length_margin)
+        num_beams = self._fit_budget((model_id, backend), self.beams(input_length), max_new_tokens)
+
+        kwargs = {"max_new_tokens": max_new_tokens, "num_beams": num_beams}
+        if num_beams > 1:
+            kwargs["early_stopping"] = True
+        return kwargs
+
+    def beams(self, input_length):
+        """Beam width for an input of ``input_length`` tokens, before the latency budget."""
+        if input_length <= self.greedy_max_tokens:
+            return 1
+        extra = math.ceil((input_length - self.greedy_max_tokens) / self.tokens_per_beam)
+        return min(self.max_beams, 1 + extra)
+
+    def observe(self, model_id, seconds, num_beams, new_tokens, batch_size=1, backend="pytorch"):
+        """Record how long a ``generate`` call over ``batch_size`` inputs took, for the latency budget."""
+        work = max(1, batch_size) * num_beams * max(1, new_tokens)
+        key = (model_id, backend)
+        with self._lock:
+            previous = self._cost.get(key)
+            sample = seconds / work
+            self._cost[key] = sample if previous is None else (
+                self.smoothing * sample + (1 - self.smoothing) * previous
+            )
+
+    def cache_params(self):
+        """The settings that affect outputs, for use in cache keys."""
+        return {
+            "policy": "adaptive",
+            "greedy_max_tokens": self.greedy_max_tokens,
+            "tokens_per_beam": self.tokens_per_beam,
+            "max_beams": self.max_beams,
+            "length_ratio": self.length_ratio,
+            "length_ratios": self.length_ratios,
+            "length_margin": self.length_margin,
+            "max_new_tokens_cap": self.max_new_tokens_cap,
+            "latency_budget_ms": self.latency_budget_ms,
+        }
+
+    def _fit_budget(self, cost_key, num_beams, max_new_tokens):
+        if self.latency_budget_ms is None:
+            return num_beams
+        with self._lock:
+            cost = self._cost.get(cost_key)
+        if cost is None:
+            return num_beams
+        budget = self.latency_budget_ms / 1000
+        while num_beams > 1 and cost * num_beams * max_new_tokens > budget:
+            num_beams -= 1
+        return num_beams
+
+
+def model_id(model):
+    """Identifier used to look up per-model settings (the checkpoint name or path).
+
+    Models loaded through backends.py report the PyTorch source they were
+    converted from, so settings keyed by checkpoint apply to every backend.
+    """
+    config = getattr(model, "config", None)
+    return getattr(config, "_name_or_path", None)
+
+
+def model_backend(model):
+    """The inference backend ``model`` runs on (``pytorch``, ``int8`` or ``onnx``)."""
+    return getattr(model, "inference_backend", "pytorch")
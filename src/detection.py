@@ -0,0 +1,85 @@
+"""Input language detection with langdetect.
+
+Only the languages the pipeline can translate are considered: the detector
+loads just their langdetect profiles, so every probability is one of them.
+A guess is trusted when its probability reaches ``threshold`` and the text
+has at least ``min_letters`` letters (a few words are too little to tell
+French from English); otherwise the ``fallback`` language is used and the
+caller can ask for a manual choice or pass on ``detection_warning``.
+"""
+import os
+import threading
+from collections import namedtuple
+
+SUPPORTED_LANGUAGES = ("en", "fr", "es")
+
+# language: the code to route by; guess/confidence: langdetect's best answer
+Detection = namedtuple("Detection", "language guess confidence reliable")
+
+
+class LanguageDetector:
+    def __init__(self, languages=SUPPORTED_LANGUAGES, threshold=0.8, fallback="en", min_letters=20,
+                 trials=30, seed=0):
+        self.languages = tuple(languages)
+        self.threshold = threshold
+        self.fallback = fallback
+        self.min_letters = min_letters
+        self.trials = trials
+        self.seed = seed
+        self._factory = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        threshold = os.environ.get("SHAKESPEARIFY_DETECT_THRESHOLD")
+        return cls(threshold=float(threshold)) if threshold else cls()
+
+    def factory(self):
+        # Profiles are loaded on first use; langdetect is only needed for auto-detection
+        with self._lock:
+            if self._factory is None:
+                from langdetect.detector_factory import PROFILES_DIRECTORY, DetectorFactory
+
+                factory = DetectorFactory()
+                profiles = []
+                for language in self.languages:
+                    with open(os.path.join(PROFILES_DIRECTORY, language), encoding="utf-8") as f:
+                        profiles.append(f.read())
+                factory.load_json_profile(profiles)
+                # Seeded so the same text is always routed the same way
+                factory.set_seed(self.seed)
+                self._factory = factory
+            return self._factory
+
+    def detect(self, text):
+        from langdetect.lang_detect_exception import LangDetectException
+
+        detector = self.factory().create()
+        detector.n_trial = self.trials
+        detector.append(text)
+        try:
+            best = detector.get_probabilities()[0]
+        except (LangDetectException, IndexError):
+            return Detection(self.fallback, None, 0.0, False)
+        letters = sum(c.isalpha() for c in text)
+        reliable = best.prob >= self.threshold and letters >= self.min_letters
+        return Detection(best.lang if reliable else self.fallback, best.lang, best.prob, reliable)
+
+    def detect_many(self, texts):
+        return [self.detect(text) for text in texts]
+
+
+def detection_warning(detection):
+    """Why an untrusted detection was routed to the fallback language, or None."""
+    if detection is None or detection.reliable:
+        return None
+    guess = f"best guess {detection.guess!r} at {detection.confidence:.0%}" if detection.guess else "no guess"
+    return f"language not detected reliably ({guess}); translated as {detection.language!r}"
+
+
+def group_by_language(codes):
+    """Indices of the inputs per language code, in input order."""
+    groups = {}
+    for i, code in enumerate(codes):
+        groups.setdefault(code, []).append(i)
+    return groups
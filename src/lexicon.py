@@ -0,0 +1,421 @@
+"""The phrase, word and starter maps as data files, plus their compiled form.
+
+    python src/lexicon.py check    # report duplicate and unreachable entries
+    python src/lexicon.py build    # compile data/lexicon/*.tsv into lexicon.bin
+
+The maps used by postprocessing.py live in ``data/lexicon/*.tsv``, one
+``KEY<TAB>VALUE[<TAB>VALUE...]`` entry per line. They are compiled into a
+single binary artifact holding open-addressing hash tables: the raw maps,
+every single word in its lower/title/upper spellings with the replacement
+already cased, a token trie for the multi-word phrases and a character trie
+for the starter keys. Build the artifact once (``python src/lexicon.py
+build``); it is then memory-mapped at import, so startup does not grow with
+the lexicon. When it is missing or older than the data files, the first load
+builds a copy in the user cache directory, named by a hash of the data files,
+and later loads map that; the source tree is never written at import.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import zlib
+from collections import namedtuple
+from collections.abc import Mapping
+
+LEXICON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "lexicon")
+SOURCES = {"phrases": "phrases.tsv", "words": "words.tsv", "starters": "starters.tsv"}
+ARTIFACT_NAME = "lexicon.bin"
+CACHE_DIR_ENV = "SHAKESPEARIFY_LEXICON_CACHE_DIR"
+
+MAGIC = b"SHLX"
+VERSION = 2
+SECTIONS = ("phrases", "words", "starters", "variants", "trie", "starter_trie")
+_HEADER = struct.Struct("<4sII")
+_SECTION = struct.Struct("<16sIII")  # name, offset, entries, slots
+_SLOT = struct.Struct("<I")  # record offset + 1, 0 = empty
+_RECORD = struct.Struct("<II")  # key length, value length
+MEMO_SIZE = 1 << 16
+
+# A phrase is matched token by token: a word or one punctuation mark, with the
+# whitespace before it, so "thank you" only matches with exactly one space
+PHRASE_TOKEN = re.compile(r"(\s*)(\w+|[^\w\s])")
+
+Entry = namedtuple("Entry", "key values line")
+
+
+def read_entries(path):
+    """Entries of one data file in file order, duplicates included."""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            key, *values = line.split("\t")
+            if not key or not values:
+                raise ValueError(f"{path}:{number}: expected KEY<TAB>VALUE")
+            entries.append(Entry(key, values, number))
+    return entries
+
+
+def to_mapping(kind, entries):
+    # Phrases always have a list of alternatives; words only when there are several
+    mapping = {}
+    for entry in entries:
+        if kind == "phrases":
+            mapping[entry.key] = list(entry.values)
+        elif kind == "words" and len(entry.values) > 1:
+            mapping[entry.key] = list(entry.values)
+        else:
+            mapping[entry.key] = entry.values[0]
+    return mapping
+
+
+def read_lexicon(directory=LEXICON_DIR):
+    return {kind: read_entries(os.path.join(directory, name)) for kind, name in SOURCES.items()}
+
+
+def check(lexicon, expand_contractions=None):
+    """``(kind, line, key, problem)`` for every duplicate or unreachable entry.
+
+    ``expand_contractions`` (normally ``postprocessing.normalize_contractions``)
+    flags keys that contractions are expanded away from before any lookup.
+    """
+    problems = []
+    for kind, entries in lexicon.items():
+        seen = {}
+        for entry in entries:
+            key = entry.key
+            if key in seen:
+                problems.append((kind, entry.line, key, f"duplicate of line {seen[key]}; this one wins"))
+            seen[key] = entry.line
+            if kind == "words" and len(key.split()) > 1:
+                problems.append((kind, entry.line, key, "multi-word key never matches a single token"))
+            elif kind == "words" and key != key.lower():
+                problems.append((kind, entry.line, key, "not lowercase; lookups are lowercased"))
+            if kind != "starters" and expand_contractions and expand_contractions(key) != key:
+                problems.append((kind, entry.line, key, "contains a contraction, which is expanded before lookup"))
+
+    # Starter keys match case-insensitively, so keys differing only in case collide
+    normalized = {}
+    for entry in lexicon.get("starters", ()):
+        key = entry.key.lower()
+        if key in normalized and normalized[key].key != entry.key:
+            problems.append(("starters", entry.line, entry.key,
+                             f"same key as {normalized[key].key!r} (line {normalized[key].line}); this one wins"))
+        normalized[key] = entry
+    return problems
+
+
+def match_case(original, repl):
+    # 🔠 Match the original token's case
+    if original.istitle():
+        return repl.capitalize()
+    if original.isupper():
+        return repl.upper()
+    return repl
+
+
+def cased(original, subs):
+    # Alternatives stay a sequence so rng.choice draws exactly as before
+    if isinstance(subs, str):
+        return match_case(original, subs)
+    return tuple(match_case(original, option) for option in subs)
+
+
+def case_variants(mapping):
+    """Lower, title and upper spellings of every lowercase key, replacements cased to match."""
+    variants = {}
+    for key, subs in mapping.items():
+        if not subs or key != key.lower():
+            continue
+        for variant in {key, key.capitalize(), key.title(), key.upper()}:
+            if variant.lower() == key:
+                variants[variant] = cased(variant, subs)
+    return variants
+
+
+def phrase_tokens(phrase):
+    return [gap + token for gap, token in PHRASE_TOKEN.findall(phrase.strip().lower())]
+
+
+def build_trie(mapping):
+    """Token trie of the phrases: ``"node<TAB>token" -> (child, replacements or None)``.
+
+    The root is node 0; the first token of a phrase carries no leading space.
+    """
+    edges = {}
+    nodes = 1
+    for phrase, repl in mapping.items():
+        tokens = phrase_tokens(phrase)
+        node = 0
+        for i, token in enumerate(tokens):
+            key = f"{node}\t{token}"
+            child, value = edges.get(key, (None, None))
+            if child is None:
+                child, nodes = nodes, nodes + 1
+            if i == len(tokens) - 1:
+                value = repl
+            edges[key] = (child, value)
+            node = child
+    return edges
+
+
+def build_prefix_trie(mapping):
+    """Character trie of lowercased keys: ``"node<TAB>char" -> (child, value or None)``."""
+    edges = {}
+    nodes = 1
+    for key, value in mapping.items():
+        key = key.lower()
+        node = 0
+        for i, char in enumerate(key):
+            edge = f"{node}\t{char}"
+            child, current = edges.get(edge, (None, None))
+            if child is None:
+                child, nodes = nodes, nodes + 1
+            edges[edge] = (child, value if i == len(key) - 1 else current)
+            node = child
+    return edges
+
+
+def _pack_table(items):
+    # Records are stored in insertion order so iteration keeps the file order
+    capacity = 8
+    while capacity < 2 * len(items):
+        capacity *= 2
+    slots = [0] * capacity
+    records = bytearray()
+    for key, value in items.items():
+        key_bytes = key.encode("utf-8")
+        value_bytes = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        i = zlib.crc32(key_bytes) & (capacity - 1)
+        while slots[i]:
+            i = (i + 1) & (capacity - 1)
+        slots[i] = len(records) + 1
+        records += _RECORD.pack(len(key_bytes), len(value_bytes)) + key_bytes + value_bytes
+    return b"".join(_SLOT.pack(slot) for slot in slots) + bytes(records), capacity
+
+
+def compile_lexicon(lexicon):
+    """The binary artifact for parsed data files (see ``read_lexicon``)."""
+    maps = {kind: to_mapping(kind, entries) for kind, entries in lexicon.items()}
+    tables = {
+        "phrases": maps["phrases"],
+        "words": maps["words"],
+        "starters": maps["starters"],
+        "variants": case_variants(maps["words"]),
+        "trie": build_trie(maps["phrases"]),
+        "starter_trie": build_prefix_trie(maps["starters"]),
+    }
+    offset = _HEADER.size + _SECTION.size * len(SECTIONS)
+    index, blobs = [], []
+    for name in SECTIONS:
+        blob, capacity = _pack_table(tables[name])
+        index.append(_SECTION.pack(name.encode("ascii"), offset, len(tables[name]), capacity))
+        blobs.append(blob)
+        offset += len(blob)
+    return _HEADER.pack(MAGIC, VERSION, len(SECTIONS)) + b"".join(index) + b"".join(blobs)
+
+
+_MISSING = object()
+_NOT_SEEN = object()
+
+
+class MappedTable(Mapping):
+    """Read-only view of one hash table in a compiled lexicon buffer.
+
+    Looked-up keys (hits and misses) are memoized, so the hot path is a plain
+    dict lookup once a word has been seen.
+    """
+
+    def __init__(self, buffer, offset, entries, capacity):
+        self._buffer = buffer
+        self._offset = offset
+        self._entries = entries
+        self._capacity = capacity
+        self._records = offset + capacity * _SLOT.size
+        self._memo = {}
+
+    def _find(self, key):
+        key_bytes = key.encode("utf-8")
+        mask = self._capacity - 1
+        i = zlib.crc32(key_bytes) & mask
+        while True:
+            (slot,) = _SLOT.unpack_from(self._buffer, self._offset + i * _SLOT.size)
+            if not slot:
+                return _MISSING
+            record = self._records + slot - 1
+            key_length, value_length = _RECORD.unpack_from(self._buffer, record)
+            start = record + _RECORD.size
+            if key_length == len(key_bytes) and self._buffer[start:start + key_length] == key_bytes:
+                start += key_length
+                return json.loads(bytes(self._buffer[start:start + value_length]))
+            i = (i + 1) & mask
+
+    def get(self, key, default=None):
+        value = self._memo.get(key, _NOT_SEEN)
+        if value is _NOT_SEEN:
+            if len(self._memo) >= MEMO_SIZE:
+                self._memo.clear()
+            value = self._memo[key] = self._find(key) if isinstance(key, str) else _MISSING
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __iter__(self):
+        position = self._records
+        for _ in range(self._entries):
+            key_length, value_length = _RECORD.unpack_from(self._buffer, position)
+            start = position + _RECORD.size
+            yield bytes(self._buffer[start:start + key_length]).decode("utf-8")
+            position = start + key_length + value_length
+
+    def __len__(self):
+        return self._entries
+
+
+class Lexicon:
+    """A compiled lexicon: ``phrases``, ``words`` and ``starters`` as read-only
+    mappings, plus ``variants``, ``trie`` and ``starter_trie`` for the matchers
+    in postprocessing.py."""
+
+    def __init__(self, buffer):
+        magic, version, count = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a compiled lexicon of this version")
+        self.buffer = buffer
+        for i in range(count):
+            name, offset, entries, capacity = _SECTION.unpack_from(buffer, _HEADER.size + i * _SECTION.size)
+            setattr(self, name.rstrip(b"\0").decode("ascii"), MappedTable(buffer, offset, entries, capacity))
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self):
+        """Short hash of the compiled data; changes whenever any entry does."""
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.sha256(self.buffer).hexdigest()[:16]
+        return self._fingerprint
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            # The mapping stays valid after the file is closed
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def is_stale(path, directory=LEXICON_DIR):
+    if not os.path.exists(path):
+        return True
+    built = os.path.getmtime(path)
+    return any(os.path.getmtime(os.path.join(directory, name)) > built for name in SOURCES.values())
+
+
+def build(directory=LEXICON_DIR, path=None):
+    """Compile the data files into ``path`` (written atomically) and return the bytes."""
+    path = path or os.path.join(directory, ARTIFACT_NAME)
+    data = compile_lexicon(read_lexicon(directory))
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp creates the file 0600; the app may run as another user than the build
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return data
+
+
+def default_cache_dir():
+    """``SHAKESPEARIFY_LEXICON_CACHE_DIR``, else ``$XDG_CACHE_HOME/shakespearify`` (``~/.cache``)."""
+    if CACHE_DIR_ENV in os.environ:
+        return os.environ[CACHE_DIR_ENV] or None
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "shakespearify")
+
+
+def cached_artifact(directory=LEXICON_DIR, cache_dir=None):
+    """Cache path of the artifact for the current data files; it changes with any edit."""
+    digest = hashlib.sha256()
+    for name in SOURCES.values():
+        with open(os.path.join(directory, name), "rb") as f:
+            digest.update(f.read())
+    return os.path.join(cache_dir, f"lexicon-v{VERSION}-{digest.hexdigest()[:16]}.bin")
+
+
+def _open_or_build(directory, cache_dir):
+    path = cached_artifact(directory, cache_dir)
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        build(directory, path)
+    return Lexicon.open(path)
+
+
+_DEFAULT = object()
+
+
+def load_lexicon(directory=LEXICON_DIR, path=None, cache_dir=_DEFAULT):
+    """Memory-map the compiled lexicon, building it into the cache when it is out of date.
+
+    ``SHAKESPEARIFY_LEXICON`` overrides the artifact path. An artifact that is
+    missing, older than the data files, built by another version or
+    unreadable is left alone; the lexicon is built once into ``cache_dir``
+    (default: ``default_cache_dir()``) and mapped from there. With no usable
+    cache directory it is compiled in memory.
+    """
+    path = path or os.environ.get("SHAKESPEARIFY_LEXICON") or os.path.join(directory, ARTIFACT_NAME)
+    if not is_stale(path, directory):
+        try:
+            return Lexicon.open(path)
+        except (ValueError, OSError):
+            pass  # Built by another version or unreadable
+    if cache_dir is _DEFAULT:
+        cache_dir = default_cache_dir()
+    if cache_dir:
+        try:
+            return _open_or_build(directory, cache_dir)
+        except (ValueError, OSError):
+            pass  # Read-only or unwritable cache
+    return Lexicon(compile_lexicon(read_lexicon(directory)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check or compile the Shakespearify lexicon")
+    parser.add_argument("command", choices=("check", "build"))
+    parser.add_argument("--dir", default=LEXICON_DIR, help="directory with phrases/words/starters.tsv")
+    parser.add_argument("-o", "--output", help=f"artifact path (default: DIR/{ARTIFACT_NAME})")
+    args = parser.parse_args(argv)
+
+    lexicon = read_lexicon(args.dir)
+    if args.command == "build":
+        path = args.output or os.path.join(args.dir, ARTIFACT_NAME)
+        data = build(args.dir, path)
+        counts = ", ".join(f"{len(entries)} {kind}" for kind, entries in lexicon.items())
+        print(f"wrote {path} ({len(data)} bytes; {counts})")
+        return
+
+    from postprocessing import normalize_contractions
+
+    problems = check(lexicon, normalize_contractions)
+    for kind, line, key, problem in problems:
+        print(f"{SOURCES[kind]}:{line}: {key!r}: {problem}")
+    if problems:
+        sys.exit(1)
+    print("no problems found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""Lightweight tracing spans and Prometheus-style metrics.
+
+``span("stage")`` times a block, records it in the ``shakespearify_stage_seconds``
+histogram and, inside ``trace()``, adds it to the current request's timing
+list for display. ``METRICS`` can be scraped over HTTP (``serve``) or dumped
+to a file (``write``) in the Prometheus text exposition format.
+"""
+import collections
+import contextlib
+import contextvars
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_current_trace = contextvars.ContextVar("shakespearify_trace", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, help=None, **labels):
+        with self._lock:
+            key = (name, _label_key(labels))
+            self._counters[key] = self._counters.get(key, 0) + value
+            if help:
+                self._help.setdefault(name, help)
+
+    def set(self, name, value, help=None, **labels):
+        """Set a gauge (a value that goes up and down, e.g. a queue depth)."""
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+            if help:
+                self._help.setdefault(name, help)
+
+    def observe(self, name, value, help=None, **labels):
+        with self._lock:
+            key = (name, _label_key(labels))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+            if help:
+                self._help.setdefault(name, help)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: dict(value, buckets=list(value["buckets"])) for key, value in self._histograms.items()}
+            help_text = dict(self._help)
+
+        lines = []
+        for kind, series in (("counter", counters), ("gauge", gauges), ("histogram", histograms)):
+            for name in sorted({name for name, _ in series}):
+                if name in help_text:
+                    lines.append(f"# HELP {name} {help_text[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (series_name, labels), value in sorted(series.items()):
+                    if series_name != name:
+                        continue
+                    if kind != "histogram":
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+                        continue
+                    for bound, count in zip(self.buckets, value["buckets"]):
+                        lines.append(f"{name}_bucket{_format_labels(labels, [('le', str(bound))])} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value['count']}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # Write-then-rename so a node_exporter textfile collector never reads half a file
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Expose ``/metrics`` on a background HTTP server and return it."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+METRICS = Metrics()
+
+
+class Span:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = dict(attributes)
+        self.start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+@contextlib.contextmanager
+def span(name, metrics=METRICS, **attributes):
+    """Time a pipeline stage; extra attributes (token counts, ...) go to the trace."""
+    current = Span(name, attributes)
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - current.start
+        metrics.observe("shakespearify_stage_seconds", current.duration,
+                        help="Time spent in each pipeline stage", stage=name)
+        spans = _current_trace.get()
+        if spans is not None:
+            spans.append(current)
+
+
+@contextlib.contextmanager
+def trace():
+    """Collect the spans finished in this context (this thread) into a list.
+
+    Work handed to other threads reports back by running in a copy of the
+    context (``StagedPipeline``) or by adding its spans to ``current_trace()``
+    of the caller (``MicroBatcher``).
+    """
+    spans = []
+    token = _current_trace.set(spans)
+    try:
+        yield spans
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace():
+    """The list ``trace()`` is collecting spans into in this context, or None."""
+    return _current_trace.get()
+
+
+# Innermost frames of threads blocked waiting for work; left out of profiles
+IDLE_FRAMES = {("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("queue.py", "get"),
+               ("selectors.py", "select")}
+
+
+class StackSampler:
+    """Counts the Python stacks of every thread, sampled every ``interval`` seconds.
+
+    Stacks are keyed by thread name, outermost frame first; threads idling in
+    ``IDLE_FRAMES`` are skipped.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.counts = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self._thread.ident:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.counts[(names.get(ident, str(ident)),) + tuple(reversed(stack))] += 1
+        self.samples += 1
+
+    def folded(self):
+        """The stacks in the folded format read by flamegraph.pl and speedscope."""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(self.counts.items()))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
+class Profiler:
+    """Samples every thread's stack during the next N requests, one .folded file per request.
+
+    A request's model and post-processing work runs on stage and batcher
+    threads, so the sampler looks at all threads rather than the caller's.
+    Only one request is profiled at a time; requests starting while one is
+    being profiled run unprofiled and leave the armed count alone.
+    """
+
+    def __init__(self, directory="profiles", interval=0.005):
+        self.directory = directory
+        self.interval = interval
+        self.remaining = 0
+        self._count = 0
+        self._active = False
+        self._lock = threading.Lock()
+
+    def arm(self, requests):
+        with self._lock:
+            self.remaining = requests
+
+    @contextlib.contextmanager
+    def maybe_profile(self, label="request"):
+        with self._lock:
+            active = self.remaining > 0 and not self._active
+            if active:
+                self.remaining -= 1
+                self._count += 1
+                self._active = True
+                index = self._count
+        if not active:
+            yield None
+            return
+        sampler = StackSampler(self.interval).start()
+        try:
+            yield sampler
+        finally:
+            sampler.stop()
+            with self._lock:
+                self._active = False
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{label}-{os.getpid()}-{index}.folded")
+            with open(path, "w") as f:
+                f.write(sampler.folded())
+
+
+PROFILER = Profiler(os.environ.get("SHAKESPEARIFY_PROFILE_DIR", "profiles"))
+if os.environ.get("SHAKESPEARIFY_PROFILE_REQUESTS"):
+    PROFILER.arm(int(os.environ["SHAKESPEARIFY_PROFILE_REQUESTS"]))
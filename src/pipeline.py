@@ -0,0 +1,400 @@
+"""The Shakespearify translation pipeline, independent of any UI.
+
+``ShakespearifyPipeline`` chains the optional FR/ES -> EN hop, the Shakespeare
+model, rule-based post-processing and text-to-speech. The Streamlit app, the
+HTTP service and batch tools all drive this one object.
+"""
+import os
+import random
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from assisted import ASSISTED_KWARGS, AssistedGenerator
+from batcher import DEFAULT_BATCH_SIZE, MicroBatcher, batch_size_from_env
+from cache import TranslationCache, make_key
+from decoding import BudgetReduced, DecodingPolicy
+from detection import LanguageDetector, detection_warning, group_by_language
+from metrics import span
+from postprocessing import RULES_ID, postprocess_batch, postprocess_shakespeare, postprocess_stream
+from registry import ModelRegistry
+from stages import Stage, StagedPipeline
+from translation import GENERATION_KWARGS, translate_batch, translate_long
+from tts import SpeechSynthesizer
+
+AUTO = "auto"
+# Input language (name or code) -> language code; "auto" detects it per text
+LANGUAGES = {
+    "auto": AUTO, "auto-detect": AUTO,
+    "english": "en", "en": "en",
+    "french": "fr", "fr": "fr",
+    "spanish": "es", "es": "es",
+}
+# Language code -> registry name of the model translating it to English
+TRANSLATION_MODELS = {
+    "fr": "fr-en",
+    "es": "es-en",
+}
+SHAKESPEARE_MODELS = ("shakespeare-online", "shakespeare-local")
+# Model -> the smaller model with the same tokenizer that drafts for it in assisted decoding
+DRAFT_MODELS = {"shakespeare-local": "shakespeare-online"}
+# Models whose raw output still goes through postprocess_shakespeare
+POSTPROCESSED_MODELS = {"shakespeare-local"}
+SHAKESPEARE_PREFIX = "translate"
+LONG_TEXT_WORKERS = 2
+# Worker threads per stage of the staged engine (see ShakespearifyPipeline.staged)
+STAGE_WORKERS = {"to_english": DEFAULT_BATCH_SIZE, "shakespeare": DEFAULT_BATCH_SIZE, "postprocess": 1, "tts": 2}
+# Stages whose workers each wait on a model's micro-batcher
+MODEL_STAGES = ("to_english", "shakespeare")
+
+
+class InvalidRequest(ValueError):
+    """A request naming a language or model the pipeline doesn't offer."""
+
+
+def language_code(language):
+    try:
+        return LANGUAGES[language.lower()]
+    except KeyError:
+        raise InvalidRequest(f"Unsupported language {language!r}; expected English, French, Spanish or auto") from None
+
+
+@dataclass
+class TranslationResult:
+    text: str
+    english: str
+    language: str
+    model: str
+    segments: int = 1
+    # langdetect's probability when the language was auto-detected
+    confidence: Optional[float] = None
+    # Set when detection wasn't trusted and the text went to the fallback language
+    warning: Optional[str] = None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class StagedJob:
+    """One text moving through the staged engine; each stage fills in its fields."""
+
+    text: str
+    language: str = "English"
+    model: str = "shakespeare-online"
+    long_text: bool = False
+    adaptive: bool = False
+    assisted: bool = False
+    code: Optional[str] = None
+    confidence: Optional[float] = None
+    warning: Optional[str] = None
+    english: Optional[str] = None
+    shakespeare: Optional[str] = None
+    segments: int = 1
+    speech: object = field(default=None, repr=False)
+
+    def result(self):
+        return TranslationResult(
+            self.shakespeare, self.english, self.code, self.model, self.segments, self.confidence, self.warning
+        )
+
+
+def _cacheable(text):
+    # Output cut short by the latency budget would otherwise outlive the load that caused it
+    return not isinstance(text, BudgetReduced)
+
+
+def stage_workers_from_env():
+    """``SHAKESPEARIFY_STAGE_WORKERS``, e.g. ``postprocess=2,tts=1``, over ``STAGE_WORKERS``."""
+    workers = dict(STAGE_WORKERS)
+    for part in os.environ.get("SHAKESPEARIFY_STAGE_WORKERS", "").split(","):
+        name, _, count = part.partition("=")
+        if name.strip():
+            workers[name.strip()] = int(count)
+    return workers
+
+
+class ShakespearifyPipeline:
+    def __init__(self, registry=None, cache=None, policy=None, synthesizer=None, detector=None):
+        self.registry = registry or ModelRegistry()
+        self.cache = cache or TranslationCache()
+        self.policy = policy or DecodingPolicy()
+        self.detector = detector or LanguageDetector()
+        self._synthesizer = synthesizer
+        self._batchers = {}
+        self._assisted = {}
+        self._lock = threading.Lock()
+        self.registry.on_unload(self._drop_assisted)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            registry=ModelRegistry.from_env(),
+            cache=TranslationCache.from_env(),
+            policy=DecodingPolicy.from_env(),
+            detector=LanguageDetector.from_env(),
+        )
+
+    @property
+    def synthesizer(self):
+        # Created on first use so text-only callers never set up TTS
+        with self._lock:
+            if self._synthesizer is None:
+                self._synthesizer = SpeechSynthesizer.from_env()
+            return self._synthesizer
+
+    def batcher(self, model_name, prefix=None, adaptive=False, assisted=False):
+        """Shared micro-batcher for one model, so concurrent callers generate together."""
+        key = (model_name, prefix, adaptive, assisted)
+        with self._lock:
+            batcher = self._batchers.get(key)
+            if batcher is None:
+                batcher = MicroBatcher.from_env(
+                    lambda texts: self._generate(model_name, texts, prefix, adaptive, assisted),
+                    name=f"batcher-{model_name}",
+                )
+                self._batchers[key] = batcher
+            return batcher
+
+    def assisted_generator(self, model_name):
+        """``AssistedGenerator`` for ``model_name`` drafted by its ``DRAFT_MODELS`` entry.
+
+        Created (and checked for tokenizer compatibility) for the models the
+        registry currently holds. It is dropped when the registry unloads
+        either model, so eviction frees their memory, and replaced if either
+        has been reloaded since.
+        """
+        if model_name not in DRAFT_MODELS:
+            raise InvalidRequest(f"No draft model for {model_name!r}; assisted decoding supports {sorted(DRAFT_MODELS)}")
+        # Loaded outside the lock: loading takes a while and other callers don't need it
+        tokenizer, model = self.registry.get(model_name)
+        draft_tokenizer, draft_model = self.registry.get(DRAFT_MODELS[model_name])
+        stale = None
+        with self._lock:
+            generator = self._assisted.get(model_name)
+            if generator is not None and (generator.model is not model or generator.draft_model is not draft_model):
+                stale, generator = generator, None
+            if generator is None:
+                generator = self._assisted[model_name] = AssistedGenerator(
+                    tokenizer, model, draft_tokenizer, draft_model
+                )
+        if stale is not None:
+            stale.close()
+        return generator
+
+    def _drop_assisted(self, name):
+        with self._lock:
+            dropped = [self._assisted.pop(target) for target in list(self._assisted)
+                       if name in (target, DRAFT_MODELS[target])]
+        for generator in dropped:
+            generator.close()
+
+    def translate(self, text, model_name, prefix=None, adaptive=False, assisted=False):
+        """One model hop for one text, through the cache and the shared batcher."""
+        return self.cache.get_or_compute(
+            "translate", self.registry.sources[model_name], self._params(prefix, adaptive, assisted), text,
+            lambda key: self.batcher(model_name, prefix, adaptive, assisted)(text),
+            store=_cacheable,
+        )
+
+    def translate_many(self, texts, model_name, prefix=None, adaptive=False, assisted=False):
+        """One model hop for many texts; only cache misses are generated, as one batch."""
+        return self.cache.get_or_compute_many(
+            "translate", self.registry.sources[model_name], self._params(prefix, adaptive, assisted), texts,
+            lambda missing: self._generate(model_name, missing, prefix, adaptive, assisted),
+            store=_cacheable,
+        )
+
+    def translate_long(self, text, model_name, prefix=None, adaptive=False, assisted=False):
+        tokenizer, model = self.registry.get(model_name)
+        batch_fn = None
+        if assisted:
+            generator = self.assisted_generator(model_name)
+
+            def batch_fn(texts):
+                return generator.translate_batch(texts, prefix)
+        return translate_long(
+            text, tokenizer, model, prefix=prefix, workers=LONG_TEXT_WORKERS,
+            policy=self.policy if adaptive else None, batch_fn=batch_fn,
+        )
+
+    @staticmethod
+    def _postprocess_rng(text, add_starter=True):
+        # phrase_replace picks among alternatives at random, so seed it from the
+        # cache key: a given input always gets the same (cacheable) rendering
+        return random.Random(make_key("postprocess", RULES_ID, {"add_starter": add_starter}, text))
+
+    def postprocess(self, text):
+        return self.cache.get_or_compute(
+            "postprocess", RULES_ID, {"add_starter": True}, text,
+            lambda key: postprocess_shakespeare(text, rng=self._postprocess_rng(text)),
+        )
+
+    def postprocess_many(self, texts):
+        return self.cache.get_or_compute_many(
+            "postprocess", RULES_ID, {"add_starter": True}, texts,
+            lambda missing: postprocess_batch(missing, rngs=[self._postprocess_rng(t) for t in missing]),
+        )
+
+    def postprocess_stream(self, pieces, add_starter=True):
+        """``postprocess_stream`` with each sentence seeded like ``postprocess`` seeds a text.
+
+        A one-sentence output streams exactly as ``postprocess`` renders it;
+        longer ones are tagged and rendered sentence by sentence.
+        """
+        return postprocess_stream(pieces, add_starter=add_starter, rng_for=self._postprocess_rng)
+
+    def resolve_language(self, text, language):
+        """``(code, detection)``: a manual choice wins, ``"auto"`` runs the detector.
+
+        ``detection`` is None for a manual choice. An unreliable detection
+        routes to the detector's fallback language; results then carry a
+        ``warning`` saying so.
+        """
+        code = language_code(language)
+        if code != AUTO:
+            return code, None
+        with span("language_detection"):
+            detection = self.detector.detect(text)
+        return detection.language, detection
+
+    def to_english(self, text, language, long_text=False, adaptive=False):
+        """Returns ``(english_text, segments)``; English input passes through."""
+        code, _ = self.resolve_language(text, language)
+        if code == "en":
+            return text, 1
+        model_name = TRANSLATION_MODELS[code]
+        if long_text:
+            return self.translate_long(text, model_name, adaptive=adaptive)
+        return self.translate(text, model_name, adaptive=adaptive), 1
+
+    def run(self, text, language="English", model="shakespeare-online", long_text=False, adaptive=False,
+            assisted=False):
+        """Translate one text all the way to (post-processed) Shakespearean English.
+
+        With ``assisted``, the Shakespeare model decodes greedily with its
+        draft model proposing tokens (see assisted.py); ``adaptive`` then only
+        applies to the translation hop.
+        """
+        self._check_model(model, assisted)
+        code, detection = self.resolve_language(text, language)
+        with span("to_english", language=code):
+            english, segments = self.to_english(text, code, long_text, adaptive)
+        with span("shakespeare_model", model=model):
+            if long_text:
+                shakespeare, segments = self.translate_long(english, model, SHAKESPEARE_PREFIX, adaptive, assisted)
+            else:
+                shakespeare = self.translate(english, model, SHAKESPEARE_PREFIX, adaptive, assisted)
+        if model in POSTPROCESSED_MODELS:
+            with span("postprocess"):
+                shakespeare = self.postprocess(shakespeare)
+        confidence = detection.confidence if detection else None
+        return TranslationResult(shakespeare, english, code, model, segments, confidence, detection_warning(detection))
+
+    def run_batch(self, texts, language="English", model="shakespeare-online", adaptive=False, assisted=False):
+        """Translate many texts; each stage runs as one batch.
+
+        With ``language="auto"`` the texts are grouped by detected language so
+        each translation model gets one full batch; English texts skip it.
+        """
+        self._check_model(model, assisted)
+        texts = list(texts)
+        code = language_code(language)
+        if code == AUTO:
+            with span("language_detection", texts=len(texts)):
+                detections = self.detector.detect_many(texts)
+        else:
+            detections = [None] * len(texts)
+        codes = [d.language if d else code for d in detections]
+
+        english = list(texts)
+        for group, indices in group_by_language(codes).items():
+            if group == "en":
+                continue
+            with span("to_english", language=group, texts=len(indices)):
+                translated = self.translate_many([texts[i] for i in indices], TRANSLATION_MODELS[group], adaptive=adaptive)
+            for i, text in zip(indices, translated):
+                english[i] = text
+        with span("shakespeare_model", model=model, texts=len(texts)):
+            shakespeare = self.translate_many(english, model, SHAKESPEARE_PREFIX, adaptive, assisted)
+        if model in POSTPROCESSED_MODELS:
+            with span("postprocess", texts=len(texts)):
+                shakespeare = self.postprocess_many(shakespeare)
+        return [
+            TranslationResult(s, e, c, model, confidence=d.confidence if d else None, warning=detection_warning(d))
+            for s, e, c, d in zip(shakespeare, english, codes, detections)
+        ]
+
+    def speak(self, text, lang="en"):
+        """Future resolving to ``Speech(audio, mime)``."""
+        return self.synthesizer.submit(text, lang)
+
+    def staged(self, workers=None, queue_size=8, speech=False):
+        """A ``StagedPipeline`` running ``StagedJob`` items through the same steps as ``run``.
+
+        Stages: ``to_english`` (detection and the MT hop), ``shakespeare``,
+        ``postprocess`` and, with ``speech``, ``tts``. Workers of a model
+        stage share the model's micro-batcher, so concurrent items are still
+        generated together. Each worker waits for its item's batch, so model
+        stages get at least ``SHAKESPEARIFY_BATCH_SIZE`` workers; fewer would
+        cap every batch at the stage width.
+        """
+        workers = dict(STAGE_WORKERS, **(workers or {}))
+        batch_size = batch_size_from_env()
+        for name in MODEL_STAGES:
+            workers[name] = max(workers[name], batch_size)
+        stages = [
+            Stage("to_english", self._stage_to_english, workers["to_english"], queue_size),
+            Stage("shakespeare", self._stage_shakespeare, workers["shakespeare"], queue_size),
+            Stage("postprocess", self._stage_postprocess, workers["postprocess"], queue_size),
+        ]
+        if speech:
+            stages.append(Stage("tts", self._stage_tts, workers["tts"], queue_size))
+        return StagedPipeline(stages, name="pipeline")
+
+    def _stage_to_english(self, job):
+        self._check_model(job.model, job.assisted)
+        job.code, detection = self.resolve_language(job.text, job.language)
+        job.confidence = detection.confidence if detection else None
+        job.warning = detection_warning(detection)
+        job.english, job.segments = self.to_english(job.text, job.code, job.long_text, job.adaptive)
+        return job
+
+    def _stage_shakespeare(self, job):
+        if job.long_text:
+            job.shakespeare, job.segments = self.translate_long(
+                job.english, job.model, SHAKESPEARE_PREFIX, job.adaptive, job.assisted
+            )
+        else:
+            job.shakespeare = self.translate(job.english, job.model, SHAKESPEARE_PREFIX, job.adaptive, job.assisted)
+        return job
+
+    def _stage_postprocess(self, job):
+        if job.model in POSTPROCESSED_MODELS:
+            job.shakespeare = self.postprocess(job.shakespeare)
+        return job
+
+    def _stage_tts(self, job):
+        job.speech = self.synthesizer.speak(job.shakespeare, "en")
+        return job
+
+    def _params(self, prefix, adaptive, assisted=False):
+        # Assisted output is the target's greedy decoding, whatever the draft
+        if assisted:
+            params = ASSISTED_KWARGS
+        else:
+            params = self.policy.cache_params() if adaptive else GENERATION_KWARGS
+        # int8 and ONNX outputs differ from fp32, so each backend caches apart
+        return dict(params, prefix=prefix, backend=self.registry.backend)
+
+    def _generate(self, model_name, texts, prefix, adaptive, assisted=False):
+        if assisted:
+            return self.assisted_generator(model_name).translate_batch(texts, prefix)
+        tokenizer, model = self.registry.get(model_name)
+        return translate_batch(texts, tokenizer, model, prefix=prefix, policy=self.policy if adaptive else None)
+
+    def _check_model(self, model, assisted=False):
+        if model not in SHAKESPEARE_MODELS:
+            raise InvalidRequest(f"Unknown Shakespeare model {model!r}; expected one of {SHAKESPEARE_MODELS}")
+        if assisted and model not in DRAFT_MODELS:
+            raise InvalidRequest(f"Assisted decoding needs a draft model; {model!r} has none")
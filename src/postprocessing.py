@@ -1,458 +1,255 @@
-import kagglehub
-import pandas as pd
-from datasets import Dataset, DatasetDict
-from transformers import T5Tokenizer, T5ForConditionalGeneration, TrainingArguments, Trainer, DataCollatorForSeq2Seq
-import evaluate
-import torch
-import matplotlib.pyplot as plt
-from nltk.translate.bleu_score import sentence_bleu
-import spacy
+import os
 import random
 import re
+import threading
+import types
 
-# Load spaCy English model for POS tagging
-nlp = spacy.load("en_core_web_sm")
+from lexicon import PHRASE_TOKEN, build_prefix_trie, build_trie, case_variants, cased, load_lexicon, match_case
+from metrics import span
 
-# Contraction normalization map
+# spaCy English model for POS tagging. Only token.pos_ is read, so every
+# component that doesn't feed the tagger / attribute ruler is left out.
+SPACY_MODEL = "en_core_web_sm"
+SPACY_EXCLUDE = ["parser", "ner", "lemmatizer", "senter"]
+
+_nlp = None
+_tagger_client = None
+_load_lock = threading.Lock()
+
+
+def get_nlp():
+    """Load the spaCy pipeline on first use and share it afterwards."""
+    global _nlp
+    if _nlp is None:
+        with _load_lock:
+            if _nlp is None:
+                import spacy
+                _nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+    return _nlp
+
+
+def __getattr__(name):
+    # Keep ``postprocessing.nlp`` working without loading spaCy at import time
+    if name == "nlp":
+        return get_nlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def use_tagger_service(address):
+    """Tag through a shared tagger_service process instead of a local spaCy copy.
+
+    Pass None to go back to the in-process model. Defaults to
+    ``SHAKESPEARIFY_TAGGER_ADDRESS`` when that is set.
+    """
+    global _tagger_client
+    if address is None:
+        _tagger_client = None
+    else:
+        from tagger_service import TaggerClient
+        _tagger_client = TaggerClient(address)
+
+
+def tag(texts, batch_size=64, n_process=1):
+    """POS-tag ``texts``, returning one sequence of tokens per text."""
+    if _tagger_client is not None:
+        return _tagger_client.tag(texts, batch_size=batch_size)
+    return get_nlp().pipe(texts, batch_size=batch_size, n_process=n_process)
+
+
+if os.environ.get("SHAKESPEARIFY_TAGGER_ADDRESS"):
+    use_tagger_service(os.environ["SHAKESPEARIFY_TAGGER_ADDRESS"])
+
+# Contraction normalization map (keys use a plain ASCII apostrophe)
 contraction_map = {
+    "ain't": "am not",
+    "aren't": "are not",
     "can't": "can not",
-    "won't": "will not",
-    "don't": "do not",
+    "could've": "could have",
+    "couldn't": "could not",
+    "couldn't've": "could not have",
     "didn't": "did not",
+    "doesn't": "does not",
+    "don't": "do not",
+    "hadn't": "had not",
+    "hasn't": "has not",
+    "haven't": "have not",
+    "he'd": "he would",
+    "he'll": "he will",
     "he's": "he is",
-    "she's": "she is",
+    "here's": "here is",
+    "how'd": "how did",
+    "how'll": "how will",
+    "how's": "how is",
+    "i'd": "I would",
+    "i'll": "I will",
+    "i'm": "I am",
+    "i've": "I have",
+    "isn't": "is not",
+    "it'd": "it would",
+    "it'll": "it will",
     "it's": "it is",
+    "let's": "let us",
+    "ma'am": "madam",
+    "mightn't": "might not",
+    "might've": "might have",
+    "mustn't": "must not",
+    "must've": "must have",
+    "needn't": "need not",
+    "oughtn't": "ought not",
+    "shan't": "shall not",
+    "she'd": "she would",
+    "she'll": "she will",
+    "she's": "she is",
+    "should've": "should have",
+    "shouldn't": "should not",
+    "shouldn't've": "should not have",
+    "that'd": "that would",
+    "that'll": "that will",
     "that's": "that is",
+    "there'd": "there would",
+    "there'll": "there will",
     "there's": "there is",
+    "they'd": "they would",
+    "they'll": "they will",
+    "they're": "they are",
+    "they've": "they have",
+    "wasn't": "was not",
+    "we'd": "we would",
+    "we'll": "we will",
+    "we're": "we are",
+    "we've": "we have",
+    "weren't": "were not",
+    "what'll": "what will",
+    "what're": "what are",
     "what's": "what is",
+    "what've": "what have",
+    "when's": "when is",
+    "where'd": "where did",
+    "where's": "where is",
+    "where've": "where have",
+    "who'd": "who would",
+    "who'll": "who will",
+    "who're": "who are",
     "who's": "who is",
-    # add more as needed
+    "who've": "who have",
+    "why's": "why is",
+    "won't": "will not",
+    "would've": "would have",
+    "wouldn't": "would not",
+    "wouldn't've": "would not have",
+    "y'all": "you all",
+    "you'd": "you would",
+    "you'll": "you will",
+    "you're": "you are",
+    "you've": "you have",
 }
 
-def normalize_contractions(text):
-    for contraction, full in contraction_map.items():
-        # Use word boundaries and case-insensitive replacement
-        pattern = re.compile(r'\b' + re.escape(contraction) + r'\b', flags=re.IGNORECASE)
-        text = pattern.sub(full, text)
-    return text
+# Apostrophe look-alikes accepted in place of "'" (right/left single quote, modifier letter)
+APOSTROPHES = "'\u2019\u2018\u02bc"
+_apostrophe_table = str.maketrans({c: "'" for c in APOSTROPHES})
 
-phrase_mapping = {
-    "thank you": ["I thank thee", "I thank ye", "Gramercy"],
-    "good morning": ["Good morrow", "Morrow to thee"],
-    "good evening": ["Good e'en", "Even so"],
-    "do you": ["dost thou"],
-    "will you": ["wilt thou"],
-    "you are": ["thou art"],
-    "do not": ["dost not"],
-    "did not": ["didst not"],
-    "that is": ["that is", "that be"],
-    "what is": ["what is", "what be"],
-    "who is": ["who is", "who be"],
-
-    "oh no": ["Alack", "Alas"],
-    "oh dear": ["Alack-a-day"],
-    "oh my": ["Zounds", "Marry"],
-
-    "it is": ["'tis"],
-    "it was": ["'twas"],
-    "it were": ["'twere"],
-    "it would": ["'twould"],
-    "it shall": ["'tshall"],
-    "could not": ["couldst not"],
-    "would not": ["wouldst not"],
-    "should not": ["shouldst not"],
-    "can not": ["canst not"],
-    "may not": ["mayst not"],
-    "shall not": ["shalt not"],
-    "will not": ["wilt not"],
-
-    "i am": ["I am", "I be"],
-    "you are": ["thou art"],
-    "he is": ["he is", "he be"],
-    "she is": ["she is", "she be"],
-    "they are": ["they are", "they be"],
-    "we are": ["we are", "we be"],
-    "there is": ["there is", "there be"],
-    "there are": ["there are", "there be"],
-    "here is": ["here is", "here be"],
-    "here are": ["here are", "here be"],
-
-    "my friend": ["mine own friend", "my good friend"],
-    "my lord": ["mine own lord", "my good lord"],
-    "my lady": ["mine own lady", "my good lady"],
-    "my love": ["mine own love", "my true love"],
-    "excuse me": ["I crave thy pardon", "Prithee pardon me"],
-    "are you": ["art thou"],
-    "can you": ["canst thou"],
-    "should you": ["shouldst thou"],
-    "how are you": ["How fares thee?", "How dost thou fare?"],
-    "good day": ["Good morrow", "Good den"],
-    "what do you mean": ["What meanst thou?"],
-    "i don't know": ["I wot not"],
-    "i think so": ["Methinks so"],
-    "it seems": ["It doth seem", "It seemeth"],
-    "never mind": ["No matter"],
-    "of course": ["Ay, marry", "Verily"],
-    "go on": ["Proceed", "On with thee"],
-    "come here": ["Come hither", "Come hitherward"],
-    "stand aside": ["Stand aside", "Stand thee aside"],
-    "be quiet": ["Hold thy peace", "Hush"],
-    "by god": ["By my troth", "By my faith"],
-    "what's wrong": ["What troubles thee?", "What aileth thee?"],
-    "don't worry": ["Fret not", "Cease thy fretting"],
-    "i assure you": ["I warrant thee", "I assure thee"],
-    "rest assured": ["Be thou assured"],
-
-    "what's up": ["What aileth thee?", "What news?"],
-    "go away": ["Away with thee"],
-    
-}
 
-def phrase_replace(text, mapping):
-    phrases = sorted(mapping.keys(), key=len, reverse=True)
-    for phrase in phrases:
-        pattern = re.compile(re.escape(phrase), re.IGNORECASE)
-        def replace_func(match):
-            repl = mapping[phrase]
-            if isinstance(repl, list):
-                repl = random.choice(repl)
+def compile_contractions(mapping):
+    alternatives = []
+    for contraction in sorted(mapping, key=len, reverse=True):
+        parts = [re.escape(part) for part in contraction.split("'")]
+        alternatives.append(f"[{APOSTROPHES}]".join(parts))
+    return re.compile(r"\b(?:" + "|".join(alternatives) + r")\b", re.IGNORECASE)
+
+
+contraction_pattern = compile_contractions(contraction_map)
+
+
+def _expand_contraction(match):
+    original = match.group(0)
+    full = contraction_map[original.lower().translate(_apostrophe_table)]
+    if original.isupper() and len(original) > 1:
+        return full.upper()
+    if original[0].isupper():
+        return full[0].upper() + full[1:]
+    return full
+
+
+def normalize_contractions(text):
+    # One precompiled, case-insensitive pass over the text
+    return contraction_pattern.sub(_expand_contraction, text)
+
+# Phrase, word and starter maps are data files compiled by lexicon.py
+LEXICON = load_lexicon()
+# Bump when a rule change alters outputs, so cached post-processing results
+# are not reused; lexicon edits change RULES_ID through the fingerprint
+RULES_VERSION = 2
+RULES_ID = f"rules-v{RULES_VERSION}-{LEXICON.fingerprint}"
+
+phrase_mapping = LEXICON.phrases
+
+class PhraseRewriter:
+    """Rewrites every phrase of a mapping in a single left-to-right pass.
+
+    Phrases are looked up token by token in a trie (see ``lexicon.build_trie``),
+    so at each position the longest phrase wins, the cost does not grow with
+    the number of phrases, and replaced text is never rewritten again by a
+    later rule. Phrases only match on word boundaries.
+    """
+
+    def __init__(self, mapping):
+        self.edges = build_trie(mapping)
+
+    @classmethod
+    def from_trie(cls, edges):
+        rewriter = cls({})
+        rewriter.edges = edges
+        return rewriter
+
+    def rewrite(self, text, rng=random):
+        tokens = [(m.start(2), m.end(), m.group(2).lower(), m.group(0).lower()) for m in PHRASE_TOKEN.finditer(text)]
+        edges = self.edges
+        parts = []
+        last = 0
+        i = 0
+        while i < len(tokens):
+            start = tokens[i][0]
+            if start and re_word_char.match(text, start - 1):
+                i += 1
+                continue
+            node, key, best = 0, tokens[i][2], None
+            for j in range(i, len(tokens)):
+                if j > i:
+                    key = tokens[j][3]
+                edge = edges.get(f"{node}\t{key}")
+                if edge is None:
+                    break
+                node, repl = edge
+                end = tokens[j][1]
+                if repl and not re_word_char.match(text, end):
+                    best = (j, end, repl)
+            if best is None:
+                i += 1
+                continue
+            j, end, repl = best
+            original = text[start:end]
+            repl = rng.choice(repl) if isinstance(repl, (list, tuple)) else repl
+            parts.append(text[last:start])
             # Preserve capitalization style
-            if match.group(0).istitle():
-                repl = repl.capitalize()
-            elif match.group(0).isupper():
-                repl = repl.upper()
-            return repl
-        text = pattern.sub(replace_func, text)
-    return text
+            parts.append(match_case(original, repl))
+            last = end
+            i = j + 1
+        parts.append(text[last:])
+        return "".join(parts)
+
+
+re_word_char = re.compile(r"\w")
+phrase_rewriter = PhraseRewriter.from_trie(LEXICON.trie)
+
+
+def phrase_replace(text, mapping, rng=random):
+    # phrase_mapping is precompiled at import; other mappings are compiled per call
+    rewriter = phrase_rewriter if mapping is phrase_mapping else PhraseRewriter(mapping)
+    return rewriter.rewrite(text, rng)
 
 
 # Map dictionary for single words
-modern_to_shakespeare = {
-    "you": 'thou',
-    "your": "thy",
-    "yours": "thine",
-    "yourself": "thyself",
-    "i": "I",
-    "do": "dost",
-    "does": "doth",
-    "have": "hast",
-    "has": "hath",
-    "are": "art",
-    "were": "wert",
-    
-    # ... extended from contractions
-    "never": "ne'er",
-    "ever": "e'er",
-    "over": "o'er",
-    "before": "ere",
-    "often": "oft",
-    "perhaps": "perchance",
-    "maybe": "haply",
-    "soon": "anon",
-
-    # ... extended from emotions
-    "oh": "O",
-    "wow": "Marry",
-    
-    # Miscellaneous
-    "stop": "cease",
-    "stop": "hold",
-    "listen": "hark",
-    "listen": "mark me",
-    "help me": "aid me",
-    "indeed": "forsooth",
-    "yes": "yea",
-    "no": "nay",
-    "think": "bethink",
-    "know": "wot",
-    "understand": "ken",
-    "give": "bestow",
-    "go": "hie",
-    "come": "approach",
-    "leave": "depart",
-    "run": "hasten",
-    "say": "speak",
-    "says": "saith",
-    "said": "quoth",
-    "ask": "beseech",
-    "tell": "relate",
-    "eat": "feast",
-    "drink": "quaff",
-    "sleep": "slumber",
-    "fight": "duel",
-    "work": "toil",
-    "man": "gentleman",
-    "woman": "gentlewoman",
-    "boy": "lad",
-    "girl": "lass",
-    "child": "bairn",
-    "money": "coin",
-    "food": "victuals",
-    "house": "dwelling",
-    "home": "home",
-    "town": "burgh",
-    "city": "city",
-    "country": "realm",
-    "world": "world",
-    "hate": "hate",
-    "joy": "mirth",
-    "sadness": "sorrow",
-    "anger": "wrath",
-    "fear": "dread",
-    "brave": "valiant",
-    "cowardly": "craven",
-    "wise": "sage",
-    "foolish": "foolish",
-    "beautiful": "fair",
-    "ugly": "ill-favored",
-    "good": "good",
-    "bad": "ill",
-    "truth": "sooth",
-    "lie": "falsehood",
-    "friend": "comrade",
-    "enemy": "foe",
-    "knight": "knight",
-    "doctor": "physician",
-    "teacher": "tutor",
-    "student": "scholar",
-    "book": "tome",
-    "letter": "missive",
-    "sword": "blade",
-    "shield": "buckler",
-    "horse": "steed",
-    "road": "path",
-    "forest": "wood",
-    "river": "stream",
-    "mountain": "mount",
-    "sea": "ocean",
-    "sky": "heavens",
-    "star": "star",
-    "day": "day",
-    "night": "night",
-    "morning": "morn",
-    "evening": "eve",
-    "today": "this day",
-    "tomorrow": "morrow",
-    "yesterday": "yestreen",
-    "now": "anon",
-    "then": "then",
-    "always": "ever",
-    "never": "ne'er",
-    "often": "oft",
-    "seldom": "seldom",
-    "here": "hither",
-    "there": "thither",
-    "where": "whither",
-    "something": "aught",
-    "nothing": "naught",
-    "big": "great",
-    "small": "little",
-    "fast": "swift",
-    "strong": "sturdy",
-    "weak": "feeble",
-    "dirty": "foul",
-    "difficult": "arduous",
-    "finished": "done",
-    "start": "begin",
-    "end": "finish",
-    "goodbye": "adieu",
-    "joy": "mirth",
-    "sorrow": "sorrow",
-    "happiness": "bliss",
-    "misery": "woe",
-    "courage": "valor",
-    "fear": "dread",
-    "ghost": "spectre",
-    "dream": "dream",
-    "reality": "truth",
-    "fantasy": "fancy",
-    "story": "tale",
-    "poem": "verse",
-    "song": "lay",
-    "music": "melody",
-    "science": "knowledge",
-    "punishment": "chastisement",
-    "reward": "recompense",
-    "king": "Monarch",
-    "queen": "Consort",
-    "prince": "Heir",
-    "princess": "Maiden",
-    "lord": "Noble",
-    "lady": "Dame",
-    "servant": "minion",
-    "master": "Master",
-    "mistress": "Mistress",
-    "friendship": "amity",
-    "enmity": "malice",
-    "love": "have affection for",
-    "hatred": "spite",
-    "peace": "concord",
-    "war": "strife",
-    "battle": "conflict",
-    "victory": "triumph",
-    "defeat": "rout",
-    "courage": "metle",
-    "fear": "timidity",
-    "strength": "might",
-    "weakness": "infirmity",
-    "beauty": "comeliness",
-    "ugliness": "deformity",
-    "wealth": "riches",
-    "poverty": "want",
-    "health": "vigor",
-    "sickness": "ailment",
-    "life": "existence",
-    "death": "demise",
-    "world": "cosmos",
-    "earth": "terra",
-    "heaven": "celestial sphere",
-    "hell": "underworld",
-    "sun": "sol",
-    "moon": "luna",
-    "star": "luminary",
-    "day": "daylight",
-    "night": "nightfall",
-    "morning": "dawn",
-    "evening": "dusk",
-    "yesterday": "yester-morn",
-    "tomorrow": "morrow-tide",
-    "now": "presently",
-    "then": "at that moment",
-    "always": "evermore",
-    "never": "nevermore",
-    "often": "full oft",
-    "seldom": "rarely",
-    "here": "in this place",
-    "there": "in that place",
-    "where": "in what place",
-    "everywhere": "in every place",
-    "nowhere": "in no place",
-    "something": "a certain thing",
-    "nothing": "not a thing",
-    "anything": "any manner of thing",
-    "everything": "all things",
-    "someone": "a certain person",
-    "no one": "no person",
-    "anyone": "any person",
-    "everyone": "all persons",
-    "another": "an additional",
-    "other": "remaining",
-    "same": "identical",
-    "different": "distinct",
-    "new": "novel",
-    "old": "ancient",
-    "young": "youthful",
-    "big": "large",
-    "small": "petite",
-    "long": "lengthy",
-    "short": "brief",
-    "wide": "broad",
-    "narrow": "confined",
-    "deep": "profound",
-    "shallow": "superficial",
-    "hot": "sultry",
-    "cold": "frigid",
-    "warm": "tepid",
-    "cool": "chilly",
-    "wet": "damp",
-    "dry": "arid",
-    "light": "luminous",
-    "dark": "obscure",
-    "bright": "radiant",
-    "dim": "faint",
-    "loud": "resonant",
-    "quiet": "silent",
-    "fast": "rapid",
-    "slow": "leisurely",
-    "strong": "robust",
-    "glad" : "gleeful",
-    "weak": "frail",
-    "heavy": "ponderous",
-    "light": "feathery",
-    "clean": "pure",
-    "dirty": "sullied",
-    "easy": "effortless",
-    "help": "succour",
-    "difficult": "arduous",
-    "ready": "prepared",
-    "finished": "completed",
-    "start": "commence",
-    "end": "terminate",
-    "true": "veritable",
-    "false": "untrue",
-    "right": "correct",
-    "wrong": "incorrect",
-    "happy": "joyful",
-    "sad": "sorrowful",
-    "angry": "wroth",
-    "afraid": "Fearful",
-    "brave": "courageous",
-    "cowardly": "dastardly",
-    "wise": "sagacious",
-    "foolish": "senseless",
-    "beautiful": "beauteous",
-    "ugly": "hideous",
-    "good": "virtuous",
-    "bad": "wicked",
-    "sick": "ailing",
-    "healthy": "robust",
-    "dead": "deceased",
-    "alive": "living",
-    "rich": "wealthy",
-    "poor": "impoverished",
-    "hungry": "famished",
-    "thirsty": "parched",
-    "tired": "weary",
-    "rested": "refreshed",
-    "sleepy": "drowsy",
-    "awake": "awakened",
-    "happy": "merrily",
-    "sadly": "sadly",
-    "angrily": "wrathfully",
-    "bravely": "courageously",
-    "cowardly": "dastardly",
-    "wisely": "sagaciously",
-    "foolishly": "senselessly",
-    "beautifully": "beauteously",
-    "uglily": "hideously",
-    "badly": "ill",
-    "sickly": "ailingly",
-    "healthily": "robustly",
-    "deadly": "fatally",
-    "lively": "vibrantly",
-    "richly": "opulently",
-    "poorly": "meagerly",
-    "hungrily": "famishedly",
-    "thirstily": "parchedly",
-    "tiredly": "wearily",
-    "restedly": "refreshingly",
-    "sleepily": "drowsily",
-    "awakely": "awakenedly",
-    "hereabouts": "hereabouts",
-    "quickly": "swiftly",
-    "slowly": "leisurely",
-    "strongly": "sturdily",
-    "weakly": "feebly",
-    "heavily": "ponderously",
-    "lightly": "featherily",
-    "cleanly": "purely",
-    "dirtily": "foully",
-    "easily": "effortlessly",
-    "difficultly": "arduously",
-    "truly": "verily",
-    "today": "this day",
-    "tomorrow": "the morrow",
-    "yesterday": "the yesternight",
-    "now": "presently",
-    "then": "thence",
-    "always": "everlastingly",
-    "never": "nevermore",
-    "often": "oft",
-    "here": "hither",
-    "there": "thither",
-    "where": "whither",
-    
-}
+modern_to_shakespeare = LEXICON.words
 
 # Regex for cleaning space before punctuation
 re_space_before_punct = re.compile(r'\s+([,.!?;:])')
@@ -460,130 +257,232 @@ re_space_before_punct = re.compile(r'\s+([,.!?;:])')
 def clean_text_spacing(text):
     return re_space_before_punct.sub(r'\1', text)
 
-def pos_aware_substitution(token):
-    original_text = token.text
-    text = original_text.lower()
-    pos = token.pos_
+# Parts of speech whose words may be replaced by modern_to_shakespeare
+SUBSTITUTION_POS = frozenset({"NOUN", "VERB", "PRON", "ADJ", "ADV", "DET"})
+
+
+class SubstitutionTable:
+    """Word substitutions precomputed once for fast per-token lookup.
+
+    Every key is stored in its lower, title and upper case spellings with
+    the replacements already cased to match (``lexicon.case_variants``), and
+    only words tagged with one of the ``pos`` parts of speech are replaced,
+    so the common case is a single dict lookup. Other spellings ("yOu") fall
+    back to the lowercase entry. The table is a snapshot: changes to
+    ``mapping`` after construction are not seen.
+    """
+
+    def __init__(self, mapping, pos=SUBSTITUTION_POS):
+        self.pos = frozenset(pos)
+        self._entries = types.MappingProxyType(case_variants(mapping))
+
+    @classmethod
+    def from_variants(cls, variants, pos=SUBSTITUTION_POS):
+        """Use already computed case variants, e.g. the compiled ``LEXICON.variants``."""
+        table = cls({}, pos)
+        table._entries = variants
+        return table
+
+    def lookup(self, text, pos, rng=random):
+        """Replacement for one token, or ``text`` itself when there is none."""
+        if pos not in self.pos:
+            return text
+        subs = self._entries.get(text)
+        if subs is None:
+            subs = self._entries.get(text.lower())
+            if subs is None:
+                return text
+            subs = cased(text, subs)
+        return subs if isinstance(subs, str) else rng.choice(subs)
+
+    def substitute(self, tokens, rng=random):
+        """Rewrite tagged tokens into one string, keeping spaCy's own spacing.
+
+        Tokens are joined with their ``whitespace_``, so contractions stay
+        attached ("he'll"); spaces the input already had before punctuation
+        are kept (see ``clean_text_spacing``).
+        """
+        parts = []
+        lookup = self.lookup
+        for token in tokens:
+            parts.append(lookup(token.text, token.pos_, rng))
+            parts.append(token.whitespace_)
+        if parts:
+            # Like " ".join, don't carry trailing whitespace over
+            parts.pop()
+        return "".join(parts)
+
+
+substitution_table = SubstitutionTable.from_variants(LEXICON.variants)
+
+
+def pos_aware_substitution(token, rng=random):
+    return substitution_table.lookup(token.text, token.pos_, rng)
 
-    if pos in ("NOUN", "VERB", "PRON", "ADJ", "ADV", "DET"):
-        subs = modern_to_shakespeare.get(text)
-        if subs:
-            if isinstance(subs, list):
-                subs = random.choice(subs)
 
-            # 🔠 Match the original token's case
-            if original_text.istitle():
-                subs = subs.capitalize()
-            elif original_text.isupper():
-                subs = subs.upper()
+# Context-aware Shakespearean starter phrases dict
+starters_map = LEXICON.starters
 
-            return subs
 
-    return original_text
+class StarterTrie:
+    """Finds the starter for a text by longest case-insensitive key prefix.
 
+    Keys are lowercased into a character trie (``lexicon.build_prefix_trie``),
+    so a lookup walks at most the length of the longest key whatever the size
+    of the table. A key ending in a letter only matches a whole word ("hi"
+    does not match "his").
+    """
+
+    def __init__(self, mapping):
+        self.edges = build_prefix_trie(mapping)
+
+    @classmethod
+    def from_edges(cls, edges):
+        trie = cls({})
+        trie.edges = edges
+        return trie
+
+    def match(self, text):
+        edges = self.edges
+        text = text.lower()
+        node, best = 0, None
+        for i, char in enumerate(text):
+            edge = edges.get(f"{node}\t{char}")
+            if edge is None:
+                break
+            node, starter = edge
+            if starter is not None and not (
+                re_word_char.match(char) and re_word_char.match(text, i + 1)
+            ):
+                best = starter
+        return best
+
+    def match_many(self, texts):
+        match = self.match
+        return [match(text) for text in texts]
+
+
+starter_trie = StarterTrie.from_edges(LEXICON.starter_trie)
 
-# Context-aware Shakespearean starter phrases dict
-starters_map = {
-    "thank": "I thank thee",
-    "hello": "Good morrow",
-    "hi": "How now",
-    "goodbye": "Fare thee well",
-    "listen": "Hark",
-    "wait": "Stay",
-    "look": "Mark ye",
-    "stop": "Soft you now",
-    "hey": "What ho",
-    "please": "Prithee",
-    "indeed": "Forsooth",
-    "truly": "Verily",
-    "sir": "Gentle sir",
-    "madam": "Mistress",
-    "good morning": "Good morrow",
-    "good evening": "Good e'en",
-    "Indeed, sir,": "Marry, sir,",
-    "Well, sir,": "Marry, sir,",
-    "Honestly,": "Marry, sir,",
-    "I beg you,": "Prithee,",
-    "Goodness gracious,": "By'r lady,",
-    "Wow,": "By'r lady,",
-    "In truth,": "In sooth,",
-    "Truly,": "In sooth,",
-    "Certainly,": "Forsooth,",
-    "Oh no,": "Alack,",
-    "Unfortunately,": "Alack,",
-    "Alas,": "Alack,",
-    "Sadly,": "Alas,",
-    "Hey, listen!": "Hark,",
-    "Hear ye!": "Hark,",
-    "Pay attention,": "Mark ye,",
-    "Notice this,": "Mark ye,",
-    "Listen up,": "Mark ye,",
-    "Hold on a moment,": "Soft you now,",
-    "Wait a minute,": "Soft you now,",
-    "Quietly now,": "Soft you now,",
-    "Wait,": "Stay,",
-    "Hello!": "What ho,",
-    "Hey there!": "What ho,",
-    "What's up?": "What ho,",
-    "What's happening?": "How now,",
-    "What's this?": "How now,",
-    "Well?": "How now,",
-    "Silence!": "Peace,",
-    "Be quiet!": "Peace,",
-    "Quiet!": "Peace,",
-    "My good sir,": "Gentle sir,",
-    "Good morning,": "Good morrow,",
-    "Good evening,": "God ye good den,",
-    "Good day,": "God ye good den,",
-}
 
 def select_starter(text):
-    text_lower = text.lower()
-    for key_phrase, starter in starters_map.items():
-        if text_lower.startswith(key_phrase):
-            return starter
-    return None
+    return starter_trie.match(text)
+
 
-def postprocess_shakespeare(text, prefix_to_remove=None, add_starter=True):
+def select_starters(texts):
+    """``select_starter`` for many texts at once."""
+    return starter_trie.match_many(texts)
+
+
+def prepend_starter(starter, text):
+    # Starters like "Stay," already carry their punctuation
+    if not starter:
+        return text
+    if re_word_char.match(starter[-1]):
+        return f"{starter}, {text}"
+    return f"{starter} {text}"
+
+def capitalize_first_alpha(text):
+    for i, c in enumerate(text):
+        if c.isalpha():
+            return text[:i] + c.upper() + text[i+1:]
+    return text
+
+
+def _rewrite_before_tagging(text, prefix_to_remove, rng):
     # Remove prefix if any
     if prefix_to_remove and text.startswith(prefix_to_remove):
         text = text[len(prefix_to_remove):].strip()
 
     # 1. Normalize contractions
-    text = normalize_contractions(text)
+    with span("normalize_contractions"):
+        text = normalize_contractions(text)
 
     # 2. Phrase-level replacement
-    text = phrase_replace(text, phrase_mapping)
+    with span("phrase_replace"):
+        return phrase_replace(text, phrase_mapping, rng)
 
-    # 3. POS-aware substitution with spaCy
-    doc = nlp(text)
-    substituted_tokens = [pos_aware_substitution(token) for token in doc]
 
-    # 4. Reconstruct text with spaces
-    result = " ".join(substituted_tokens)
+def _rewrite_tagged(doc, add_starter, rng):
+    # 3. POS-aware substitution with spaCy, rebuilt with the tokens' own spacing
+    with span("substitution"):
+        result = substitution_table.substitute(doc, rng)
 
-    # 5. Clean spacing before punctuation
+    # Drop spaces before punctuation that were already in the input ("friend !")
     result = clean_text_spacing(result)
 
-    # 6. Capitalize first letter
-
-    def capitalize_first_alpha(text):
-        for i, c in enumerate(text):
-            if c.isalpha():
-                return text[:i] + c.upper() + text[i+1:]
-        return text  
-
+    # 4. Capitalize first letter
     if result:
         result = capitalize_first_alpha(result)
 
-    # 7. Add Shakespearean starter phrase if requested
+    # 5. Add Shakespearean starter phrase if requested
     if add_starter:
-        starter = select_starter(result)
-        if starter:
-            result = f"{starter}, {result}"
+        with span("starter"):
+            starter = select_starter(result)
+        result = prepend_starter(starter, result)
 
     return result
 
+
+def postprocess_shakespeare(text, prefix_to_remove=None, add_starter=True, rng=random):
+    # Pass a seeded random.Random as rng to make the output reproducible
+    text = _rewrite_before_tagging(text, prefix_to_remove, rng)
+    with span("pos_tagging", texts=1):
+        doc = next(iter(tag([text])))
+    return _rewrite_tagged(doc, add_starter, rng)
+
+
+def postprocess_batch(texts, prefix_to_remove=None, add_starter=True, batch_size=64, n_process=1, rngs=None):
+    """Post-process many texts, tagging them in batches with ``nlp.pipe``.
+
+    Gives the same output as calling ``postprocess_shakespeare`` on each text;
+    ``rngs`` optionally supplies one random generator per text.
+    """
+    texts = list(texts)
+    rngs = [random] * len(texts) if rngs is None else list(rngs)
+    prepared = [_rewrite_before_tagging(text, prefix_to_remove, rng) for text, rng in zip(texts, rngs)]
+    with span("pos_tagging", texts=len(prepared)):
+        docs = list(tag(prepared, batch_size=batch_size, n_process=n_process))
+    results = [_rewrite_tagged(doc, False, rng) for doc, rng in zip(docs, rngs)]
+    if add_starter:
+        with span("starter", texts=len(results)):
+            starters = select_starters(results)
+        results = [prepend_starter(starter, result) for starter, result in zip(starters, results)]
+    return results
+
+# A sentence ends at ., ! or ? (plus closing quotes/brackets) followed by whitespace
+re_sentence_end = re.compile(r'[.!?]+["\')\]]*\s+')
+
+
+def postprocess_stream(pieces, prefix_to_remove=None, add_starter=True, rng=random, rng_for=None):
+    """Post-process streamed text incrementally, one completed sentence at a time.
+
+    ``pieces`` is any iterable of text fragments (e.g. from a generation
+    streamer). Each sentence is yielded, followed by a space, as soon as its
+    end is seen; a starter phrase is only considered for the first one.
+    ``rng_for(sentence, add_starter)``, when given, supplies the random
+    generator for each sentence instead of ``rng``.
+    """
+    buffer = ""
+    first = True
+
+    def render(sentence):
+        starter = add_starter and first
+        return postprocess_shakespeare(sentence, prefix_to_remove if first else None, starter,
+                                       rng_for(sentence, starter) if rng_for else rng)
+
+    for piece in pieces:
+        buffer += piece
+        while True:
+            match = re_sentence_end.search(buffer)
+            if not match:
+                break
+            sentence, buffer = buffer[:match.end()].strip(), buffer[match.end():]
+            yield render(sentence) + " "
+            first = False
+    if buffer.strip():
+        yield render(buffer.strip())
+
 # Example usage
 if __name__ == "__main__":
     sample_text = "Thank you for your help! I can't do this without you."
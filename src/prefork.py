@@ -0,0 +1,267 @@
+"""Pre-forked HTTP service sharing one copy of the model weights.
+
+    python src/prefork.py --port 8080 --processes 4 --workers 2 --report-interval 60
+
+The parent process loads the translation models, the spaCy pipeline and the
+langdetect profiles once, freezes the garbage collector and then forks
+``--processes`` workers that each run the server.py app on one shared
+listening socket. The weights are never written after loading, so their
+pages stay shared copy-on-write between all workers instead of being
+duplicated per process. Workers that die are restarted (with a backoff when
+they keep crashing right after start).
+
+Memory is reported per process from ``/proc/<pid>/smaps_rollup`` (Linux):
+``unique`` (USS) is what a process alone holds, ``shared`` is resident but
+shared with others, and ``pss`` splits shared pages evenly, so the PSS total
+is the real footprint of the whole group. Send ``SIGUSR1`` to the parent for
+a report at any time.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+from cache import TranslationCache
+from decoding import DecodingPolicy
+from detection import LanguageDetector
+from pipeline import ShakespearifyPipeline
+from registry import MODEL_SOURCES, ModelRegistry
+
+POLL_INTERVAL = 0.2
+# A worker that exits sooner than this after starting counts as a crash loop
+MIN_UPTIME = 5.0
+MAX_BACKOFF = 30.0
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+
+def parse_smaps_rollup(text):
+    """``{field: bytes}`` from the contents of a ``/proc/<pid>/smaps_rollup`` file."""
+    values = {}
+    for line in text.splitlines():
+        name, _, rest = line.partition(":")
+        parts = rest.split()
+        if name in SMAPS_FIELDS and len(parts) == 2 and parts[1] == "kB":
+            values[name] = int(parts[0]) * 1024
+    return values
+
+
+def memory_usage(pid):
+    """Resident memory of one process in bytes: rss, pss, unique (USS) and shared."""
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        values = parse_smaps_rollup(f.read())
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "unique": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+        "shared": values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0),
+    }
+
+
+def memory_report(processes):
+    """Table of ``memory_usage`` for ``{label: pid}``; processes that are gone are skipped."""
+    mb = 1024 * 1024
+    lines = [f"{'process':<12}{'pid':>8}{'rss MB':>10}{'pss MB':>10}{'unique MB':>11}{'shared MB':>11}"]
+    total_pss = total_rss = 0
+    for label, pid in processes.items():
+        try:
+            usage = memory_usage(pid)
+        except OSError:
+            continue
+        total_pss += usage["pss"]
+        total_rss += usage["rss"]
+        lines.append(f"{label:<12}{pid:>8}{usage['rss'] / mb:>10.1f}{usage['pss'] / mb:>10.1f}"
+                     f"{usage['unique'] / mb:>11.1f}{usage['shared'] / mb:>11.1f}")
+    lines.append(f"total PSS {total_pss / mb:.1f} MB (sum of RSS {total_rss / mb:.1f} MB)")
+    return "\n".join(lines)
+
+
+def restart_delay(failures):
+    """Seconds to wait before restarting a worker that crashed ``failures`` times in a row."""
+    if failures <= 0:
+        return 0.0
+    return min(MAX_BACKOFF, 2.0 ** (failures - 1))
+
+
+def preload(models, spacy=True):
+    """Build a pipeline with everything the workers share already loaded.
+
+    The translation cache is left memory-only here: a SQLite connection must
+    not cross a fork, so every worker opens its own (see ``serve_worker``).
+    ``SHAKESPEARIFY_PREWARM`` is ignored: its loader thread could hold a lock
+    at fork time that the workers then wait on forever. ``models`` are
+    loaded here instead, before forking.
+    """
+    pipeline = ShakespearifyPipeline(
+        registry=ModelRegistry.from_env(prewarm=False),
+        cache=TranslationCache(),
+        policy=DecodingPolicy.from_env(),
+        detector=LanguageDetector.from_env(),
+    )
+    for name in models:
+        try:
+            pipeline.registry.get(name)
+        except OSError as exc:
+            # Still usable; each worker then loads (and holds) its own copy on first use
+            print(f"not preloaded: {name} ({exc})", file=sys.stderr)
+    try:
+        pipeline.detector.factory()
+    except ImportError:
+        pass
+    if spacy and not os.environ.get("SHAKESPEARIFY_TAGGER_ADDRESS"):
+        import postprocessing
+        try:
+            postprocessing.get_nlp()
+        except (OSError, ImportError) as exc:
+            print(f"not preloaded: {postprocessing.SPACY_MODEL} ({exc})", file=sys.stderr)
+    return pipeline
+
+
+def serve_worker(pipeline, sock, threads, workers, queue_size, staged):
+    """Run the server.py app on the inherited socket (in a forked worker)."""
+    import torch
+    from aiohttp import web
+
+    from server import create_app
+
+    torch.set_num_threads(threads)
+    pipeline.cache = TranslationCache.from_env()
+    app = create_app(pipeline, workers=workers, queue_size=queue_size, staged=staged)
+    web.run_app(app, sock=sock, print=None)
+
+
+class Supervisor:
+    """Forks ``processes`` workers running ``target(slot)`` and restarts them when they exit."""
+
+    def __init__(self, target, processes, report_interval=None):
+        self.target = target
+        self.processes = processes
+        self.report_interval = report_interval
+        self.children = {}  # pid -> slot
+        self.started = {}  # slot -> monotonic start time
+        self.failures = [0] * processes
+        self.stopping = False
+        self._report_requested = False
+
+    def spawn(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            # Worker: never return into the supervisor loop
+            code = 0
+            try:
+                for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+                    signal.signal(signum, signal.SIG_DFL)
+                self.target(slot)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = slot
+        self.started[slot] = time.monotonic()
+        return pid
+
+    def workers(self):
+        """``{label: pid}`` of the running workers, for ``memory_report``."""
+        return {f"worker-{slot}": pid for pid, slot in sorted(self.children.items(), key=lambda item: item[1])}
+
+    def report(self):
+        processes = {"parent": os.getpid(), **self.workers()}
+        print(memory_report(processes), file=sys.stderr, flush=True)
+
+    def stop(self, signum=None, frame=None):
+        # A second signal kills workers that don't shut down on their own
+        kill = signal.SIGKILL if self.stopping else signal.SIGTERM
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, kill)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGUSR1, self._request_report)
+        for slot in range(self.processes):
+            self.spawn(slot)
+
+        restarts = {}  # slot -> monotonic time to restart at
+        next_report = time.monotonic() + self.report_interval if self.report_interval else None
+        # Keep going while workers run or wait to be restarted
+        while self.children or (restarts and not self.stopping):
+            self._reap(restarts)
+            now = time.monotonic()
+            for slot, at in list(restarts.items()):
+                if self.stopping:
+                    restarts.clear()
+                elif now >= at:
+                    del restarts[slot]
+                    self.spawn(slot)
+            if self._report_requested or (next_report is not None and now >= next_report):
+                self._report_requested = False
+                if next_report is not None:
+                    next_report = now + self.report_interval
+                self.report()
+            time.sleep(POLL_INTERVAL)
+
+    def _reap(self, restarts):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self.children.pop(pid, None)
+            if slot is None or self.stopping:
+                continue
+            uptime = time.monotonic() - self.started[slot]
+            self.failures[slot] = self.failures[slot] + 1 if uptime < MIN_UPTIME else 0
+            delay = restart_delay(self.failures[slot])
+            print(f"worker-{slot} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)} "
+                  f"after {uptime:.1f}s; restarting in {delay:.0f}s", file=sys.stderr, flush=True)
+            restarts[slot] = time.monotonic() + delay
+
+    def _request_report(self, signum, frame):
+        self._report_requested = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shakespearify HTTP service with pre-forked workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--processes", type=int, default=2, help="worker processes sharing the weights")
+    parser.add_argument("--workers", type=int, default=2, help="pipeline threads per process")
+    parser.add_argument("--queue-size", type=int, default=16, help="requests allowed to wait, per process")
+    parser.add_argument("--staged", action="store_true", help="run /translate on the staged engine (see server.py)")
+    parser.add_argument("--models", nargs="+", default=list(MODEL_SOURCES), help="models to load before forking")
+    parser.add_argument("--no-spacy", action="store_true", help="don't load spaCy in the parent")
+    parser.add_argument("--report-interval", type=float, help="print a memory report every N seconds")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        parser.error("pre-forked workers need os.fork (Linux or macOS)")
+
+    pipeline = preload(args.models, spacy=not args.no_spacy)
+    sock = socket.create_server((args.host, args.port), backlog=1024)
+    # Move everything loaded so far out of the collector's reach, so collections
+    # in the workers don't write to (and so un-share) those objects' pages
+    gc.collect()
+    gc.freeze()
+
+    threads = max(1, (os.cpu_count() or 1) // args.processes)
+    supervisor = Supervisor(
+        lambda slot: serve_worker(pipeline, sock, threads, args.workers, args.queue_size, args.staged),
+        args.processes, report_interval=args.report_interval,
+    )
+    print(f"Serving on http://{args.host}:{args.port} with {args.processes} processes", file=sys.stderr)
+    supervisor.run()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
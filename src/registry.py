@@ -0,0 +1,183 @@
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+# Registry name -> HuggingFace hub id or local checkpoint directory
+MODEL_SOURCES = {
+    "fr-en": "Helsinki-NLP/opus-mt-fr-en",
+    "es-en": "Helsinki-NLP/opus-mt-es-en",
+    "shakespeare-online": "Gorilla115/t5-shakespearify-lite",
+    "shakespeare-local": "t5-shakespeare/checkpoint-34560/",
+}
+
+
+def load_pair(source):
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    model = AutoModelForSeq2SeqLM.from_pretrained(source)
+    model.eval()
+    return tokenizer, model
+
+
+def _state_tensors(value):
+    # Dynamically quantized layers keep a packed (weight, bias) tuple in the
+    # state_dict instead of parameters; dtypes and other extras are skipped
+    if hasattr(value, "numel") and hasattr(value, "element_size"):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _state_tensors(item)
+
+
+def model_nbytes(model):
+    """Approximate resident size of a model's weights in bytes.
+
+    Measured from the ``state_dict`` so int8 models' packed weights count;
+    tensors shared between entries (tied embeddings) are counted once.
+    """
+    if not hasattr(model, "state_dict"):
+        # ONNX Runtime models: use the size of the exported graphs on disk
+        path = getattr(model, "model_save_dir", None)
+        if path is None:
+            return 0
+        path = str(path)
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path) if f.endswith((".onnx", ".onnx_data")))
+    sizes = {}
+    for value in model.state_dict().values():
+        for tensor in _state_tensors(value):
+            sizes[tensor.data_ptr()] = tensor.numel() * tensor.element_size()
+    return sum(sizes.values())
+
+
+class ModelRegistry:
+    """Loads tokenizer/model pairs the first time they are requested.
+
+    Loaded pairs are kept in least-recently-used order. When ``memory_budget_mb``
+    is set, the least recently used pairs are dropped until the loaded models
+    fit the budget again (the pair just requested is always kept).
+    ``backend`` names what ``loader`` produces (see backends.py); outputs
+    differ between backends, so it is part of translation cache keys.
+    """
+
+    def __init__(self, sources=None, memory_budget_mb=None, loader=load_pair, backend="pytorch"):
+        self.sources = dict(MODEL_SOURCES if sources is None else sources)
+        self.backend = backend
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024) if memory_budget_mb else None
+        self._loader = loader
+        self._loaded = OrderedDict()  # name -> (tokenizer, model, nbytes)
+        self._load_locks = {}
+        self._unload_callbacks = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, prewarm=True, **kwargs):
+        """Build a registry configured from ``SHAKESPEARIFY_*`` environment variables.
+
+        ``SHAKESPEARIFY_MEMORY_BUDGET_MB`` sets the eviction budget,
+        ``SHAKESPEARIFY_PREWARM`` is a comma-separated list of names loaded in
+        the background right away (unless ``prewarm`` is False) and
+        ``SHAKESPEARIFY_BACKEND`` picks the inference backend (``pytorch``,
+        ``int8`` or ``onnx``, see backends.py).
+        """
+        backend = os.environ.get("SHAKESPEARIFY_BACKEND", "pytorch")
+        if backend != "pytorch":
+            from backends import load_backend_pair
+            kwargs.setdefault("loader", functools.partial(load_backend_pair, backend=backend))
+        budget = os.environ.get("SHAKESPEARIFY_MEMORY_BUDGET_MB")
+        registry = cls(memory_budget_mb=float(budget) if budget else None, backend=backend, **kwargs)
+        names = [name.strip() for name in os.environ.get("SHAKESPEARIFY_PREWARM", "").split(",") if name.strip()]
+        if prewarm and names:
+            registry.prewarm(names)
+        return registry
+
+    def get(self, name):
+        """Return ``(tokenizer, model)`` for ``name``, loading it on first use."""
+        if name not in self.sources:
+            raise KeyError(f"Unknown model {name!r}; expected one of {sorted(self.sources)}")
+
+        with self._lock:
+            entry = self._touch(name)
+            if entry is not None:
+                return entry
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Only one thread loads a given model; others wait for it here
+        with load_lock:
+            with self._lock:
+                entry = self._touch(name)
+                if entry is not None:
+                    return entry
+            tokenizer, model = self._loader(self.sources[name])
+            with self._lock:
+                self._loaded[name] = (tokenizer, model, model_nbytes(model))
+                evicted = self._evict(keep=name)
+        self._notify_unloaded(evicted)
+        return tokenizer, model
+
+    def prewarm(self, names, background=True):
+        """Load ``names`` ahead of time, in a daemon thread unless ``background`` is False."""
+        names = list(names)
+
+        def run():
+            for name in names:
+                self.get(name)
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="model-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def unload(self, name):
+        with self._lock:
+            unloaded = self._loaded.pop(name, None) is not None
+        if unloaded:
+            self._notify_unloaded([name])
+        return unloaded
+
+    def on_unload(self, callback):
+        """Call ``callback(name)`` whenever a model is unloaded or evicted.
+
+        Lets holders of extra references (e.g. assisted decoding) let go so
+        the memory is actually freed.
+        """
+        self._unload_callbacks.append(callback)
+
+    def loaded(self):
+        """Names of the loaded models, least recently used first."""
+        with self._lock:
+            return list(self._loaded)
+
+    def memory_usage(self):
+        with self._lock:
+            return sum(entry[2] for entry in self._loaded.values())
+
+    def _touch(self, name):
+        entry = self._loaded.get(name)
+        if entry is None:
+            return None
+        self._loaded.move_to_end(name)
+        return entry[0], entry[1]
+
+    def _evict(self, keep):
+        evicted = []
+        if self.memory_budget is None:
+            return evicted
+        total = sum(entry[2] for entry in self._loaded.values())
+        for name in list(self._loaded):
+            if total <= self.memory_budget:
+                break
+            if name == keep:
+                continue
+            total -= self._loaded.pop(name)[2]
+            evicted.append(name)
+        return evicted
+
+    def _notify_unloaded(self, names):
+        # Called outside the lock so callbacks may use the registry
+        for name in names:
+            for callback in self._unload_callbacks:
+                callback(name)
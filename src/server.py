@@ -0,0 +1,209 @@
+"""Headless HTTP service for the translation pipeline.
+
+    python src/server.py --port 8080 --workers 4 --queue-size 32
+
+Endpoints:
+
+* ``POST /translate`` with ``{"text", "language"?, "model"?, "long_text"?, "adaptive"?, "assisted"?}``
+* ``POST /translate/batch`` with ``{"texts": [...], "language"?, "model"?, "adaptive"?, "assisted"?}``
+
+``adaptive`` (default false) picks beam width and output length per input
+with the decoding policy instead of fixed beam search (see decoding.py).
+* ``GET /healthz``
+* ``GET /metrics`` (Prometheus text format, see metrics.py)
+
+Requests run on a pool of ``--workers`` threads. At most ``--queue-size``
+more may wait for a worker; beyond that the service answers 429 so clients
+back off instead of piling up latency. With ``--staged``, single translations
+run on the staged engine instead (see stages.py), so one request's
+post-processing overlaps another's generation; ``/healthz`` then reports
+each stage's utilization and queue depth.
+"""
+import argparse
+import asyncio
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from metrics import METRICS
+from pipeline import InvalidRequest, ShakespearifyPipeline, StagedJob, stage_workers_from_env
+from stages import StagedPipeline
+
+
+class Admission:
+    """Counts requests in flight and rejects those beyond workers + queue size."""
+
+    def __init__(self, workers, queue_size):
+        self.capacity = workers + queue_size
+        self.in_flight = 0
+
+    def try_enter(self):
+        if self.in_flight >= self.capacity:
+            return False
+        self.in_flight += 1
+        return True
+
+    def leave(self):
+        self.in_flight -= 1
+
+
+PIPELINE = web.AppKey("pipeline", ShakespearifyPipeline)
+ADMISSION = web.AppKey("admission", Admission)
+EXECUTOR = web.AppKey("executor", ThreadPoolExecutor)
+STAGED = web.AppKey("staged", StagedPipeline)
+
+
+def too_many_requests():
+    return web.HTTPTooManyRequests(
+        text='{"error": "server busy, retry later"}',
+        content_type="application/json",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def run_in_pool(request, fn, *args):
+    admission = request.app[ADMISSION]
+    if not admission.try_enter():
+        raise too_many_requests()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(request.app[EXECUTOR], fn, *args)
+    finally:
+        admission.leave()
+
+
+async def run_staged(request, job):
+    admission = request.app[ADMISSION]
+    if not admission.try_enter():
+        raise too_many_requests()
+    try:
+        # Never block the event loop on a full first stage
+        future = request.app[STAGED].submit(job, block=False)
+    except queue.Full:
+        admission.leave()
+        raise too_many_requests() from None
+    try:
+        return (await asyncio.wrap_future(future)).result()
+    finally:
+        admission.leave()
+
+
+async def read_json(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="request body must be JSON") from None
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="request body must be a JSON object")
+    return body
+
+
+def string_field(body, name, default):
+    value = body.get(name, default)
+    if not isinstance(value, str):
+        raise web.HTTPBadRequest(text=f"'{name}' must be a string")
+    return value
+
+
+def bool_field(body, name, default=False):
+    value = body.get(name, default)
+    if not isinstance(value, bool):
+        raise web.HTTPBadRequest(text=f"'{name}' must be true or false")
+    return value
+
+
+async def translate_handler(request):
+    body = await read_json(request)
+    text = body.get("text")
+    if not isinstance(text, str) or not text.strip():
+        raise web.HTTPBadRequest(text="'text' must be a non-empty string")
+    pipeline = request.app[PIPELINE]
+    language = string_field(body, "language", "English")
+    model = string_field(body, "model", "shakespeare-online")
+    long_text = bool_field(body, "long_text")
+    adaptive = bool_field(body, "adaptive")
+    assisted = bool_field(body, "assisted")
+    try:
+        if STAGED in request.app:
+            result = await run_staged(request, StagedJob(text, language, model, long_text, adaptive, assisted))
+        else:
+            result = await run_in_pool(request, pipeline.run, text, language, model, long_text, adaptive, assisted)
+    except InvalidRequest as exc:
+        # Only the pipeline's own input checks; other errors are server faults (500)
+        raise web.HTTPBadRequest(text=str(exc)) from None
+    return web.json_response(result.to_dict())
+
+
+async def translate_batch_handler(request):
+    body = await read_json(request)
+    texts = body.get("texts")
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        raise web.HTTPBadRequest(text="'texts' must be a list of strings")
+    pipeline = request.app[PIPELINE]
+    language = string_field(body, "language", "English")
+    model = string_field(body, "model", "shakespeare-online")
+    adaptive = bool_field(body, "adaptive")
+    assisted = bool_field(body, "assisted")
+    try:
+        results = await run_in_pool(request, pipeline.run_batch, texts, language, model, adaptive, assisted)
+    except InvalidRequest as exc:
+        # Only the pipeline's own input checks; other errors are server faults (500)
+        raise web.HTTPBadRequest(text=str(exc)) from None
+    return web.json_response({"results": [result.to_dict() for result in results]})
+
+
+async def health_handler(request):
+    admission = request.app[ADMISSION]
+    health = {
+        "status": "ok",
+        "in_flight": admission.in_flight,
+        "capacity": admission.capacity,
+        "models_loaded": request.app[PIPELINE].registry.loaded(),
+    }
+    if STAGED in request.app:
+        health["stages"] = request.app[STAGED].stats()
+        health["bottleneck"] = request.app[STAGED].bottleneck()
+    return web.json_response(health)
+
+
+async def metrics_handler(request):
+    return web.Response(text=METRICS.render(), content_type="text/plain", charset="utf-8")
+
+
+def create_app(pipeline=None, workers=2, queue_size=16, staged=False):
+    app = web.Application(client_max_size=8 * 1024 * 1024)
+    app[PIPELINE] = pipeline or ShakespearifyPipeline.from_env()
+    if staged:
+        app[STAGED] = app[PIPELINE].staged(workers=stage_workers_from_env(), queue_size=queue_size)
+    app[ADMISSION] = Admission(workers, queue_size)
+    app[EXECUTOR] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline")
+    app.router.add_post("/translate", translate_handler)
+    app.router.add_post("/translate/batch", translate_batch_handler)
+    app.router.add_get("/healthz", health_handler)
+    app.router.add_get("/metrics", metrics_handler)
+
+    async def shutdown(app):
+        app[EXECUTOR].shutdown(wait=False, cancel_futures=True)
+        if STAGED in app:
+            app[STAGED].close(wait=False)
+
+    app.on_cleanup.append(shutdown)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shakespearify HTTP inference service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=2, help="pipeline worker threads")
+    parser.add_argument("--queue-size", type=int, default=16, help="requests allowed to wait for a worker")
+    parser.add_argument("--staged", action="store_true",
+                        help="run /translate on the staged engine (SHAKESPEARIFY_STAGE_WORKERS sets workers per stage)")
+    args = parser.parse_args()
+    app = create_app(workers=args.workers, queue_size=args.queue_size, staged=args.staged)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""A staged execution engine: one thread pool per stage, bounded queues between.
+
+Each item flows through the stages in order; while one item is in a slow
+stage (beam search) the workers of the other stages keep processing other
+items, so post-processing and speech overlap generation. Queues between
+stages are bounded, so a slow stage pushes back on the ones before it
+instead of letting work pile up in memory. ``stats()`` reports utilization
+and queue depth per stage: the stage with the highest utilization is the one
+limiting throughput.
+"""
+import contextvars
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from metrics import METRICS
+
+_STOP = object()
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1, queue_size=8):
+        if workers < 1:
+            raise ValueError(f"stage {name!r} needs at least one worker")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+
+
+class StagedPipeline:
+    """Runs items through ``stages``; ``submit`` returns a ``Future`` of the last stage's output.
+
+    Each stage's ``fn`` takes the previous stage's output. The future gets a
+    ``timings`` dict of ``stage -> (queue_wait, run_time)`` in seconds. An
+    exception in any stage fails that item's future only.
+    """
+
+    def __init__(self, stages, name="stages"):
+        self.stages = list(stages)
+        if not self.stages:
+            raise ValueError("a staged pipeline needs at least one stage")
+        self.name = name
+        self._queues = [queue.Queue(stage.queue_size) for stage in self.stages]
+        self._busy = [0.0] * len(self.stages)
+        self._processed = [0] * len(self.stages)
+        self._errors = [0] * len(self.stages)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._started = time.monotonic()
+        self._threads = []
+        for index, stage in enumerate(self.stages):
+            threads = [
+                threading.Thread(target=self._work, args=(index,), name=f"{name}-{stage.name}-{i}", daemon=True)
+                for i in range(stage.workers)
+            ]
+            for thread in threads:
+                thread.start()
+            self._threads.append(threads)
+
+    def submit(self, item, block=True, timeout=None):
+        """Queue ``item`` for the first stage.
+
+        Blocks while the first queue is full; with ``block=False`` (or once
+        ``timeout`` expires) raises ``queue.Full`` instead.
+        """
+        if self._closed:
+            raise RuntimeError("StagedPipeline is closed")
+        future = Future()
+        future.timings = {}
+        # Stages run the item in the submitter's context, so its spans join the caller's trace()
+        future.context = contextvars.copy_context()
+        self._put(0, (item, future, time.monotonic()), block, timeout)
+        return future
+
+    def map(self, items):
+        """Results for ``items`` in order, keeping every stage busy meanwhile."""
+        pending = deque()
+        for item in items:
+            pending.append(self.submit(item))
+            while pending and pending[0].done():
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def stats(self):
+        """Per stage: workers, queue depth and size, items processed, errors and utilization.
+
+        Utilization is the fraction of the stage's worker time spent running
+        items since the engine started.
+        """
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        with self._lock:
+            return {
+                stage.name: {
+                    "workers": stage.workers,
+                    "queue_depth": self._queues[index].qsize(),
+                    "queue_size": stage.queue_size,
+                    "processed": self._processed[index],
+                    "errors": self._errors[index],
+                    "busy_seconds": self._busy[index],
+                    "utilization": self._busy[index] / (elapsed * stage.workers),
+                }
+                for index, stage in enumerate(self.stages)
+            }
+
+    def bottleneck(self):
+        """Name of the stage with the highest utilization."""
+        stats = self.stats()
+        return max(stats, key=lambda name: stats[name]["utilization"])
+
+    def close(self, wait=True):
+        """Stop accepting items; queued items still run through every stage."""
+        self._closed = True
+
+        def stop():
+            # Stop one stage at a time so everything ahead of it drains downstream first
+            for index, threads in enumerate(self._threads):
+                for _ in threads:
+                    self._queues[index].put(_STOP)
+                for thread in threads:
+                    thread.join()
+
+        if wait:
+            stop()
+        else:
+            threading.Thread(target=stop, name=f"{self.name}-close", daemon=True).start()
+
+    def _put(self, index, entry, block=True, timeout=None):
+        self._queues[index].put(entry, block, timeout)
+        METRICS.set("shakespearify_stage_queue_depth", self._queues[index].qsize(),
+                    help="Items waiting for a stage", stage=self.stages[index].name)
+
+    def _work(self, index):
+        stage = self.stages[index]
+        last = index == len(self.stages) - 1
+        while True:
+            entry = self._queues[index].get()
+            if entry is _STOP:
+                return
+            item, future, enqueued = entry
+            if index == 0 and not future.set_running_or_notify_cancel():
+                continue
+            start = time.monotonic()
+            try:
+                value = future.context.run(stage.fn, item)
+                failed = None
+            except Exception as exc:
+                failed = exc
+            elapsed = time.monotonic() - start
+            future.timings[stage.name] = (start - enqueued, elapsed)
+            with self._lock:
+                self._busy[index] += elapsed
+                self._processed[index] += 1
+                self._errors[index] += failed is not None
+            METRICS.observe("shakespearify_stage_queue_wait_seconds", start - enqueued,
+                            help="Time items wait for a stage worker", stage=stage.name)
+            METRICS.inc("shakespearify_stage_busy_seconds_total", elapsed,
+                        help="Worker time spent running each stage", stage=stage.name)
+
+            if failed is not None:
+                future.set_exception(failed)
+            elif last:
+                future.set_result(value)
+            else:
+                # Blocks while the next stage is saturated: backpressure
+                self._put(index + 1, (value, future, time.monotonic()))
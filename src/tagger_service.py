@@ -0,0 +1,162 @@
+"""Shared spaCy POS-tagging process reachable over local IPC.
+
+Run one tagger per machine and point every app worker at it so the spaCy
+model is held in memory once instead of once per worker::
+
+    export SHAKESPEARIFY_TAGGER_AUTHKEY=$(python -c "import secrets; print(secrets.token_hex(32))")
+    python src/tagger_service.py --address /tmp/shakespearify-tagger.sock
+    SHAKESPEARIFY_TAGGER_ADDRESS=/tmp/shakespearify-tagger.sock streamlit run src/app.py
+
+``--address`` is a Unix socket path (the default) or ``host:port``.
+``multiprocessing.connection`` unpickles what it receives, so anyone who can
+connect with the key can run code in the service: both sides must share a
+secret ``SHAKESPEARIFY_TAGGER_AUTHKEY`` and the service only listens on
+loopback addresses unless started with ``--allow-remote``.
+"""
+import argparse
+import ipaddress
+import os
+import sys
+import tempfile
+import threading
+from collections import namedtuple
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+
+if os.name == "nt":
+    DEFAULT_ADDRESS = "127.0.0.1:7420"
+else:
+    DEFAULT_ADDRESS = os.path.join(tempfile.gettempdir(), "shakespearify-tagger.sock")
+
+# The token attributes post-processing reads, in a picklable form
+TaggedToken = namedtuple("TaggedToken", ["text", "pos_", "whitespace_"])
+
+
+def parse_address(address):
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def is_loopback(address):
+    """True for a Unix socket path or a TCP address on this machine only."""
+    if not isinstance(address, tuple):
+        return True
+    host = address[0]
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def authkey_from_env():
+    key = os.environ.get("SHAKESPEARIFY_TAGGER_AUTHKEY")
+    if not key:
+        raise ValueError("SHAKESPEARIFY_TAGGER_AUTHKEY must be set to a shared secret to use the tagger service")
+    return key.encode("utf-8")
+
+
+def tag_texts(nlp, texts, batch_size=64):
+    return [
+        [TaggedToken(token.text, token.pos_, token.whitespace_) for token in doc]
+        for doc in nlp.pipe(texts, batch_size=batch_size)
+    ]
+
+
+class TaggerClient:
+    """Sends texts to a running tagger service; one connection per thread."""
+
+    def __init__(self, address, authkey=None):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.authkey = authkey or authkey_from_env()
+        self._local = threading.local()
+
+    def tag(self, texts, batch_size=64):
+        texts = list(texts)
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.send((texts, batch_size))
+                return conn.recv()
+            except (EOFError, OSError):
+                # The service restarted; reconnect once before giving up
+                self._local.conn = None
+                if attempt:
+                    raise
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, authkey=self.authkey)
+        return conn
+
+
+def serve(address, authkey=None, allow_remote=False):
+    """Load spaCy once and answer tagging requests until interrupted."""
+    address = parse_address(address)
+    if not allow_remote and not is_loopback(address):
+        raise ValueError(f"Refusing to listen on {address!r}; use a loopback address or allow_remote=True")
+    authkey = authkey or authkey_from_env()
+
+    from postprocessing import get_nlp
+
+    nlp = get_nlp()
+    nlp_lock = threading.Lock()  # spaCy pipelines aren't safe to call concurrently
+
+    def handle(conn):
+        with conn:
+            # The key check runs here, not on the accept loop, so a client that
+            # never answers the challenge only holds up its own thread
+            try:
+                deliver_challenge(conn, authkey)
+                answer_challenge(conn, authkey)
+            except (AuthenticationError, OSError, EOFError) as exc:
+                # A client that hung up during the handshake or has the wrong key
+                print(f"Rejected tagger connection: {exc!r}", file=sys.stderr)
+                return
+            while True:
+                try:
+                    texts, batch_size = conn.recv()
+                except EOFError:
+                    return
+                with nlp_lock:
+                    tagged = tag_texts(nlp, texts, batch_size)
+                conn.send(tagged)
+
+    # No authkey on the Listener: accept() would run the handshake on this thread
+    with Listener(address) as listener:
+        print(f"Tagger listening on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError as exc:
+                print(f"Failed to accept a tagger connection: {exc!r}", file=sys.stderr)
+                continue
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared spaCy POS tagger for Shakespearify workers")
+    parser.add_argument("--address", default=os.environ.get("SHAKESPEARIFY_TAGGER_ADDRESS", DEFAULT_ADDRESS),
+                        help="Unix socket path or host:port")
+    parser.add_argument("--allow-remote", action="store_true", help="allow listening on a non-loopback address")
+    args = parser.parse_args()
+    try:
+        serve(args.address, allow_remote=args.allow_remote)
+    except ValueError as exc:
+        parser.error(str(exc))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
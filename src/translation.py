@@ -0,0 +1,221 @@
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from transformers import TextIteratorStreamer
+
+from decoding import BudgetReduced, model_backend, model_id
+from metrics import METRICS, span
+
+# Generation settings shared by the single and batched paths
+MAX_INPUT_LENGTH = 512
+GENERATION_KWARGS = {"max_length": 150, "num_beams": 5, "early_stopping": True}
+# Streaming decodes one hypothesis (greedy or sampled); beam search can't stream
+STREAMING_KWARGS = {"max_length": 150, "num_beams": 1}
+
+
+def _generate(model, inputs, input_length, policy):
+    """``(outputs, reduced)``; ``reduced`` when the latency budget cut the beam width."""
+    # Fixed beam search unless a DecodingPolicy picks settings for this input
+    name, backend = model_id(model), model_backend(model)
+    kwargs = GENERATION_KWARGS if policy is None else policy.generation_kwargs(input_length, name, backend)
+    with span("generate", model=name) as current:
+        start = time.perf_counter()
+        with torch.no_grad():
+            outputs = model.generate(**inputs, **kwargs)
+        elapsed = time.perf_counter() - start
+
+    generated = outputs.shape[0] * outputs.shape[-1]
+    current.set(batch=outputs.shape[0], input_tokens=input_length, output_tokens=generated,
+                num_beams=kwargs["num_beams"], tokens_per_s=generated / elapsed if elapsed else None)
+    METRICS.inc("shakespearify_generated_tokens_total", generated,
+                help="Tokens produced by generate", model=name)
+    if policy is None:
+        return outputs, False
+    policy.observe(name, elapsed, kwargs["num_beams"], outputs.shape[-1], batch_size=outputs.shape[0],
+                   backend=backend)
+    return outputs, kwargs["num_beams"] < policy.beams(input_length)
+
+
+def _prefix_length(tokenizer, prefix):
+    # Tokens of the "prefix:" task marker, left out of the length the policy sees
+    if not prefix:
+        return 0
+    return len(tokenizer(f"{prefix}:", add_special_tokens=False)["input_ids"])
+
+
+def translate(text, tokenizer, model, prefix=None, policy=None):
+    if prefix:
+        text = f"{prefix}: {text}"
+    inputs = tokenizer.encode(text, return_tensors="pt", max_length=MAX_INPUT_LENGTH, truncation=True)
+    if policy is None:
+        with span("generate", model=model_id(model)), torch.no_grad():
+            outputs = model.generate(inputs, **GENERATION_KWARGS)
+        return tokenizer.decode(outputs[0], skip_special_tokens=True)
+    input_length = inputs.shape[-1] - _prefix_length(tokenizer, prefix)
+    outputs, reduced = _generate(model, {"input_ids": inputs}, input_length, policy)
+    text = tokenizer.decode(outputs[0], skip_special_tokens=True)
+    return BudgetReduced(text) if reduced else text
+
+
+def translate_batch(texts, tokenizer, model, prefix=None, batch_size=16, policy=None):
+    """Translate many texts with one ``generate`` call per length bucket.
+
+    Inputs are tokenized once, sorted by token length and cut into buckets of
+    ``batch_size`` so each bucket is padded only up to its own longest input.
+    With a ``policy``, decoding settings are chosen per bucket from its
+    longest input; texts of buckets whose beams the latency budget cut come
+    back as ``BudgetReduced``. Results are returned in the order of ``texts``.
+    """
+    texts = list(texts)
+    if prefix:
+        texts = [f"{prefix}: {text}" for text in texts]
+    if not texts:
+        return []
+
+    input_ids = tokenizer(texts, max_length=MAX_INPUT_LENGTH, truncation=True)["input_ids"]
+    prefix_length = _prefix_length(tokenizer, prefix) if policy is not None else 0
+    order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+
+    results = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        bucket = order[start:start + batch_size]
+        inputs = tokenizer.pad({"input_ids": [input_ids[i] for i in bucket]}, return_tensors="pt")
+        outputs, reduced = _generate(model, inputs, len(input_ids[bucket[-1]]) - prefix_length, policy)
+        decoded = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+        for i, text in zip(bucket, decoded):
+            results[i] = BudgetReduced(text) if reduced else text
+    return results
+
+
+def stream_translate(text, tokenizer, model, prefix=None, do_sample=False, **generate_kwargs):
+    """Yield the translation of ``text`` piece by piece as tokens are decoded.
+
+    Generation runs in a background thread with greedy decoding, or sampling
+    when ``do_sample`` is set; extra keyword arguments go to ``generate``.
+    An exception raised by ``generate`` is re-raised here once the pieces
+    decoded before it have been yielded.
+    """
+    if prefix:
+        text = f"{prefix}: {text}"
+    inputs = tokenizer.encode(text, return_tensors="pt", max_length=MAX_INPUT_LENGTH, truncation=True)
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    kwargs = dict(STREAMING_KWARGS, do_sample=do_sample, streamer=streamer, **generate_kwargs)
+
+    errors = []
+
+    def run():
+        try:
+            with torch.no_grad():
+                model.generate(inputs, **kwargs)
+        except Exception as exc:
+            # generate never reached streamer.end(); end it here or the loop below waits forever
+            errors.append(exc)
+            streamer.end()
+
+    thread = threading.Thread(target=run, name="stream-generate", daemon=True)
+    thread.start()
+    try:
+        for piece in streamer:
+            if piece:
+                yield piece
+    finally:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def stream_translate_segments(segments, tokenizer, model, prefix=None, **stream_kwargs):
+    """Stream the translations of ``segments`` one after another, separated by spaces.
+
+    Each segment is decoded by its own ``stream_translate`` call, so input
+    split with ``segment_text`` is neither truncated at the encoder limit nor
+    cut short by the streaming ``max_length``.
+    """
+    for index, segment in enumerate(segments):
+        if index:
+            yield " "
+        yield from stream_translate(segment, tokenizer, model, prefix=prefix, **stream_kwargs)
+
+
+# Sentence ends: ., !, ?, … optionally followed by a closing quote/bracket (French
+# style "Oui ! »" included), then whitespace. Only the whitespace is consumed.
+re_sentence_boundary = re.compile(
+    r'(?:(?<=[.!?\u2026])|(?<=[.!?\u2026]["\'\u201d\u00bb)\]])|(?<=[.!?\u2026]\s[\u201d\u00bb]))'
+    r'\s+(?![\u201d\u00bb])'
+)
+re_paragraph_break = re.compile(r'\n\s*\n')
+
+LongTranslation = namedtuple("LongTranslation", ["text", "segments"])
+
+
+def _fit_to_tokens(sentence, tokenizer, max_tokens):
+    # Pack words greedily so no segment is truncated by the encoder limit
+    if tokenizer is None or len(tokenizer.tokenize(sentence)) <= max_tokens:
+        return [sentence]
+    pieces, current = [], []
+    for word in sentence.split():
+        candidate = " ".join(current + [word])
+        if current and len(tokenizer.tokenize(candidate)) > max_tokens:
+            pieces.append(" ".join(current))
+            current = [word]
+        else:
+            current.append(word)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def segment_text(text, tokenizer=None, max_tokens=MAX_INPUT_LENGTH - 16):
+    """Split ``text`` into paragraphs of sentence segments.
+
+    With a tokenizer, sentences longer than ``max_tokens`` are further split
+    on word boundaries. The margin under the encoder limit leaves room for a
+    task prefix.
+    """
+    paragraphs = []
+    for paragraph in re_paragraph_break.split(text.strip()):
+        segments = []
+        for sentence in re_sentence_boundary.split(paragraph.strip()):
+            sentence = " ".join(sentence.split())
+            if sentence:
+                segments.extend(_fit_to_tokens(sentence, tokenizer, max_tokens))
+        if segments:
+            paragraphs.append(segments)
+    return paragraphs
+
+
+def translate_long(text, tokenizer, model, prefix=None, batch_size=16, workers=1, policy=None, batch_fn=None):
+    """Translate a long passage sentence by sentence instead of truncating it.
+
+    Segments are translated with ``translate_batch``, or ``batch_fn(texts)``
+    when given (it then adds the prefix itself); with ``workers > 1`` they
+    are split into that many contiguous shares translated in parallel
+    threads. Paragraph breaks are kept. Returns ``LongTranslation(text,
+    segments)`` where ``segments`` is the number of pieces translated.
+    """
+    paragraphs = segment_text(text, tokenizer)
+    segments = [segment for paragraph in paragraphs for segment in paragraph]
+    if not segments:
+        return LongTranslation("", 0)
+    if batch_fn is None:
+        def batch_fn(texts):
+            return translate_batch(texts, tokenizer, model, prefix=prefix, batch_size=batch_size, policy=policy)
+
+    if workers > 1 and len(segments) > 1:
+        share = -(-len(segments) // workers)
+        shares = [segments[i:i + share] for i in range(0, len(segments), share)]
+        with ThreadPoolExecutor(max_workers=len(shares)) as pool:
+            results = pool.map(batch_fn, shares)
+            translated = [text for result in results for text in result]
+    else:
+        translated = batch_fn(segments)
+
+    output, position = [], 0
+    for paragraph in paragraphs:
+        output.append(" ".join(translated[position:position + len(paragraph)]))
+        position += len(paragraph)
+    return LongTranslation("\n\n".join(output), len(segments))
@@ -0,0 +1,151 @@
+"""Background text-to-speech with a content-addressed audio cache.
+
+Speech is synthesized on a worker thread so the translated text can be shown
+right away. Audio bytes are cached on disk under a hash of (engine, language,
+text) and the most recent clips are also kept in memory, so repeated phrases
+never reach the network or the synthesizer again.
+"""
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+Speech = namedtuple("Speech", ["audio", "mime"])
+
+
+class GTTSEngine:
+    """Google Translate TTS (needs network access)."""
+
+    name = "gtts"
+    mime = "audio/mp3"
+    extension = "mp3"
+    max_workers = 4
+
+    def synthesize(self, text, lang):
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class EspeakEngine:
+    """Offline synthesis through the espeak-ng (or espeak) command line tool."""
+
+    name = "espeak"
+    mime = "audio/wav"
+    extension = "wav"
+    max_workers = 2
+
+    def __init__(self, executable=None):
+        self.executable = executable or shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def synthesize(self, text, lang):
+        if not self.executable:
+            raise RuntimeError("espeak-ng/espeak is not installed; install it or use the gtts engine")
+        result = subprocess.run(
+            [self.executable, "-v", lang, "--stdout"],
+            input=text.encode("utf-8"), capture_output=True, check=True,
+        )
+        return result.stdout
+
+
+ENGINES = {
+    GTTSEngine.name: GTTSEngine,
+    EspeakEngine.name: EspeakEngine,
+}
+
+
+def register_engine(engine_cls):
+    """Make a TTS engine class selectable by its ``name``.
+
+    Engines provide ``name``, ``mime``, ``extension``, ``max_workers`` and
+    ``synthesize(text, lang) -> bytes``.
+    """
+    ENGINES[engine_cls.name] = engine_cls
+    return engine_cls
+
+
+class SpeechSynthesizer:
+    def __init__(self, engine="gtts", cache_dir=".tts_cache", memory_entries=64):
+        self.engine = ENGINES[engine]() if isinstance(engine, str) else engine
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pool = ThreadPoolExecutor(max_workers=self.engine.max_workers, thread_name_prefix="tts")
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Build a synthesizer from ``SHAKESPEARIFY_TTS_ENGINE`` / ``SHAKESPEARIFY_TTS_CACHE_DIR``."""
+        kwargs.setdefault("engine", os.environ.get("SHAKESPEARIFY_TTS_ENGINE", "gtts"))
+        kwargs.setdefault("cache_dir", os.environ.get("SHAKESPEARIFY_TTS_CACHE_DIR", ".tts_cache"))
+        return cls(**kwargs)
+
+    def key(self, text, lang):
+        payload = f"{self.engine.name}\0{lang}\0{text}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def submit(self, text, lang="en"):
+        """Return a Future resolving to ``Speech(audio, mime)`` for ``text``."""
+        key = self.key(text, lang)
+        with self._lock:
+            # Identical requests in flight share one synthesis
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pool.submit(self._speak, key, text, lang)
+                self._pending[key] = future
+                future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def speak(self, text, lang="en"):
+        return self.submit(text, lang).result()
+
+    def _forget(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _speak(self, key, text, lang):
+        audio = self._lookup(key)
+        if audio is None:
+            audio = self.engine.synthesize(text, lang)
+            self._store(key, audio)
+        return Speech(audio, self.engine.mime)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.{self.engine.extension}")
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        if self.cache_dir and os.path.exists(self._path(key)):
+            with open(self._path(key), "rb") as f:
+                audio = f.read()
+            self._remember(key, audio)
+            return audio
+        return None
+
+    def _store(self, key, audio):
+        self._remember(key, audio)
+        if self.cache_dir:
+            # Write then rename so a concurrent reader never sees a partial file
+            tmp = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(audio)
+            os.replace(tmp, self._path(key))
+
+    def _remember(self, key, audio):
+        with self._lock:
+            self._memory[key] = audio
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
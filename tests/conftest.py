@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# The app modules import each other by bare name (``streamlit run src/app.py``
+# puts src/ on the path), so mirror that for the test run. Tests import them
+# the same way: ``src.metrics`` would be a second copy with its own globals.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+# Keep the lexicon artifact built on first load out of the user's cache
+os.environ.setdefault("SHAKESPEARIFY_LEXICON_CACHE_DIR", tempfile.mkdtemp(prefix="shakespearify-lexicon-"))
@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+import torch
+
+from assisted import AssistedGenerator, AssistedStats, check_compatible
+from cache import TranslationCache
+from pipeline import ShakespearifyPipeline
+from registry import ModelRegistry
+
+
+class FakeModel:
+    """Calls its forward hooks like an nn.Module; ``generate`` simulates two assisted rounds."""
+
+    def __init__(self, name, vocab_size=32128):
+        self.config = SimpleNamespace(_name_or_path=name, vocab_size=vocab_size, decoder_start_token_id=0,
+                                      eos_token_id=1, pad_token_id=0)
+        self.hooks = []
+
+    def register_forward_hook(self, hook):
+        self.hooks.append(hook)
+        return SimpleNamespace(remove=lambda: self.hooks.remove(hook))
+
+    def state_dict(self):
+        return {}
+
+    def __call__(self):
+        for hook in self.hooks:
+            hook(self, (), None)
+
+    def generate(self, input_ids, assistant_model=None, **kwargs):
+        # Each round: the draft proposes 3 tokens, the target verifies them in one pass
+        for _ in range(2):
+            for _ in range(3):
+                assistant_model()
+            self()
+        return torch.tensor([[0, 5, 6, 7, 8, 9, 1]])
+
+
+def make_tokenizer(vocab=None):
+    return SimpleNamespace(
+        get_vocab=lambda: dict(vocab or {"<pad>": 0, "</s>": 1, "<unk>": 2, "thou": 3}),
+        pad_token_id=0, eos_token_id=1, unk_token_id=2,
+        encode=MagicMock(return_value=torch.tensor([[3, 1]])),
+        decode=MagicMock(return_value="thou art"),
+    )
+
+
+def test_check_compatible_accepts_models_sharing_a_tokenizer():
+    check_compatible(make_tokenizer(), FakeModel("local"), make_tokenizer(), FakeModel("lite"))
+
+
+def test_check_compatible_reports_vocabulary_mismatches():
+    with pytest.raises(ValueError) as excinfo:
+        check_compatible(make_tokenizer(), FakeModel("local"), make_tokenizer({"<pad>": 0}), FakeModel("lite", 250112))
+
+    assert "different vocabularies" in str(excinfo.value)
+    assert "vocab_size" in str(excinfo.value)
+
+
+def test_generator_counts_drafted_and_accepted_tokens():
+    tokenizer, model, draft = make_tokenizer(), FakeModel("local"), FakeModel("lite")
+    generator = AssistedGenerator(tokenizer, model, make_tokenizer(), draft)
+
+    assert generator.translate("Hello", prefix="translate") == "thou art"
+    # Forward passes made outside the generator are not counted
+    model()
+    draft()
+
+    stats = generator.stats
+    assert (stats.tokens, stats.target_calls, stats.draft_calls) == (6, 2, 6)
+    assert stats.accepted == 4
+    assert stats.acceptance_rate == pytest.approx(4 / 6)
+    assert stats.tokens_per_target_call == 3
+    tokenizer.encode.assert_called_once()
+    assert tokenizer.encode.call_args.args[0] == "translate: Hello"
+
+
+def test_stats_add_up():
+    total = AssistedStats(6, 2, 6, 0.5) + AssistedStats(4, 4, 3, 0.25)
+
+    assert total == AssistedStats(10, 6, 9, 0.75)
+    assert AssistedStats().acceptance_rate is None
+
+
+def test_pipeline_drops_the_generator_when_a_model_is_unloaded():
+    registry = ModelRegistry(sources={"shakespeare-local": "local", "shakespeare-online": "lite"},
+                             loader=lambda source: (make_tokenizer(), FakeModel(source)))
+    pipeline = ShakespearifyPipeline(registry=registry, cache=TranslationCache())
+
+    generator = pipeline.assisted_generator("shakespeare-local")
+    assert pipeline.assisted_generator("shakespeare-local") is generator
+    draft = generator.draft_model
+
+    registry.unload("shakespeare-online")
+
+    # Hooks removed, so nothing but the registry keeps the old models
+    assert draft.hooks == [] and generator.model.hooks == []
+    reloaded = pipeline.assisted_generator("shakespeare-local")
+    assert reloaded is not generator
+    assert reloaded.draft_model is registry.get("shakespeare-online")[1] is not draft
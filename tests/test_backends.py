@@ -0,0 +1,65 @@
+import pytest
+import torch
+import backends
+from decoding import model_backend
+
+
+@pytest.mark.parametrize("command", ["convert", "parity"])
+def test_cli_defaults_to_the_local_model(monkeypatch, command, capsys):
+    seen = []
+    monkeypatch.setattr(backends, "export_onnx", lambda source: seen.append(source) or "artifacts/x")
+    monkeypatch.setattr(backends, "parity_report", lambda name, backend: seen.append(name) or {
+        "bleu_vs_fp32": 1.0, "exact_match": 1.0, "fp32_latency_s": 0.1, "backend_latency_s": 0.05, "speedup": 2.0,
+    })
+
+    backends.main([command])
+
+    expected = backends.MODEL_SOURCES["shakespeare-local"] if command == "convert" else "shakespeare-local"
+    assert seen == [expected]
+    assert capsys.readouterr().out.startswith("shakespeare-local")
+
+
+def test_cli_rejects_unknown_models():
+    with pytest.raises(SystemExit):
+        backends.main(["parity", "nope"])
+
+
+def test_quantize_int8_swaps_linear_layers_for_dynamic_int8_ones():
+    model = torch.nn.Sequential(torch.nn.Linear(8, 4), torch.nn.ReLU(), torch.nn.Linear(4, 2))
+
+    quantized = backends.quantize_int8(model)
+
+    assert [type(layer) for layer in quantized] == [
+        torch.ao.nn.quantized.dynamic.Linear, torch.nn.ReLU, torch.ao.nn.quantized.dynamic.Linear,
+    ]
+    assert quantized(torch.randn(3, 8)).shape == (3, 2)
+
+
+def test_load_backend_pair_quantizes_int8_and_rejects_unknown_backends(monkeypatch):
+    model = torch.nn.Sequential(torch.nn.Linear(8, 4))
+    monkeypatch.setattr(backends, "load_pair", lambda source: ("tokenizer", model))
+
+    assert backends.load_backend_pair("m", "pytorch") == ("tokenizer", model)
+    tokenizer, quantized = backends.load_backend_pair("m", "int8")
+    assert tokenizer == "tokenizer"
+    assert isinstance(quantized[0], torch.ao.nn.quantized.dynamic.Linear)
+    assert model_backend(quantized) == "int8" and model_backend(model) == "pytorch"
+    with pytest.raises(ValueError, match="Unknown backend"):
+        backends.load_backend_pair("m", "fp16")
+
+
+def test_artifact_dir_uses_a_sibling_of_local_checkpoints(tmp_path):
+    checkpoint = tmp_path / "checkpoint-34560"
+    checkpoint.mkdir()
+
+    assert backends.artifact_dir(f"{checkpoint}/", "onnx") == f"{checkpoint}-onnx"
+    assert backends.artifact_dir("Helsinki-NLP/opus-mt-fr-en", "onnx") == (
+        f"{backends.ARTIFACTS_DIR}/Helsinki-NLP--opus-mt-fr-en-onnx"
+    )
+
+
+def test_load_backend_pair_asks_for_a_conversion_when_the_onnx_export_is_missing(tmp_path):
+    pytest.importorskip("optimum.onnxruntime")
+
+    with pytest.raises(FileNotFoundError, match="convert"):
+        backends.load_backend_pair(str(tmp_path / "missing"), "onnx")
@@ -0,0 +1,65 @@
+import threading
+from batcher import MicroBatcher
+
+
+def test_concurrent_requests_are_coalesced_and_answered_individually():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(list(items))
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=200)
+    results = {}
+    start = threading.Barrier(4)
+
+    def worker(text):
+        start.wait()
+        results[text] = batcher(text, timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in ("a", "b", "c", "d")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert results == {"a": "A", "b": "B", "c": "C", "d": "D"}
+    assert len(calls) == 1 and sorted(calls[0]) == ["a", "b", "c", "d"]
+
+
+def test_batch_errors_are_raised_to_every_caller():
+    def batch_fn(items):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=2, max_wait_ms=1)
+    future = batcher.submit("x")
+    batcher.close()
+
+    assert isinstance(future.exception(timeout=5), ValueError)
+
+
+def test_batch_spans_and_queue_wait_reach_the_callers_trace():
+    from metrics import span, trace
+
+    def batch_fn(items):
+        with span("generate", batch=len(items)):
+            return [item.upper() for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=1)
+    with trace() as spans:
+        assert batcher("a", timeout=5) == "A"
+    batcher("b", timeout=5)  # outside any trace
+    batcher.close()
+
+    assert [s.name for s in spans] == ["batch_queue_wait", "generate"]
+    assert spans[0].attributes == {"batch": 1} and spans[0].duration >= 0
+
+
+def test_wrong_number_of_results_fails_every_caller():
+    batcher = MicroBatcher(lambda items: items[:1], max_batch_size=2, max_wait_ms=200)
+    futures = [batcher.submit("a"), batcher.submit("b")]
+    batcher.close()
+
+    for future in futures:
+        assert isinstance(future.exception(timeout=5), RuntimeError)
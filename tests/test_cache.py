@@ -0,0 +1,37 @@
+from cache import TranslationCache, make_key
+
+
+def test_memory_tier_counts_hits_and_misses():
+    cache = TranslationCache(max_entries=2)
+    calls = []
+
+    def compute(key):
+        calls.append(key)
+        return "Good morrow"
+
+    for _ in range(3):
+        assert cache.get_or_compute("translate", "m", {"num_beams": 5}, "hello", compute) == "Good morrow"
+
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_key_depends_on_every_component():
+    base = make_key("translate", "m", {"num_beams": 5}, "hi")
+    assert base != make_key("postprocess", "m", {"num_beams": 5}, "hi")
+    assert base != make_key("translate", "other", {"num_beams": 5}, "hi")
+    assert base != make_key("translate", "m", {"num_beams": 1}, "hi")
+    assert base != make_key("translate", "m", {"num_beams": 5}, "hey")
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = TranslationCache(path=path)
+    cache.get_or_compute_many("translate", "m", None, ["a", "b"], lambda texts: [t.upper() for t in texts])
+    cache.close()
+
+    reopened = TranslationCache(path=path)
+    result = reopened.get_or_compute_many("translate", "m", None, ["b", "c"], lambda texts: [t * 2 for t in texts])
+
+    assert result == ["B", "cc"]
+    assert reopened.stats()["disk_hits"] == 1
@@ -0,0 +1,97 @@
+import json
+import cli
+from pipeline import TranslationResult
+
+
+class FakePipeline:
+    def __init__(self):
+        self.adaptive = []
+
+    def run_batch(self, texts, language, model, adaptive=False):
+        self.adaptive.append(adaptive)
+        if "boom" in texts:
+            raise ValueError("generation failed")
+        return [TranslationResult(f"{t}!", t, language, model) for t in texts]
+
+
+def test_bulk_translation_resumes_from_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "_pipeline", FakePipeline())
+    source = tmp_path / "in.jsonl"
+    output = tmp_path / "out.jsonl"
+    source.write_text("".join(json.dumps({"id": i, "text": f"line {i}"}) + "\n" for i in range(5)))
+
+    # Pretend a previous run stopped after two rows plus a partial write
+    first_two = "".join(json.dumps({"id": i, "text": f"line {i}", "shakespeare": f"line {i}!",
+                                    "english": f"line {i}"}) + "\n" for i in range(2))
+    output.write_text(first_two + '{"id": 2, "te')
+    (tmp_path / "out.jsonl.ckpt").write_text(json.dumps({"rows_done": 2, "output_bytes": len(first_two)}))
+
+    cli.main([str(source), "-o", str(output), "--workers", "1", "--chunk-size", "2", "--resume"])
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [row["id"] for row in rows] == [0, 1, 2, 3, 4]
+    assert rows[4]["shakespeare"] == "line 4!"
+    assert not (tmp_path / "out.jsonl.ckpt").exists()
+
+
+def test_empty_input_writes_an_empty_output(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "_pipeline", FakePipeline())
+    source = tmp_path / "in.jsonl"
+    output = tmp_path / "out.jsonl"
+    source.write_text("")
+
+    cli.main([str(source), "-o", str(output), "--workers", "1"])
+
+    assert output.read_text() == ""
+    assert not (tmp_path / "out.jsonl.ckpt").exists()
+
+
+def test_rows_without_the_text_field_get_an_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "_pipeline", FakePipeline())
+    source = tmp_path / "in.jsonl"
+    output = tmp_path / "out.jsonl"
+    source.write_text("".join(json.dumps(row) + "\n" for row in [{"text": "a"}, {"body": "b"}, {"text": "c"}]))
+
+    cli.main([str(source), "-o", str(output), "--workers", "1"])
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [row.get("shakespeare") for row in rows] == ["a!", None, "c!"]
+    assert rows[1]["error"] == "missing field 'text'"
+
+
+def test_bad_rows_are_flagged_and_the_run_continues(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "_pipeline", FakePipeline())
+    source = tmp_path / "in.jsonl"
+    output = tmp_path / "out.jsonl"
+    lines = [
+        {"text": "a", "lang": "de"},  # unsupported language
+        {"text": 3},  # not a string
+        [1, 2],  # not an object
+        "x",
+        {"text": "boom", "lang": "fr"},  # its language batch fails
+        {"text": "ok", "lang": "French"},
+    ]
+    source.write_text("".join(json.dumps(line) + "\n" for line in lines))
+
+    cli.main([str(source), "-o", str(output), "--workers", "1", "--language-field", "lang"])
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert "Unsupported language 'de'" in rows[0]["error"]
+    assert rows[1]["error"] == "field 'text' is not a string"
+    assert rows[2] == {"row": [1, 2], "error": "row is not an object"}
+    assert rows[3] == {"row": "x", "error": "row is not an object"}
+    # "fr" and "French" are one batch, so the failure marks both rows
+    assert rows[4]["error"] == rows[5]["error"] == "generation failed"
+    assert all("shakespeare" not in row for row in rows)
+
+
+def test_adaptive_decoding_is_off_unless_requested(tmp_path, monkeypatch):
+    fake = FakePipeline()
+    monkeypatch.setattr(cli, "_pipeline", fake)
+    source = tmp_path / "in.jsonl"
+    source.write_text(json.dumps({"text": "a"}) + "\n")
+
+    cli.main([str(source), "-o", str(tmp_path / "plain.jsonl"), "--workers", "1"])
+    cli.main([str(source), "-o", str(tmp_path / "adaptive.jsonl"), "--workers", "1", "--adaptive-decoding"])
+
+    assert fake.adaptive == [False, True]
@@ -0,0 +1,41 @@
+from decoding import DecodingPolicy
+
+
+def test_short_inputs_are_greedy_and_long_inputs_get_more_beams():
+    policy = DecodingPolicy(length_ratios={"m": 2.0})
+
+    short = policy.generation_kwargs(4, "m")
+    long = policy.generation_kwargs(60, "m")
+
+    assert short == {"max_new_tokens": 16, "num_beams": 1}
+    assert long["num_beams"] == 5 and long["early_stopping"] is True
+    assert long["max_new_tokens"] == 128
+
+
+def test_latency_budget_reduces_beam_width():
+    policy = DecodingPolicy(latency_budget_ms=100, length_ratios={})
+    assert policy.generation_kwargs(40, "m")["num_beams"] == 5
+
+    # 1 ms per beam-token: 5 beams x 68 tokens would take 340 ms
+    policy.observe("m", seconds=0.5, num_beams=5, new_tokens=100)
+
+    assert policy.generation_kwargs(40, "m")["num_beams"] == 1
+    assert policy.beams(40) == 5
+
+
+def test_batched_generate_cost_is_shared_by_the_batch():
+    policy = DecodingPolicy(latency_budget_ms=100, length_ratios={})
+
+    # 8 sequences in 0.5 s: 0.125 ms per beam-token, so 5 beams x 68 tokens take 42.5 ms
+    policy.observe("m", seconds=0.5, num_beams=5, new_tokens=100, batch_size=8)
+
+    assert policy.generation_kwargs(40, "m")["num_beams"] == 5
+
+
+def test_latency_estimates_are_kept_per_backend():
+    policy = DecodingPolicy(latency_budget_ms=100, length_ratios={})
+
+    policy.observe("m", seconds=0.5, num_beams=5, new_tokens=100, backend="pytorch")
+
+    assert policy.generation_kwargs(40, "m", backend="pytorch")["num_beams"] == 1
+    assert policy.generation_kwargs(40, "m", backend="int8")["num_beams"] == 5
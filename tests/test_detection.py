@@ -0,0 +1,37 @@
+import pytest
+
+from detection import Detection, LanguageDetector, detection_warning, group_by_language
+
+pytest.importorskip("langdetect")
+
+
+def test_detects_supported_languages_with_confidence():
+    detector = LanguageDetector()
+
+    french = detector.detect("Je suis venu en ambassadeur, mais je repars en ennemi juré.")
+    spanish = detector.detect("¿Dónde está la estación de tren, por favor?")
+
+    assert (french.language, french.reliable) == ("fr", True)
+    assert (spanish.language, spanish.reliable) == ("es", True)
+    assert french.confidence >= detector.threshold
+
+
+def test_short_or_featureless_text_falls_back():
+    detector = LanguageDetector(fallback="en")
+
+    short = detector.detect("Bonjour")
+    empty = detector.detect("1234 !!")
+
+    assert short.guess == "fr" and short.language == "en" and not short.reliable
+    assert empty == Detection("en", None, 0.0, False)
+    assert detection_warning(short).startswith("language not detected reliably (best guess 'fr'")
+    assert detection_warning(empty) == "language not detected reliably (no guess); translated as 'en'"
+
+
+def test_trusted_or_manual_language_has_no_warning():
+    assert detection_warning(Detection("fr", "fr", 0.99, True)) is None
+    assert detection_warning(None) is None
+
+
+def test_group_by_language_keeps_input_order():
+    assert group_by_language(["fr", "en", "fr", "es"]) == {"fr": [0, 2], "en": [1], "es": [3]}
@@ -0,0 +1,147 @@
+import mmap
+import os
+import random
+import stat
+
+import lexicon as lexicon_module
+from lexicon import Lexicon, build, check, compile_lexicon, load_lexicon, read_lexicon
+from postprocessing import PhraseRewriter, SubstitutionTable
+
+
+def write_lexicon(directory, phrases="", words="", starters=""):
+    for name, text in (("phrases.tsv", phrases), ("words.tsv", words), ("starters.tsv", starters)):
+        (directory / name).write_text(text, encoding="utf-8")
+
+
+def test_check_reports_duplicates_and_unreachable_entries(tmp_path):
+    write_lexicon(
+        tmp_path,
+        phrases="# comment\nthank you\tGramercy\ndon't worry\tFret not\n",
+        words="never\tne'er\nhelp me\taid me\nnever\tnevermore\n",
+        starters="good\tWell met\ngood morning\tGood morrow\nHello!\tHail\nhello!\tHi\n",
+    )
+    expand = lambda text: text.replace("don't", "do not")  # noqa: E731
+
+    problems = {(kind, line, problem.split(";")[0].split(" (")[0]) for kind, line, _, problem in
+                check(read_lexicon(str(tmp_path)), expand)}
+
+    assert problems == {
+        ("phrases", 3, "contains a contraction, which is expanded before lookup"),
+        ("words", 2, "multi-word key never matches a single token"),
+        ("words", 3, "duplicate of line 1"),
+        ("starters", 4, "same key as 'Hello!'"),
+    }
+
+
+def test_shipped_lexicon_passes_check(capsys):
+    # A failure lists each problem as file:line, as `python src/lexicon.py check` does
+    lexicon_module.main(["check"])
+
+    assert capsys.readouterr().out == "no problems found\n"
+
+
+def test_compiled_lexicon_round_trips_the_maps(tmp_path):
+    write_lexicon(
+        tmp_path,
+        phrases="thank you\tI thank thee\tGramercy\nit is\t'tis\n",
+        words="you\tthou\noften\toft\tofttimes\n",
+        starters="thank\tI thank thee\nhello\tGood morrow\n",
+    )
+    lexicon = Lexicon(compile_lexicon(read_lexicon(str(tmp_path))))
+
+    assert dict(lexicon.phrases) == {"thank you": ["I thank thee", "Gramercy"], "it is": ["'tis"]}
+    assert dict(lexicon.words) == {"you": "thou", "often": ["oft", "ofttimes"]}
+    assert list(lexicon.starters.items()) == [("thank", "I thank thee"), ("hello", "Good morrow")]
+    assert lexicon.variants["YOU"] == "THOU"
+    assert "missing" not in lexicon.words and lexicon.words.get("missing", "-") == "-"
+
+
+def test_compiled_matchers_behave_like_in_memory_ones(tmp_path):
+    write_lexicon(
+        tmp_path,
+        phrases="are you\tart thou\nhow are you\tHow fares thee?\nthank you\tGramercy\tI thank thee\n",
+        words="you\tthou\nwell\thale\n",
+    )
+    compiled = Lexicon(compile_lexicon(read_lexicon(str(tmp_path))))
+    maps = {"are you": ["art thou"], "how are you": ["How fares thee?"], "thank you": ["Gramercy", "I thank thee"]}
+    text = "THANK YOU, how are you? Are you well, thank  you"
+
+    assert PhraseRewriter.from_trie(compiled.trie).rewrite(text, random.Random(1)) == \
+        PhraseRewriter(maps).rewrite(text, random.Random(1))
+    table = SubstitutionTable.from_variants(compiled.variants)
+    assert [table.lookup(word, "PRON") for word in ("You", "WELL", "yOu", "them")] == ["Thou", "HALE", "thou", "them"]
+
+
+def test_load_lexicon_rebuilds_into_the_cache_when_the_data_files_change(tmp_path):
+    data, cache = tmp_path / "data", tmp_path / "cache"
+    data.mkdir()
+    write_lexicon(data, words="you\tthou\n")
+    path = str(data / "lexicon.bin")
+    build(str(data), path)
+    assert load_lexicon(str(data), path, str(cache)).words["you"] == "thou"
+    assert not cache.exists()
+
+    write_lexicon(data, words="you\tye\n")
+    later = os.path.getmtime(path) + 10
+    for name in ("phrases.tsv", "words.tsv", "starters.tsv"):
+        os.utime(data / name, (later, later))
+    built = os.path.getmtime(path)
+
+    assert load_lexicon(str(data), path, str(cache)).words["you"] == "ye"
+    # The stale artifact is left for `lexicon.py build` to replace
+    assert os.path.getmtime(path) == built
+    assert [p.name for p in cache.iterdir()] == [os.path.basename(lexicon_module.cached_artifact(str(data), str(cache)))]
+
+
+def test_load_lexicon_builds_a_missing_artifact_once_into_the_cache(tmp_path, monkeypatch):
+    data, cache = tmp_path / "data", tmp_path / "cache"
+    data.mkdir()
+    write_lexicon(data, words="you\tthou\n")
+    path = data / "lexicon.bin"
+
+    assert load_lexicon(str(data), str(path), str(cache)).words["you"] == "thou"
+    assert not path.exists()
+    assert sorted(p.name for p in data.iterdir()) == ["phrases.tsv", "starters.tsv", "words.tsv"]
+
+    monkeypatch.setattr(lexicon_module, "build", lambda *args: (_ for _ in ()).throw(AssertionError("rebuilt")))
+    lexicon = load_lexicon(str(data), str(path), str(cache))
+    assert lexicon.words["you"] == "thou" and isinstance(lexicon.buffer, mmap.mmap)
+
+
+def test_load_lexicon_compiles_in_memory_without_a_cache_dir(tmp_path):
+    write_lexicon(tmp_path, words="you\tthou\n")
+    path = tmp_path / "lexicon.bin"
+
+    assert load_lexicon(str(tmp_path), str(path), None).words["you"] == "thou"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["phrases.tsv", "starters.tsv", "words.tsv"]
+
+
+def test_fingerprint_changes_with_any_entry(tmp_path):
+    write_lexicon(tmp_path, words="you\tthou\n")
+    first = Lexicon(compile_lexicon(read_lexicon(str(tmp_path)))).fingerprint
+    write_lexicon(tmp_path, words="you\tye\n")
+    second = Lexicon(compile_lexicon(read_lexicon(str(tmp_path)))).fingerprint
+
+    assert first != second
+    assert second == Lexicon(compile_lexicon(read_lexicon(str(tmp_path)))).fingerprint
+
+
+def test_built_artifact_is_readable_by_other_users(tmp_path):
+    write_lexicon(tmp_path, words="you\tthou\n")
+    path = tmp_path / "lexicon.bin"
+    build(str(tmp_path), str(path))
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+
+def test_load_lexicon_compiles_in_memory_when_the_artifact_is_unreadable(tmp_path, monkeypatch):
+    write_lexicon(tmp_path, words="you\tthou\n")
+    path = str(tmp_path / "lexicon.bin")
+    build(str(tmp_path), path)
+
+    def denied(*args, **kwargs):
+        raise PermissionError(13, "Permission denied", path)
+
+    monkeypatch.setattr(lexicon_module.Lexicon, "open", classmethod(denied))
+
+    assert lexicon_module.load_lexicon(str(tmp_path), path).words["you"] == "thou"
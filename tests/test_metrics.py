@@ -0,0 +1,83 @@
+import threading
+import time
+
+from metrics import Metrics, Profiler, span, trace
+
+
+def test_spans_are_recorded_in_the_trace_and_the_stage_histogram():
+    metrics = Metrics(buckets=(0.5, 10))
+    with trace() as spans:
+        with span("generate", metrics=metrics, model="m") as current:
+            current.set(output_tokens=3)
+        with span("tts", metrics=metrics):
+            pass
+
+    assert [s.name for s in spans] == ["generate", "tts"]
+    assert spans[0].attributes == {"model": "m", "output_tokens": 3}
+    assert spans[0].duration >= 0
+
+    text = metrics.render()
+    assert "# TYPE shakespearify_stage_seconds histogram" in text
+    assert 'shakespearify_stage_seconds_bucket{stage="generate",le="+Inf"} 1' in text
+    assert 'shakespearify_stage_seconds_count{stage="tts"} 1' in text
+
+
+def test_spans_outside_a_trace_only_update_metrics():
+    metrics = Metrics()
+    with span("phrase_replace", metrics=metrics):
+        pass
+    with trace() as spans:
+        pass
+    assert spans == []
+    assert 'shakespearify_stage_seconds_count{stage="phrase_replace"} 1' in metrics.render()
+
+
+def test_counters_render_with_labels_and_help():
+    metrics = Metrics()
+    metrics.inc("shakespearify_cache_lookups_total", help="Translation cache lookups", result="hit")
+    metrics.inc("shakespearify_cache_lookups_total", 2, result="hit")
+    metrics.inc("shakespearify_cache_lookups_total", result="miss")
+
+    lines = metrics.render().splitlines()
+    assert lines[:2] == [
+        "# HELP shakespearify_cache_lookups_total Translation cache lookups",
+        "# TYPE shakespearify_cache_lookups_total counter",
+    ]
+    assert 'shakespearify_cache_lookups_total{result="hit"} 3' in lines
+    assert 'shakespearify_cache_lookups_total{result="miss"} 1' in lines
+
+
+def test_profiler_dumps_one_file_for_each_armed_request(tmp_path):
+    profiler = Profiler(str(tmp_path))
+    profiler.arm(1)
+    with profiler.maybe_profile("request") as profile:
+        sum(range(100))
+    with profiler.maybe_profile("request") as second:
+        pass
+
+    assert profile is not None and second is None
+    assert len(list(tmp_path.glob("request-*.folded"))) == 1
+
+
+def test_profiler_samples_other_threads_and_runs_one_profile_at_a_time(tmp_path):
+    profiler = Profiler(str(tmp_path), interval=0.001)
+    profiler.arm(2)
+    stop = threading.Event()
+
+    def busy_stage_worker():
+        while not stop.is_set():
+            sum(range(1000))
+
+    with profiler.maybe_profile("request") as profile:
+        with profiler.maybe_profile("request") as overlapping:
+            worker = threading.Thread(target=busy_stage_worker, name="stage-shakespeare")
+            worker.start()
+            time.sleep(0.05)
+            stop.set()
+            worker.join()
+
+    assert overlapping is None and profiler.remaining == 1
+    assert profile.samples > 0
+    [path] = tmp_path.glob("request-*.folded")
+    stacks = path.read_text().splitlines()
+    assert any(line.startswith("stage-shakespeare;") and "busy_stage_worker" in line for line in stacks)
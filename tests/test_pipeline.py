@@ -0,0 +1,194 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from cache import TranslationCache
+from detection import Detection
+from pipeline import BudgetReduced, ShakespearifyPipeline, StagedJob
+from postprocessing import LEXICON, RULES_ID
+
+
+def make_pipeline():
+    registry = MagicMock()
+    registry.sources = {"fr-en": "fr-en", "shakespeare-online": "online", "shakespeare-local": "local"}
+    registry.backend = "pytorch"
+    pipeline = ShakespearifyPipeline(registry=registry, cache=TranslationCache())
+    calls = []
+
+    def fake_generate(model_name, texts, prefix, adaptive, assisted=False):
+        calls.append((model_name, list(texts)))
+        return [f"{model_name}{'+draft' if assisted else ''}({text})" for text in texts]
+
+    pipeline._generate = fake_generate
+    return pipeline, calls
+
+
+def test_run_batch_chains_hops_and_skips_cached_inputs():
+    pipeline, calls = make_pipeline()
+
+    first = pipeline.run_batch(["Bonjour", "Merci"], language="French")
+    second = pipeline.run_batch(["Merci", "Salut"], language="fr")
+
+    assert [r.text for r in first] == ["shakespeare-online(fr-en(Bonjour))", "shakespeare-online(fr-en(Merci))"]
+    assert second[0].english == "fr-en(Merci)"
+    assert calls[2:] == [("fr-en", ["Salut"]), ("shakespeare-online", ["fr-en(Salut)"])]
+
+
+def test_english_input_skips_the_translation_hop():
+    pipeline, calls = make_pipeline()
+
+    result = pipeline.run_batch(["Hello"], language="English")
+
+    assert result[0].english == "Hello"
+    assert calls == [("shakespeare-online", ["Hello"])]
+
+
+def test_auto_language_groups_texts_by_detected_language():
+    pipeline, calls = make_pipeline()
+    pipeline.registry.sources["es-en"] = "es-en"
+    routes = {"Bonjour": "fr", "Hola": "es", "Hello": "en", "Salut": "fr"}
+    pipeline.detector = MagicMock()
+    pipeline.detector.detect_many = lambda texts: [Detection(routes[t], routes[t], 0.99, True) for t in texts]
+
+    results = pipeline.run_batch(["Bonjour", "Hola", "Hello", "Salut"], language="auto")
+
+    assert calls[:2] == [("fr-en", ["Bonjour", "Salut"]), ("es-en", ["Hola"])]
+    assert [r.english for r in results] == ["fr-en(Bonjour)", "es-en(Hola)", "Hello", "fr-en(Salut)"]
+    assert [r.language for r in results] == ["fr", "es", "en", "fr"]
+    assert results[0].confidence == 0.99
+
+
+def test_short_non_english_input_is_not_routed_as_english_silently():
+    pytest.importorskip("langdetect")
+    pipeline, _ = make_pipeline()
+
+    results = pipeline.run_batch(["Je t'aime ma cherie", "Hello there, how are you doing today?"], language="auto")
+    single = pipeline.run("Bonjour", language="auto")
+
+    assert results[0].language == "en" and "'fr'" in results[0].warning
+    assert results[1].warning is None
+    assert single.language == "en" and single.warning
+    assert single.to_dict()["warning"] == single.warning
+
+
+def test_manual_language_overrides_detection():
+    pipeline, _ = make_pipeline()
+    pipeline.detector = MagicMock()
+
+    result = pipeline.run_batch(["Hello"], language="French")[0]
+
+    pipeline.detector.detect_many.assert_not_called()
+    assert result.language == "fr" and result.confidence is None and result.warning is None
+
+
+def test_staged_engine_matches_run():
+    pipeline, _ = make_pipeline()
+    engine = pipeline.staged(workers={"to_english": 1, "shakespeare": 2})
+
+    jobs = list(engine.map([StagedJob("Bonjour", "French"), StagedJob("Hello", "English")]))
+    engine.close()
+
+    assert [job.result() for job in jobs] == [pipeline.run("Bonjour", "French"), pipeline.run("Hello")]
+
+
+def test_staged_engine_spans_reach_the_callers_trace():
+    from metrics import trace
+
+    pipeline, _ = make_pipeline()
+    engine = pipeline.staged()
+    with trace() as spans:
+        engine.submit(StagedJob("Hello")).result(timeout=5)
+        engine.submit(StagedJob("Hello")).result(timeout=5)
+    engine.close()
+
+    lookups = [s.attributes for s in spans if s.name == "cache_lookup"]
+    assert lookups == [{"stage": "translate", "hit": False}, {"stage": "translate", "hit": True}]
+    assert [s.name for s in spans].count("batch_queue_wait") == 1
+
+
+def test_model_stages_are_at_least_one_batch_wide(monkeypatch):
+    pipeline, _ = make_pipeline()
+    monkeypatch.setenv("SHAKESPEARIFY_BATCH_SIZE", "6")
+
+    engine = pipeline.staged(workers={"shakespeare": 2, "postprocess": 3})
+    engine.close()
+
+    assert {stage.name: stage.workers for stage in engine.stages} == {
+        "to_english": 8, "shakespeare": 6, "postprocess": 3,
+    }
+
+
+def test_assisted_decoding_is_cached_apart_from_beam_search():
+    pipeline, calls = make_pipeline()
+    pipeline.postprocess = lambda text: text
+
+    assisted = pipeline.run("Hello", model="shakespeare-local", assisted=True)
+    beam = pipeline.run("Hello", model="shakespeare-local")
+
+    assert assisted.text == "shakespeare-local+draft(Hello)"
+    assert beam.text == "shakespeare-local(Hello)"
+    assert len(calls) == 2
+
+
+def test_assisted_decoding_needs_a_draft_model():
+    pipeline, calls = make_pipeline()
+
+    with pytest.raises(ValueError, match="draft"):
+        pipeline.run_batch(["Hello"], model="shakespeare-online", assisted=True)
+    assert calls == []
+
+
+def test_postprocess_cache_key_follows_the_rules_and_lexicon():
+    pipeline, _ = make_pipeline()
+    pipeline.cache = MagicMock()
+
+    pipeline.postprocess("Hello")
+
+    assert pipeline.cache.get_or_compute.call_args.args[1] == RULES_ID
+    assert LEXICON.fingerprint in RULES_ID
+
+
+def test_streamed_post_processing_is_seeded_like_the_whole_text(monkeypatch):
+    import pipeline as pipeline_module
+    import postprocessing
+
+    def fake_postprocess(text, prefix_to_remove=None, add_starter=True, rng=None):
+        return f"{text} [{rng.random():.6f}]"
+
+    monkeypatch.setattr(postprocessing, "postprocess_shakespeare", fake_postprocess)
+    monkeypatch.setattr(pipeline_module, "postprocess_shakespeare", fake_postprocess)
+    pipeline, _ = make_pipeline()
+
+    streamed = "".join(pipeline.postprocess_stream(["Good ", "morrow, ", "friend."]))
+    assert streamed == pipeline.postprocess("Good morrow, friend.")
+    two_sentences = ["Good morrow. ", "How now?"]
+    assert list(pipeline.postprocess_stream(two_sentences)) == list(pipeline.postprocess_stream(two_sentences))
+
+
+def test_backends_are_cached_apart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    pipeline, calls = make_pipeline()
+    pipeline.cache = TranslationCache(path=path)
+    pipeline.run("Hello")
+
+    # Same persistent cache, now serving the int8 models
+    pipeline, calls = make_pipeline()
+    pipeline.registry.backend = "int8"
+    pipeline.cache = TranslationCache(path=path)
+    pipeline.run("Hello")
+
+    assert calls == [("shakespeare-online", ["Hello"])]
+
+
+def test_output_reduced_by_the_latency_budget_is_not_cached():
+    pipeline, calls = make_pipeline()
+    generate = pipeline._generate
+    pipeline._generate = lambda *args: [BudgetReduced(text) for text in generate(*args)]
+
+    under_load = pipeline.run_batch(["Hello"])[0]
+    pipeline._generate = generate
+    idle = pipeline.run("Hello")
+
+    assert under_load.text == idle.text == "shakespeare-online(Hello)"
+    assert len(calls) == 2
+    assert pipeline.run("Hello") == idle and len(calls) == 2
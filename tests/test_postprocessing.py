@@ -0,0 +1,130 @@
+import random
+
+import pytest
+
+from postprocessing import (
+    SPACY_MODEL,
+    PhraseRewriter,
+    StarterTrie,
+    SubstitutionTable,
+    normalize_contractions,
+    phrase_mapping,
+    phrase_replace,
+    postprocess_batch,
+    postprocess_shakespeare,
+    prepend_starter,
+    select_starter,
+)
+from tagger_service import TaggedToken
+
+
+def test_phrase_rewriter_prefers_longest_phrase_and_keeps_case():
+    rewriter = PhraseRewriter({"are you": ["art thou"], "how are you": ["How fares thee?"], "thank you": ["Gramercy"]})
+
+    assert rewriter.rewrite("how are you") == "How fares thee?"
+    assert rewriter.rewrite("THANK YOU, are you well?") == "GRAMERCY, art thou well?"
+
+
+def test_phrase_rewriter_is_single_pass_on_word_boundaries():
+    rewriter = PhraseRewriter({"it is": ["'tis"], "'tis": ["it be"]})
+
+    assert rewriter.rewrite("it is here, bit is not") == "'tis here, bit is not"
+
+
+def test_phrase_replace_uses_rng_for_alternatives():
+    first = phrase_replace("thank you", phrase_mapping, random.Random(3))
+    second = phrase_replace("thank you", phrase_mapping, random.Random(3))
+
+    assert first == second
+    assert first in phrase_mapping["thank you"]
+
+
+def test_substitution_table_matches_case_pos_and_keeps_token_spacing():
+    table = SubstitutionTable({"you": "thou", "will": "shalt", "often": ["oft", "ofttimes"]})
+    tokens = [
+        TaggedToken("He", "PRON", ""), TaggedToken("'ll", "AUX", " "), TaggedToken("tell", "VERB", " "),
+        TaggedToken("YOU", "PRON", " "), TaggedToken("what", "PRON", " "), TaggedToken("You", "PRON", " "),
+        TaggedToken("will", "NOUN", " "), TaggedToken("yOu", "PRON", ""), TaggedToken("!", "PUNCT", " "),
+    ]
+
+    assert table.substitute(tokens) == "He'll tell THOU what Thou shalt thou!"
+    assert table.lookup("will", "PUNCT") == "will"
+
+
+def test_spaces_before_punctuation_in_the_input_are_removed(monkeypatch):
+    import postprocessing
+
+    # How spaCy tokenizes "Hello , my Jo !"
+    tokens = [
+        TaggedToken("Hello", "INTJ", " "), TaggedToken(",", "PUNCT", " "), TaggedToken("my", "PRON", " "),
+        TaggedToken("Jo", "PROPN", " "), TaggedToken("!", "PUNCT", ""),
+    ]
+    monkeypatch.setattr(postprocessing, "tag", lambda texts, **kwargs: [tokens])
+
+    assert postprocessing.postprocess_shakespeare("Hello , my Jo !", add_starter=False) == "Hello, my Jo!"
+
+
+def test_substitution_table_draws_alternatives_like_a_plain_dict_lookup():
+    mapping = {"often": ["oft", "ofttimes", "many a time"], "you": ["thou"]}
+    table = SubstitutionTable(mapping)
+    words = ["Often", "you", "OFTEN", "often", "You"] * 5
+    rng, expected_rng = random.Random(7), random.Random(7)
+
+    expected = []
+    for word in words:
+        subs = expected_rng.choice(mapping[word.lower()])
+        expected.append(subs.capitalize() if word.istitle() else subs.upper() if word.isupper() else subs)
+
+    assert [table.lookup(word, "ADV", rng) for word in words] == expected
+
+
+def test_starter_trie_prefers_the_longest_case_insensitive_key_on_word_boundaries():
+    trie = StarterTrie({"hi": "How now", "good": "Well met", "Good morning,": "Good morrow", "Hey, listen!": "Hark"})
+
+    assert trie.match("Good morning, my lord") == "Good morrow"
+    assert trie.match("good morning to you") == "Well met"
+    assert trie.match("HEY, LISTEN! Now.") == "Hark"
+    assert trie.match("Hi there") == "How now"
+    assert trie.match("His horse") is None
+    assert trie.match_many(["hi", "", "goodness"]) == ["How now", None, None]
+
+
+def test_starters_ending_in_punctuation_get_no_extra_comma():
+    assert prepend_starter(select_starter("Wait, I come"), "Wait, I come") == "Stay, Wait, I come"
+    assert prepend_starter(select_starter("Certainly, I will go"), "Certainly, I will go") == "Forsooth, Certainly, I will go"
+    assert prepend_starter("Hark", "Hey, listen! Now.") == "Hark, Hey, listen! Now."
+    assert prepend_starter(None, "Nothing to add") == "Nothing to add"
+
+
+def test_normalize_contractions_handles_case_and_curly_apostrophes():
+    text = "Don't worry, I’m sure they'll come. WON'T they? couldn't've"
+
+    assert normalize_contractions(text) == "Do not worry, I am sure they will come. WILL NOT they? could not have"
+
+
+def test_postprocess_batch_matches_per_string_output():
+    spacy = pytest.importorskip("spacy")
+    if not spacy.util.is_package(SPACY_MODEL):
+        pytest.skip(f"spaCy model {SPACY_MODEL} is not installed")
+    texts = ["Thank you for your help!", "I can't do this without you.", "Good morning, my friend."]
+
+    expected = [postprocess_shakespeare(text, rng=random.Random(i)) for i, text in enumerate(texts)]
+    result = postprocess_batch(texts, batch_size=2, rngs=[random.Random(i) for i in range(len(texts))])
+
+    assert result == expected
+
+
+def test_postprocess_stream_emits_each_sentence_once_complete(monkeypatch):
+    import postprocessing
+
+    calls = []
+
+    def fake_postprocess(text, prefix_to_remove=None, add_starter=True, rng=random):
+        calls.append((text, add_starter))
+        return text.upper()
+
+    monkeypatch.setattr(postprocessing, "postprocess_shakespeare", fake_postprocess)
+    pieces = postprocessing.postprocess_stream(["Hello the", "re. How are", " you? I am", " fine"])
+
+    assert list(pieces) == ["HELLO THERE. ", "HOW ARE YOU? ", "I AM FINE"]
+    assert [starter for _, starter in calls] == [True, False, False]
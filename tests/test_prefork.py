@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from prefork import MAX_BACKOFF, memory_report, memory_usage, parse_smaps_rollup, preload, restart_delay
+
+SMAPS_ROLLUP = """\
+55d0c1a2b000-7ffd3c9f1000 ---p 00000000 00:00 0                          [rollup]
+Rss:              512000 kB
+Pss:              140000 kB
+Pss_Anon:          20000 kB
+Shared_Clean:     480000 kB
+Shared_Dirty:       8000 kB
+Private_Clean:      4000 kB
+Private_Dirty:     20000 kB
+Referenced:       512000 kB
+Swap:                  0 kB
+"""
+
+needs_proc = pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="needs Linux smaps_rollup")
+
+
+def test_parse_smaps_rollup_reads_the_summed_fields_in_bytes():
+    values = parse_smaps_rollup(SMAPS_ROLLUP)
+
+    assert values["Rss"] == 512000 * 1024
+    assert values["Private_Dirty"] == 20000 * 1024
+    # Only the fields the report needs; the [rollup] header line is ignored
+    assert "Pss_Anon" not in values and "Referenced" not in values
+
+
+@needs_proc
+def test_memory_usage_splits_resident_memory_into_unique_and_shared():
+    usage = memory_usage(os.getpid())
+
+    assert usage["rss"] > 0
+    assert usage["unique"] + usage["shared"] == usage["rss"]
+    assert usage["unique"] <= usage["pss"] <= usage["rss"]
+
+
+@needs_proc
+def test_memory_report_skips_processes_that_exited():
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+
+    report = memory_report({"self": os.getpid(), "gone": child.pid})
+
+    assert "self" in report and "gone" not in report
+    assert report.splitlines()[-1].startswith("total PSS")
+
+
+def test_restart_delay_backs_off_for_crash_loops_only():
+    assert restart_delay(0) == 0
+    assert [restart_delay(n) for n in (1, 2, 3)] == [1, 2, 4]
+    assert restart_delay(50) == MAX_BACKOFF
+
+
+def test_preload_starts_no_prewarm_thread_before_forking(monkeypatch):
+    prewarmed = []
+    monkeypatch.setattr("registry.ModelRegistry.prewarm", lambda self, names, background=True: prewarmed.append(names))
+    monkeypatch.setenv("SHAKESPEARIFY_PREWARM", "fr-en")
+
+    pipeline = preload([], spacy=False)
+
+    assert prewarmed == []
+    assert pipeline.registry.loaded() == []
@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from registry import ModelRegistry, model_nbytes
+
+
+def fake_tensor(nbytes, element_size=1):
+    tensor = MagicMock()
+    tensor.numel.return_value = nbytes // element_size
+    tensor.element_size.return_value = element_size
+    return tensor
+
+
+def fake_model(nbytes):
+    model = MagicMock()
+    model.state_dict.return_value = {"weight": fake_tensor(nbytes)}
+    return model
+
+
+def make_registry(**kwargs):
+    loads = []
+
+    def loader(source):
+        loads.append(source)
+        return f"tok-{source}", fake_model(1024 * 1024)
+
+    sources = {"a": "a", "b": "b", "c": "c"}
+    return ModelRegistry(sources=sources, loader=loader, **kwargs), loads
+
+
+def test_models_load_once_on_first_use():
+    registry, loads = make_registry()
+    assert loads == []
+
+    tokenizer, _ = registry.get("a")
+    registry.get("a")
+
+    assert tokenizer == "tok-a"
+    assert loads == ["a"]
+
+
+def test_least_recently_used_model_is_evicted_over_budget():
+    registry, loads = make_registry(memory_budget_mb=2)
+
+    registry.get("a")
+    registry.get("b")
+    registry.get("a")
+    registry.get("c")
+
+    assert registry.loaded() == ["a", "c"]
+    registry.get("b")
+    assert loads == ["a", "b", "c", "b"]
+
+
+def test_model_nbytes_counts_packed_int8_weights_and_shared_tensors_once():
+    shared = fake_tensor(4000, element_size=4)
+    model = MagicMock()
+    model.state_dict.return_value = {
+        "shared.weight": shared,
+        "encoder.embed_tokens.weight": shared,  # tied to shared.weight
+        "lm.scale": fake_tensor(8, element_size=8),
+        "lm.dtype": "torch.qint8",
+        # A dynamically quantized Linear: int8 weight plus fp32 bias
+        "lm._packed_params._packed_params": (fake_tensor(1000), fake_tensor(40, element_size=4)),
+    }
+
+    assert model_nbytes(model) == 4000 + 8 + 1000 + 40
+
+
+def test_model_nbytes_of_onnx_models_is_the_size_of_their_graphs(tmp_path):
+    (tmp_path / "encoder_model.onnx").write_bytes(b"x" * 300)
+    (tmp_path / "decoder_model.onnx_data").write_bytes(b"x" * 200)
+    (tmp_path / "config.json").write_text("{}")
+    model = SimpleNamespace(model_save_dir=tmp_path)
+
+    assert model_nbytes(model) == 500
+
+
+def test_unload_callbacks_see_evicted_and_unloaded_models():
+    registry, _ = make_registry(memory_budget_mb=2)
+    unloaded = []
+    registry.on_unload(unloaded.append)
+
+    registry.get("a")
+    registry.get("b")
+    registry.get("c")
+    registry.unload("c")
+
+    assert unloaded == ["a", "c"]
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from pipeline import InvalidRequest, TranslationResult
+from server import create_app
+
+
+class StubPipeline:
+    """Upper-cases texts; ``run`` waits for ``release`` once ``block`` is set."""
+
+    def __init__(self, block=False):
+        self.adaptive = []
+        self.registry = SimpleNamespace(loaded=lambda: [])
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    def run(self, text, language="English", model="shakespeare-online", long_text=False, adaptive=True,
+            assisted=False):
+        if model != "shakespeare-online":
+            raise InvalidRequest(f"Unknown model {model!r}")
+        if text == "crash":
+            raise ValueError("tokenizer state is broken")
+        self.adaptive.append(adaptive)
+        self.started.set()
+        self.release.wait(5)
+        return TranslationResult(text.upper(), text, "en", model)
+
+    def run_batch(self, texts, language="English", model="shakespeare-online", adaptive=True, assisted=False):
+        self.adaptive.append(adaptive)
+        return [TranslationResult(text.upper(), text, "en", model) for text in texts]
+
+
+def serve(pipeline, test, **kwargs):
+    async def main():
+        async with TestClient(TestServer(create_app(pipeline, **kwargs))) as client:
+            await test(client)
+
+    asyncio.run(main())
+
+
+def test_translate_returns_the_pipeline_result():
+    async def test(client):
+        response = await client.post("/translate", json={"text": "hello"})
+        assert response.status == 200
+        assert (await response.json())["text"] == "HELLO"
+
+    serve(StubPipeline(), test)
+
+
+def test_adaptive_decoding_is_off_unless_requested():
+    pipeline = StubPipeline()
+
+    async def test(client):
+        await client.post("/translate", json={"text": "a"})
+        await client.post("/translate", json={"text": "a", "adaptive": True})
+        await client.post("/translate/batch", json={"texts": ["a"], "adaptive": True})
+
+    serve(pipeline, test)
+    assert pipeline.adaptive == [False, True, True]
+
+
+def test_translate_batch_keeps_the_order_of_texts():
+    async def test(client):
+        response = await client.post("/translate/batch", json={"texts": ["b", "a", "c"]})
+        assert response.status == 200
+        assert [r["text"] for r in (await response.json())["results"]] == ["B", "A", "C"]
+
+    serve(StubPipeline(), test)
+
+
+def test_requests_beyond_workers_and_queue_get_429_with_retry_after():
+    pipeline = StubPipeline(block=True)
+
+    async def test(client):
+        first = asyncio.ensure_future(client.post("/translate", json={"text": "first"}))
+        await asyncio.get_running_loop().run_in_executor(None, pipeline.started.wait, 5)
+
+        busy = await client.post("/translate", json={"text": "second"})
+        assert busy.status == 429
+        assert busy.headers["Retry-After"] == "1"
+
+        pipeline.release.set()
+        assert (await first).status == 200
+        assert (await client.post("/translate", json={"text": "third"})).status == 200
+
+    serve(pipeline, test, workers=1, queue_size=0)
+
+
+def test_bad_input_is_rejected_with_400():
+    async def test(client):
+        for path, body in [
+            ("/translate", {"text": ""}),
+            ("/translate", {"text": "hi", "language": ["French"]}),
+            ("/translate", {"text": "hi", "model": 3}),
+            ("/translate", {"text": "hi", "model": "nope"}),
+            ("/translate", {"text": "hi", "long_text": "false"}),
+            ("/translate", {"text": "hi", "assisted": 1}),
+            ("/translate/batch", {"texts": ["hi"], "assisted": "no"}),
+            ("/translate/batch", {"texts": "hi"}),
+            ("/translate/batch", {"texts": ["hi"], "model": None}),
+        ]:
+            response = await client.post(path, json=body)
+            assert response.status == 400, (path, body)
+
+        response = await client.post("/translate", data="not json")
+        assert response.status == 400
+
+    serve(StubPipeline(), test)
+
+
+def test_internal_errors_are_500_without_their_message():
+    async def test(client):
+        response = await client.post("/translate", json={"text": "crash"})
+        assert response.status == 500
+        assert "tokenizer" not in await response.text()
+
+    serve(StubPipeline(), test)
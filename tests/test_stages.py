@@ -0,0 +1,88 @@
+import queue
+import threading
+
+import pytest
+
+from stages import Stage, StagedPipeline
+
+
+def test_items_flow_through_every_stage_in_order():
+    engine = StagedPipeline([Stage("double", lambda x: x * 2, workers=3), Stage("inc", lambda x: x + 1, workers=2)])
+
+    assert list(engine.map(range(20))) == [x * 2 + 1 for x in range(20)]
+    stats = engine.stats()
+    assert stats["double"]["processed"] == stats["inc"]["processed"] == 20
+    assert set(stats["inc"]) >= {"workers", "queue_depth", "queue_size", "utilization"}
+    engine.close()
+
+
+def test_a_later_stage_runs_while_an_earlier_one_is_busy():
+    release = threading.Event()
+    second_stage_ran = threading.Event()
+
+    def slow(item):
+        if item == "blocked":
+            release.wait(5)
+        return item
+
+    def fast(item):
+        second_stage_ran.set()
+        return item.upper()
+
+    engine = StagedPipeline([Stage("slow", slow), Stage("fast", fast)])
+    first = engine.submit("first")
+    assert first.result(5) == "FIRST"
+    second_stage_ran.clear()
+
+    blocked = engine.submit("blocked")
+    assert not second_stage_ran.wait(0.05)
+    release.set()
+    assert blocked.result(5) == "BLOCKED"
+    assert set(blocked.timings) == {"slow", "fast"}
+    engine.close()
+
+
+def test_errors_fail_only_their_item():
+    def check(item):
+        if item < 0:
+            raise ValueError("negative")
+        return item
+
+    engine = StagedPipeline([Stage("check", check), Stage("square", lambda x: x * x)])
+    bad, good = engine.submit(-1), engine.submit(3)
+
+    with pytest.raises(ValueError):
+        bad.result(5)
+    assert good.result(5) == 9
+    assert engine.stats()["check"]["errors"] == 1
+    engine.close()
+
+
+def test_full_first_queue_rejects_without_blocking():
+    release = threading.Event()
+    engine = StagedPipeline([Stage("wait", lambda item: release.wait(5) and item, queue_size=1)])
+    running = engine.submit(1)
+    while engine.stats()["wait"]["queue_depth"]:
+        pass  # Let the worker pick up the first item
+
+    engine.submit(2)
+    with pytest.raises(queue.Full):
+        engine.submit(3, block=False)
+    release.set()
+    assert running.result(5) == 1
+    engine.close()
+
+
+def test_stage_spans_join_the_submitters_trace():
+    from metrics import span, trace
+
+    def step(item):
+        with span("step", item=item):
+            return item
+
+    engine = StagedPipeline([Stage("a", step), Stage("b", step, workers=2)])
+    with trace() as spans:
+        assert engine.submit(1).result(timeout=5) == 1
+    engine.close()
+
+    assert [(s.name, s.attributes) for s in spans] == [("step", {"item": 1}), ("step", {"item": 1})]
@@ -0,0 +1,64 @@
+import os
+import socket
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+from types import SimpleNamespace
+
+import pytest
+
+from tagger_service import TaggerClient, authkey_from_env, is_loopback, parse_address, serve
+
+
+def test_authkey_is_required(monkeypatch):
+    monkeypatch.delenv("SHAKESPEARIFY_TAGGER_AUTHKEY", raising=False)
+    with pytest.raises(ValueError, match="AUTHKEY"):
+        TaggerClient("/tmp/tagger.sock")
+
+    monkeypatch.setenv("SHAKESPEARIFY_TAGGER_AUTHKEY", "s3cret")
+    assert authkey_from_env() == b"s3cret"
+
+
+def test_only_local_addresses_count_as_loopback():
+    assert is_loopback(parse_address("/tmp/tagger.sock"))
+    assert is_loopback(parse_address("127.0.0.1:7420"))
+    assert is_loopback(parse_address("localhost:7420"))
+    assert not is_loopback(parse_address("0.0.0.0:7420"))
+    assert not is_loopback(parse_address("tagger.internal:7420"))
+
+
+def test_serve_refuses_a_public_address():
+    with pytest.raises(ValueError, match="loopback"):
+        serve("0.0.0.0:7420", authkey=b"s3cret")
+
+
+class FakeNLP:
+    def pipe(self, texts, batch_size):
+        for text in texts:
+            yield [SimpleNamespace(text=word, pos_="X", whitespace_=" ") for word in text.split()]
+
+
+def test_service_survives_bad_connections(tmp_path, monkeypatch):
+    monkeypatch.setattr("postprocessing.get_nlp", FakeNLP)
+    address = str(tmp_path / "tagger.sock")
+    threading.Thread(target=serve, args=(address, b"s3cret"), daemon=True).start()
+    for _ in range(100):
+        if os.path.exists(address):
+            break
+        time.sleep(0.01)
+
+    # Connect and hang up before the handshake, then try a wrong key
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(address)
+    with pytest.raises((AuthenticationError, EOFError, OSError)):
+        Client(address, authkey=b"wrong")
+
+    # A client that connects and never answers the challenge doesn't block others
+    with socket.socket(socket.AF_UNIX) as silent:
+        silent.connect(address)
+        client = TaggerClient(address, authkey=b"s3cret")
+        try:
+            assert client.tag(["hello there"]) == [[("hello", "X", " "), ("there", "X", " ")]]
+        finally:
+            client.close()
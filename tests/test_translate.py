@@ -1,5 +1,6 @@
+import pytest
 from unittest.mock import MagicMock
-from src.app import translate
+from app import translate
 
 def test_translate_basic_text():
     # Mock tokenizer and model
@@ -20,3 +21,133 @@ def test_translate_basic_text():
 
     result = translate("Bonjour", tokenizer, model)
     assert result == "Shakespearean translation"
+
+
+def test_translate_batch_buckets_by_length_and_keeps_order():
+    from translation import translate_batch
+
+    class Outputs(list):
+        # Rows of token ids with the tensor .shape that generate's callers read
+        @property
+        def shape(self):
+            return (len(self), max(len(row) for row in self))
+
+    texts = ["a b c", "a", "a b"]
+    tokenizer = MagicMock()
+    model = MagicMock()
+
+    tokenizer.return_value = {"input_ids": [t.split() for t in texts]}
+    tokenizer.pad.side_effect = lambda batch, return_tensors: {"input_ids": batch["input_ids"]}
+    model.generate.side_effect = lambda input_ids, **kwargs: Outputs(input_ids)
+    tokenizer.batch_decode.side_effect = lambda outputs, skip_special_tokens: [
+        " ".join(ids).upper() for ids in outputs
+    ]
+
+    result = translate_batch(texts, tokenizer, model, batch_size=2)
+
+    assert result == ["A B C", "A", "A B"]
+    buckets = [call.kwargs["input_ids"] for call in model.generate.call_args_list]
+    assert buckets == [[["a"], ["a", "b"]], [["a", "b", "c"]]]
+
+
+def test_translate_batch_marks_outputs_the_latency_budget_reduced():
+    from decoding import DecodingPolicy
+    from translation import BudgetReduced, translate_batch
+
+    class Outputs(list):
+        @property
+        def shape(self):
+            return (len(self), max(len(row) for row in self))
+
+    texts = ["a", " ".join("a" * 40)]
+    tokenizer = MagicMock()
+    model = MagicMock()
+    model.config._name_or_path = "m"
+    model.inference_backend = "pytorch"
+    tokenizer.return_value = {"input_ids": [t.split() for t in texts]}
+    tokenizer.pad.side_effect = lambda batch, return_tensors: {"input_ids": batch["input_ids"]}
+    model.generate.side_effect = lambda input_ids, **kwargs: Outputs(input_ids)
+    tokenizer.batch_decode.side_effect = lambda outputs, skip_special_tokens: [" ".join(ids) for ids in outputs]
+    policy = DecodingPolicy(latency_budget_ms=50, length_ratios={})
+    policy.observe("m", seconds=0.5, num_beams=5, new_tokens=100)
+
+    short, long = translate_batch(texts, tokenizer, model, batch_size=1, policy=policy)
+
+    # The short input is greedy anyway; the long one lost its beams to the budget
+    assert not isinstance(short, BudgetReduced)
+    assert isinstance(long, BudgetReduced)
+    assert model.generate.call_args.kwargs["num_beams"] == 1
+
+
+def test_translate_long_splits_sentences_and_reassembles_in_order():
+    import translation
+
+    calls = []
+
+    def fake_translate_batch(texts, tokenizer, model, prefix=None, batch_size=16, policy=None):
+        calls.append(list(texts))
+        return [text.upper() for text in texts]
+
+    original = translation.translate_batch
+    translation.translate_batch = fake_translate_batch
+    try:
+        result = translation.translate_long("Bonjour. Ça va? Oui!\n\nMerci.", None, None, workers=2)
+    finally:
+        translation.translate_batch = original
+
+    assert result.text == "BONJOUR. ÇA VA? OUI!\n\nMERCI."
+    assert result.segments == 4
+    assert calls == [["Bonjour.", "Ça va?"], ["Oui!", "Merci."]]
+
+
+def test_stream_translate_reraises_generate_errors(monkeypatch):
+    import queue
+
+    import translation
+
+    class FakeStreamer:
+        # The end-of-stream protocol of transformers' TextIteratorStreamer
+        def __init__(self, tokenizer, **kwargs):
+            self.queue = queue.Queue()
+
+        def put_text(self, text):
+            self.queue.put(text)
+
+        def end(self):
+            self.queue.put(None)
+
+        def __iter__(self):
+            while (piece := self.queue.get(timeout=5)) is not None:
+                yield piece
+
+    def failing_generate(inputs, streamer, **kwargs):
+        streamer.put_text("Good ")
+        raise RuntimeError("out of memory")
+
+    monkeypatch.setattr(translation, "TextIteratorStreamer", FakeStreamer)
+    tokenizer = MagicMock()
+    model = MagicMock()
+    model.generate.side_effect = failing_generate
+
+    pieces = []
+    with pytest.raises(RuntimeError, match="out of memory"):
+        for piece in translation.stream_translate("Hello", tokenizer, model):
+            pieces.append(piece)
+    assert pieces == ["Good "]
+
+
+def test_stream_translate_segments_decodes_each_segment_separately(monkeypatch):
+    import translation
+
+    calls = []
+
+    def fake_stream_translate(text, tokenizer, model, prefix=None, **kwargs):
+        calls.append(text)
+        yield from text.upper().split()
+
+    monkeypatch.setattr(translation, "stream_translate", fake_stream_translate)
+
+    pieces = list(translation.stream_translate_segments(["a b.", "c."], None, None, prefix="translate"))
+
+    assert calls == ["a b.", "c."]
+    assert pieces == ["A", "B.", " ", "C."]
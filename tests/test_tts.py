@@ -0,0 +1,32 @@
+from tts import SpeechSynthesizer
+
+
+class FakeEngine:
+    name = "fake"
+    mime = "audio/wav"
+    extension = "wav"
+    max_workers = 1
+
+    def __init__(self):
+        self.calls = []
+
+    def synthesize(self, text, lang):
+        self.calls.append(text)
+        return f"{lang}:{text}".encode()
+
+
+def test_speech_is_cached_in_memory_and_on_disk(tmp_path):
+    engine = FakeEngine()
+    synthesizer = SpeechSynthesizer(engine=engine, cache_dir=str(tmp_path))
+
+    first = synthesizer.submit("Good morrow").result(timeout=5)
+    second = synthesizer.speak("Good morrow")
+
+    assert first == second == (b"en:Good morrow", "audio/wav")
+    assert engine.calls == ["Good morrow"]
+
+    # A fresh synthesizer (e.g. after a restart) is served from the disk cache
+    restarted_engine = FakeEngine()
+    restarted = SpeechSynthesizer(engine=restarted_engine, cache_dir=str(tmp_path))
+    assert restarted.speak("Good morrow").audio == b"en:Good morrow"
+    assert restarted_engine.calls == []